@@ -17,7 +17,7 @@ from nanomyth.game.quest import Quest, ExternalQuestAction
 from nanomyth.game.world import World
 from nanomyth.game.actor import Player, Direction, NPC
 import nanomyth.view.sdl
-from nanomyth.view.sdl.tmx import load_tmx_map
+from nanomyth.view.sdl.tmx import TMXMapLoader
 from nanomyth.view.sdl.graphml import load_graphml_quest
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__))))
 import graphics, ui
@@ -32,6 +32,7 @@ sys.stdout.flush()
 engine = nanomyth.view.sdl.SDLEngine((640, 480),
 		scale=4,
 		window_title='Nanomyth Demo',
+		dirty_rects=True,
 		)
 
 ui.load_menu_images(engine, resources)
@@ -79,15 +80,17 @@ def remove_actor(actor, **params):
 	actor = game.get_world().get_current_map().find_actor(actor)
 	game.get_world().get_current_map().remove_actor(actor)
 
-main_map = load_tmx_map(DEMO_ROOTDIR/'home.tmx', engine)
-yard_map = load_tmx_map(DEMO_ROOTDIR/'yard.tmx', engine)
-
+TMX_CACHE_DIR = Path('~/.cache/nanomyth/tmx').expanduser()
 game = Game()
-game.get_world().add_map('main', main_map)
-game.get_world().add_map('yard', yard_map)
-game.get_world().add_map('farm', load_tmx_map(DEMO_ROOTDIR/'farm.tmx', engine))
-game.get_world().add_map('cave_entrance', load_tmx_map(DEMO_ROOTDIR/'cave_entrance.tmx', engine))
-game.get_world().add_map('cave', load_tmx_map(DEMO_ROOTDIR/'cave.tmx', engine))
+# Maps are loaded on the first visit, and only few recently visited maps are kept in memory.
+game.get_world().register_map('main', TMXMapLoader(DEMO_ROOTDIR/'home.tmx', engine, cache_dir=TMX_CACHE_DIR))
+game.get_world().register_map('yard', TMXMapLoader(DEMO_ROOTDIR/'yard.tmx', engine, cache_dir=TMX_CACHE_DIR))
+game.get_world().register_map('farm', TMXMapLoader(DEMO_ROOTDIR/'farm.tmx', engine, cache_dir=TMX_CACHE_DIR))
+game.get_world().register_map('cave_entrance', TMXMapLoader(DEMO_ROOTDIR/'cave_entrance.tmx', engine, cache_dir=TMX_CACHE_DIR))
+game.get_world().register_map('cave', TMXMapLoader(DEMO_ROOTDIR/'cave.tmx', engine, cache_dir=TMX_CACHE_DIR))
+game.get_world().set_memory_budget(3 * 7 * 7)
+# Maps behind portals near the player are loaded in background.
+game.get_world().set_prefetch_radius(3)
 quest = load_graphml_quest(DEMO_ROOTDIR/'smoke.graphml')
 quest.on_start('update_active_quest_count')
 quest.on_finish('update_active_quest_count')
@@ -97,7 +100,7 @@ quest.on_start('update_active_quest_count')
 quest.on_finish('update_active_quest_count')
 game.get_world().add_quest(quest)
 
-main_game = nanomyth.view.sdl.context.Game(game)
+main_game = nanomyth.view.sdl.context.Game(game, bake_terrain=True, viewport=(7, 7))
 main_game._map_widget.get_size(engine) # TODO not needed actually, just for coverage.
 
 
@@ -238,4 +241,4 @@ if sys.argv[1:2] == ['auto']:
 	if save3.exists(): # pragma: no cover -- We need slot 3 to be free.
 		os.unlink(str(save3))
 	auto_sequence = autodemo.AutoSequence(0.2 if 'slow' in args else 0.07, DEMO_ROOTDIR/'autodemo.txt')
-engine.run(custom_update=auto_sequence)
+engine.run(custom_update=auto_sequence, fps=60, update_interval=10, idle=True)
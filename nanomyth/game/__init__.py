@@ -1 +1 @@
-from . import map, actor, world, savegame, game
+from . import map, actor, world, savegame, game, pathfinding
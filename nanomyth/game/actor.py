@@ -50,6 +50,14 @@ class NPC:
 		self._trigger = new_trigger
 	def get_sprite(self):
 		return self._sprite
+	def update(self, level_map, pos, ticks):
+		""" Called periodically by simulation (see world.Scheduler) to let NPC act on its own.
+		Receives the map NPC is placed on and its current position.
+		Ticks is the number of simulation ticks passed since the previous update
+		(may be greater than 1 for maps that are updated less frequently).
+		Default implementation does nothing.
+		"""
+		pass
 	def on_interaction(self, trigger_registry, quest_registry=None): # TODO needs to be typed.
 		if not self._trigger:
 			return
@@ -27,7 +27,9 @@ class Game:
 	def load_world(self, new_world):
 		""" Replaces World object with a new one.
 		Used for loading savegames etc.
+		Map loaders are not saved, so they are copied from the previous world (see World.register_map).
 		"""
+		new_world.copy_loaders(self._world)
 		self._world = new_world
 		if self._on_change_map:
 			self._on_change_map(self._world.get_current_map())
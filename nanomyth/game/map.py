@@ -1,4 +1,5 @@
-from ..math import Matrix, Point, Size
+import weakref
+from ..math import Matrix, Point, Size, Rect
 from . import actor
 from .events import Trigger
 from .quest import QuestStateChange
@@ -6,12 +7,32 @@ from .actor import NPC, Player, Direction
 from .items import Item
 from ..utils.meta import fieldproperty, typed
 from ..math.mapping import ObjectAtPos
+from .regions import Regions
 
 class Terrain:
 	""" Represents single map tile of terrain.
+
+	Terrain tiles are immutable and interned:
+	creating tile with the same images and passability returns the same shared object,
+	so maps with many similar tiles do not store a separate object for each cell.
 	"""
+	__slots__ = ('_images', '_passable', '__weakref__')
+	_interned = weakref.WeakValueDictionary()
+
 	passable = fieldproperty('_passable', "Is tile passable on terrain level?")
 
+	def __new__(cls, images=None, passable=True):
+		if images is None: # Restoring from legacy savefile, state will be set later.
+			return super().__new__(cls)
+		key = (cls, tuple(images), passable)
+		tile = cls._interned.get(key)
+		if tile is None:
+			# Fields are set here rather than in __init__, because unpickling does not call __init__.
+			tile = super().__new__(cls)
+			tile._images = key[1]
+			tile._passable = passable
+			tile = cls._interned.setdefault(key, tile) # Maps can be unpickled on background thread.
+		return tile
 	@typed(list)
 	def __init__(self, images, passable=True):
 		""" Creates tile with specified images.
@@ -20,10 +41,20 @@ class Terrain:
 
 		To make terrain tile impassable (an obstacle), set passable=False. By default is True.
 		"""
-		self._images = images
-		self._passable = passable
+	def __getnewargs__(self):
+		return list(self._images), self._passable
+	def __getstate__(self):
+		return None
+	def __setstate__(self, state):
+		""" Legacy savefiles store plain dict state. """
+		self._images = tuple(state['_images'])
+		self._passable = state['_passable']
+	def __copy__(self):
+		return self
+	def __deepcopy__(self, memo):
+		return self
 	def get_images(self):
-		""" Returns list of images for the terrain tile. """
+		""" Returns tuple of images for the terrain tile. """
 		return self._images
 
 class Portal:
@@ -52,7 +83,24 @@ class Portalling(Exception):
 class Map:
 	""" Rectangle level map.
 	Supports terrain, actors (e.g. player) and other objects/events/triggers (e.g. portal tiles).
+
+	Actors and items are kept in dicts keyed by object identity (in placement order),
+	so they can be looked up and removed in constant time.
+	Objects are additionally indexed by position for fast per-tile lookups,
+	actors are indexed by name (names should not change while actor is on the map)
+	and the player character is referenced directly.
+	Indices are not serialized and are rebuilt upon loading.
+	Changes of the set of actors can be tracked via actor listener (see set_actor_listener).
+
+	Connected regions of passable terrain (see Regions) are labelled on the first request
+	and then updated incrementally when tiles are changed. They are not serialized either.
 	"""
+	_TRANSIENT_FIELDS = (
+			'_actors_by_id', '_items_by_id', '_player',
+			'_actors_at', '_items_at', '_portals_at', '_triggers_at', '_actors_by_name',
+			'_terrain_revision', '_portal_revision', '_regions', '_actor_listener',
+			)
+
 	@typed((Size, tuple, list))
 	def __init__(self, size):
 		""" Creates empty map of given size with default (empty) terrain.
@@ -62,65 +110,225 @@ class Map:
 		self._items = []
 		self._portals = []
 		self._triggers = []
+		self._restore_transient_state()
+	def __getstate__(self):
+		state = dict(self.__dict__)
+		for field_name in self._TRANSIENT_FIELDS:
+			del state[field_name]
+		state['_actors'] = list(self._actors_by_id.values())
+		state['_items'] = list(self._items_by_id.values())
+		return state
+	def __setstate__(self, new_state):
+		self.__dict__.update(new_state)
+		self._restore_transient_state()
+	def __getattr__(self, attr):
+		""" Legacy JSON savefiles are restored without calling __setstate__,
+		so transient state is restored lazily upon the first access.
+		"""
+		if attr not in self._TRANSIENT_FIELDS or '_actors' not in self.__dict__:
+			raise AttributeError(attr)
+		for x, y, tile in self._tiles.iter_items():
+			self._tiles.set_cell_xy(x, y, Terrain(list(tile._images), passable=tile._passable))
+		self._restore_transient_state()
+		return getattr(self, attr)
+	def _restore_transient_state(self):
+		""" Moves serialized lists of actors and items to the keyed storage
+		and re-creates all indices and caches.
+		"""
+		self._actors_by_id = {id(_.obj): _ for _ in self.__dict__.pop('_actors')}
+		self._items_by_id = {id(_.obj): _ for _ in self.__dict__.pop('_items')}
+		self._terrain_revision = 0
+		self._portal_revision = 0
+		self._regions = None
+		self.__dict__.setdefault('_actor_listener', None) # May be already set for lazily restored legacy map.
+		self._rebuild_index()
+	def set_actor_listener(self, listener):
+		""" Sets callable that is called as listener(actor_name, added)
+		every time actor is placed on the map (added=True) or removed from it (added=False).
+		E.g. World uses it to keep global index of actors.
+		Listener is not serialized. Pass None to remove listener.
+		"""
+		self._actor_listener = listener
+	def _rebuild_index(self):
+		""" Re-creates position index (pos -> list of objects) for every object layer,
+		name index (name -> list of actors) and reference to the player.
+		Indices are not serialized and should be rebuilt after loading.
+		"""
+		self._actors_by_name = {}
+		self._actors_at = {}
+		self._items_at = {}
+		self._portals_at = {}
+		self._triggers_at = {}
+		for layer, index in (
+				(self._actors_by_id.values(), self._actors_at),
+				(self._items_by_id.values(), self._items_at),
+				(self._portals, self._portals_at),
+				(self._triggers, self._triggers_at),
+				):
+			for obj_at_pos in layer:
+				self._index_object(index, obj_at_pos)
+		for obj_at_pos in self._actors_by_id.values():
+			self._index_object(self._actors_by_name, obj_at_pos, obj_at_pos.obj.name)
+		self._player = self._find_player()
+	def _find_player(self):
+		return next((_ for _ in self._actors_by_id.values() if isinstance(_.obj, actor.Player)), None)
+	@staticmethod
+	def _index_object(index, obj_at_pos, key=None):
+		""" Adds object to the index under given key (position by default). """
+		key = tuple(obj_at_pos.pos) if key is None else key
+		index.setdefault(key, []).append(obj_at_pos)
+	@staticmethod
+	def _unindex_object(index, obj_at_pos, key=None):
+		""" Removes object from the index by given key (position by default). """
+		key = tuple(obj_at_pos.pos) if key is None else key
+		bucket = index[key]
+		bucket.remove(obj_at_pos)
+		if not bucket:
+			del index[key]
+	def _add_object(self, layer, index, pos, obj):
+		obj_at_pos = ObjectAtPos(pos, obj)
+		layer[id(obj)] = obj_at_pos
+		self._index_object(index, obj_at_pos)
+		return obj_at_pos
+	def _remove_object(self, layer, index, obj):
+		obj_at_pos = layer.pop(id(obj), None)
+		if obj_at_pos is not None:
+			self._unindex_object(index, obj_at_pos)
+		return obj_at_pos
+	def _add_fixed_object(self, layer, index, pos, obj):
+		""" Adds object that is never removed (portals, triggers) to a plain list layer. """
+		obj_at_pos = ObjectAtPos(pos, obj)
+		layer.append(obj_at_pos)
+		self._index_object(index, obj_at_pos)
+	def _objects_at(self, index, pos):
+		return index.get(tuple(pos), ())
 	def get_size(self):
 		return self._tiles.size
+	def get_terrain_revision(self):
+		""" Returns number that changes every time terrain is modified (see set_tile).
+		Can be used to detect changes, e.g. to update cached views of the terrain.
+		"""
+		return self._terrain_revision
+	def get_portal_revision(self):
+		""" Returns number that changes every time portal is added (see add_portal). """
+		return self._portal_revision
 	@typed((Point, tuple, list), Terrain)
 	def set_tile(self, pos, tile):
 		self._tiles.set_cell(pos, tile)
+		self._terrain_revision += 1
+		if self._regions is not None:
+			x, y = pos
+			self._regions.set_passable(x, y, tile.passable)
 	@typed((Point, tuple, list))
 	def get_tile(self, pos):
 		return self._tiles.cell(pos)
+	def _get_regions(self):
+		if self._regions is None:
+			self._regions = Regions(
+					(tile.passable for tile in self._tiles.values()),
+					self._tiles.width, self._tiles.height,
+					)
+		return self._regions
+	@typed((Point, tuple, list))
+	def get_region(self, pos):
+		""" Returns ID of connected region of passable terrain that contains given position.
+		Returns 0 for impassable tiles.
+		Actors and other objects are not considered.
+		"""
+		if not self._tiles.valid(pos):
+			raise KeyError('Invalid map position: {0}'.format(Point(pos)))
+		x, y = pos
+		return self._get_regions().get_label(x, y)
+	@typed((Point, tuple, list), (Point, tuple, list))
+	def is_connected(self, pos_a, pos_b):
+		""" Returns True if both positions are passable and can be reached from each other
+		on this map (terrain only, actors are not considered).
+		"""
+		region = self.get_region(pos_a)
+		return region != 0 and region == self.get_region(pos_b)
 	@typed((Point, tuple, list), (NPC, Player))
 	def add_actor(self, pos, actor):
 		""" Places actor on specified position. """
-		self._actors.append(ObjectAtPos(pos, actor))
+		obj_at_pos = self._add_object(self._actors_by_id, self._actors_at, pos, actor)
+		self._index_object(self._actors_by_name, obj_at_pos, actor.name)
+		if self._player is None and isinstance(actor, Player):
+			self._player = obj_at_pos
+		if self._actor_listener is not None:
+			self._actor_listener(actor.name, True)
 	@typed((NPC, Player))
 	def remove_actor(self, actor):
 		""" Removes specified actor from the map.
 		Returns actor object.
 		Returns None if no such actor is found.
 		"""
-		actor_index = next((i for i, other in enumerate(self._actors) if other.obj == actor), None)
-		if actor_index is not None:
-			del self._actors[actor_index]
+		obj_at_pos = self._remove_object(self._actors_by_id, self._actors_at, actor)
+		if obj_at_pos is not None:
+			name = actor.name
+			if obj_at_pos not in self._actors_by_name.get(name, ()): # Actor was renamed after placing.
+				name = next(key for key, bucket in self._actors_by_name.items() if obj_at_pos in bucket)
+			self._unindex_object(self._actors_by_name, obj_at_pos, name)
+			if obj_at_pos is self._player:
+				self._player = self._find_player()
+			if self._actor_listener is not None:
+				self._actor_listener(name, False)
 		return actor
+	@typed((NPC, Player), (Point, tuple, list))
+	def move_actor(self, actor, new_pos):
+		""" Moves actor to the new position on the same map.
+		Does not check terrain or other actors and does not activate triggers.
+		Raises KeyError if new position is outside of the map or actor is not on the map.
+		"""
+		if not self._tiles.valid(new_pos):
+			raise KeyError('Invalid map position: {0}'.format(Point(new_pos)))
+		obj_at_pos = self._actors_by_id.get(id(actor))
+		if obj_at_pos is None:
+			raise KeyError('Actor is not on the map: {0}'.format(actor.name))
+		self._unindex_object(self._actors_at, obj_at_pos)
+		obj_at_pos.pos = Point(new_pos)
+		self._index_object(self._actors_at, obj_at_pos)
 	@typed(str)
 	def find_actor(self, name):
 		""" Returns actor with given name.
 		Returns None if no such actor is found.
 		"""
-		return next((other.obj for other in self._actors if other.obj.name == name), None)
+		found = self._actors_by_name.get(name)
+		return found[0].obj if found else None
 	@typed(str)
 	def find_actor_pos(self, name):
 		""" Returns location of actor with given name.
 		Returns None if no such actor is found.
 		"""
-		return next((other.pos for other in self._actors if other.obj.name == name), None)
+		found = self._actors_by_name.get(name)
+		return found[0].pos if found else None
 	@typed((Point, tuple, list), Portal)
 	def add_portal(self, pos, portal):
 		""" Places a portal at the specified position. """
-		self._portals.append(ObjectAtPos(pos, portal))
+		self._add_fixed_object(self._portals, self._portals_at, pos, portal)
+		self._portal_revision += 1
+	def iter_portals(self):
+		""" Iterate over placed portals.
+		Yields pairs (pos, portal).
+		"""
+		return ((_.pos, _.obj) for _ in self._portals)
 	@typed((Point, tuple, list), Trigger)
 	def add_trigger(self, pos, trigger):
 		""" Places a trigger at the specified position. """
-		self._triggers.append(ObjectAtPos(pos, trigger))
+		self._add_fixed_object(self._triggers, self._triggers_at, pos, trigger)
 	@typed((Point, tuple, list), Item)
 	def add_item(self, pos, item):
 		""" Places item on specified position. """
-		self._items.append(ObjectAtPos(pos, item))
+		self._add_object(self._items_by_id, self._items_at, pos, item)
 	@typed((Point, tuple, list))
 	def items_at_pos(self, pos):
 		""" Returns list of items at specified location. """
-		return [_.obj for _ in self._items if _.pos == pos]
+		return [_.obj for _ in self._objects_at(self._items_at, pos)]
 	@typed(Item)
 	def remove_item(self, item):
 		""" Removes specified item from the map.
 		Returns item object.
 		Returns None if no such item is found.
 		"""
-		item_index = next((i for i, other in enumerate(self._items) if other.obj == item), None)
-		if item_index is not None:
-			del self._items[item_index]
+		self._remove_object(self._items_by_id, self._items_at, item)
 		return item
 	@typed((NPC, Player), item=(Item, None), at_pos=(Point, tuple, list, None))
 	def pick_item(self, actor, item=None, at_pos=None):
@@ -160,8 +368,11 @@ class Map:
 
 		Performs all available triggers if any are set on destination tile (like portals).
 		Requires reference to the trigger registry for that (see details in Trigger).
+		Does nothing if there is no player on the map.
 		"""
-		player = next(_ for _ in self._actors if isinstance(_.obj, actor.Player))
+		player = self._player
+		if player is None:
+			return
 		if isinstance(shift, actor.Direction):
 			direction = shift
 			shift = direction.get_shift()
@@ -173,33 +384,70 @@ class Map:
 			return
 		if not self._tiles.cell(new_pos).passable:
 			return
-		other_actor = next((other.obj for other in self._actors if other.pos == new_pos), None)
+		other_actor = next((other.obj for other in self._objects_at(self._actors_at, new_pos)), None)
 		if other_actor:
 			other_actor.on_interaction(trigger_registry, quest_registry)
 			return
-		portal = next((portal.obj for portal in self._portals if portal.pos == new_pos), None)
+		portal = next((portal.obj for portal in self._objects_at(self._portals_at, new_pos)), None)
 		if portal:
 			raise Portalling(portal, player.obj)
+		self._unindex_object(self._actors_at, player)
 		player.pos = new_pos
+		self._index_object(self._actors_at, player)
 
-		trigger = next((trigger.obj for trigger in self._triggers if trigger.pos == new_pos), None)
+		trigger = next((trigger.obj for trigger in self._objects_at(self._triggers_at, new_pos)), None)
 		if trigger:
 			if isinstance(trigger, QuestStateChange):
 				trigger.activate(quest_registry, trigger_registry)
 			else:
 				trigger.activate(trigger_registry)
-	def iter_tiles(self):
+	def get_player_pos(self):
+		""" Returns location of the player character.
+		Returns None if there is no player on the map.
+		"""
+		return self._player.pos if self._player is not None else None
+	def _clip_ranges(self, rect):
+		""" Returns pair of ranges (xs, ys) of coordinates within given rect that are valid for this map. """
+		rect = Rect(rect)
+		return (
+				range(max(0, rect.left), min(self._tiles.width, rect.right + 1)),
+				range(max(0, rect.top), min(self._tiles.height, rect.bottom + 1)),
+				)
+	def _clip_rect(self, rect):
+		""" Returns list of positions within given rect (row by row) that are valid for this map. """
+		xs, ys = self._clip_ranges(rect)
+		return [Point(x, y) for y in ys for x in xs]
+	def _iter_objects_in_rect(self, index, rect):
+		for pos in self._clip_rect(rect):
+			for obj_at_pos in self._objects_at(index, pos):
+				yield obj_at_pos.pos, obj_at_pos.obj
+	@typed(rect=(Rect, tuple, list, None))
+	def iter_tiles(self, rect=None):
 		""" Iterates over tiles.
 		Yields pairs (pos, tile).
+		If rect is specified, only tiles within that rect are processed.
 		"""
-		return ((pos, self._tiles.cell(pos)) for pos in self._tiles)
-	def iter_actors(self):
+		tiles = self._tiles
+		if rect is not None:
+			xs, ys = self._clip_ranges(rect)
+		else:
+			xs, ys = range(tiles.width), range(tiles.height)
+		return ((Point(x, y), tiles.cell_xy(x, y)) for y in ys for x in xs)
+	@typed(rect=(Rect, tuple, list, None))
+	def iter_actors(self, rect=None):
 		""" Iterate over placed actors (characters, monsters).
 		Yields pairs (pos, actor).
+		If rect is specified, only actors within that rect are processed (row by row, using position index).
 		"""
-		return ((_.pos, _.obj) for _ in self._actors)
-	def iter_items(self):
+		if rect is not None:
+			return self._iter_objects_in_rect(self._actors_at, rect)
+		return ((_.pos, _.obj) for _ in self._actors_by_id.values())
+	@typed(rect=(Rect, tuple, list, None))
+	def iter_items(self, rect=None):
 		""" Iterate over placed items.
 		Yields pairs (pos, item).
+		If rect is specified, only items within that rect are processed (row by row, using position index).
 		"""
-		return ((_.pos, _.obj) for _ in self._items)
+		if rect is not None:
+			return self._iter_objects_in_rect(self._items_at, rect)
+		return ((_.pos, _.obj) for _ in self._items_by_id.values())
@@ -0,0 +1,154 @@
+""" Path search and reachability over map passability.
+"""
+import array
+import heapq
+from ..math import ArrayMatrix, Point
+from ..utils.meta import typed
+from .map import Map
+from .regions import orthogonal_neighbours
+
+class Pathfinder:
+	""" Finds paths on a level map.
+
+	Movement is orthogonal (single-tile steps, see Direction).
+	Tile is considered passable if its terrain is passable and it is not occupied by an actor.
+
+	Passability grid of terrain is cached and re-built only when terrain changes (see Map.get_terrain_revision).
+	Search buffers are allocated once per map size and reused between searches,
+	so repeated searches (e.g. for every NPC on every turn) do not allocate per-cell data.
+	"""
+	@typed(Map)
+	def __init__(self, level_map):
+		""" Creates pathfinder for the given map. """
+		self._level_map = level_map
+		self._grid = None
+		self._grid_revision = None
+		self._generation = 0
+		self._stamps = None
+		self._costs = None
+		self._came_from = None
+	def get_passability(self):
+		""" Returns ArrayMatrix of terrain passability (1 for passable tiles, 0 for obstacles).
+		Actors are not considered.
+		Returned matrix is cached and should not be modified.
+		"""
+		revision = self._level_map.get_terrain_revision()
+		if self._grid is not None and self._grid_revision == revision:
+			return self._grid
+		grid = ArrayMatrix(self._level_map.get_size(), typecode='b')
+		grid.data = array.array('b', (tile.passable for _, tile in self._level_map.iter_tiles()))
+		self._grid = grid
+		self._grid_revision = revision
+		return self._grid
+	def _get_occupied(self, ignore_actors):
+		""" Returns set of cell indices that are occupied by actors. """
+		if ignore_actors:
+			return frozenset()
+		width = self._level_map.get_size().width
+		return {pos.x + pos.y * width for pos, _ in self._level_map.iter_actors()}
+	def _start_search(self, grid):
+		""" Prepares reusable buffers for the new search.
+		Instead of clearing buffers, every search gets its own generation number:
+		cell data is valid only if cell's stamp equals to the current generation.
+		"""
+		size = grid.width * grid.height
+		if self._stamps is None or len(self._stamps) != size:
+			self._stamps = array.array('q', [0]) * size
+			self._costs = array.array('q', [0]) * size
+			self._came_from = array.array('q', [0]) * size
+			self._generation = 0
+		self._generation += 1
+		return self._generation
+	def _index(self, grid, pos):
+		if not grid.valid(pos):
+			raise KeyError('Invalid map position: {0}'.format(Point(pos)))
+		x, y = pos
+		return x + y * grid.width
+	@typed((Point, tuple, list), (Point, tuple, list), ignore_actors=bool)
+	def find_path(self, start, goal, ignore_actors=False):
+		""" Finds shortest path from start to goal using A* search.
+		Returns list of positions for every step (start is not included, goal is included),
+		empty list if start is the goal itself, or None if goal is not reachable.
+		Start tile is not checked for passability (usually it is occupied by the moving actor itself),
+		goal tile is not checked for actors (so path to another actor can be found).
+		If ignore_actors is True, only terrain is considered.
+		Raises KeyError if positions are outside of the map.
+		"""
+		grid = self.get_passability()
+		width, height = grid.width, grid.height
+		start_index, goal_index = self._index(grid, start), self._index(grid, goal)
+		if start_index == goal_index:
+			return []
+		passable = grid.data
+		if not passable[goal_index]:
+			return None
+		occupied = self._get_occupied(ignore_actors)
+		generation = self._start_search(grid)
+		stamps, costs, came_from = self._stamps, self._costs, self._came_from
+		goal_x, goal_y = goal
+
+		stamps[start_index] = generation
+		costs[start_index] = 0
+		came_from[start_index] = -1
+		# Heap entries are (estimated total cost, -cost, cell index).
+		# Ties are resolved in favor of cells that are further from the start (and closer to the goal),
+		# which greatly reduces number of explored cells on open areas.
+		heap = [(0, 0, start_index)]
+		while heap:
+			_, negative_cost, index = heapq.heappop(heap)
+			if index == goal_index:
+				break
+			if -negative_cost > costs[index]:
+				continue # Outdated heap entry, cell was reached by a shorter path already.
+			cost = 1 - negative_cost
+			for neighbour in orthogonal_neighbours(index, width, height):
+				if stamps[neighbour] == generation and costs[neighbour] <= cost:
+					continue
+				if not passable[neighbour] or (neighbour in occupied and neighbour != goal_index):
+					continue
+				stamps[neighbour] = generation
+				costs[neighbour] = cost
+				came_from[neighbour] = index
+				estimate = abs(neighbour % width - goal_x) + abs(neighbour // width - goal_y)
+				heapq.heappush(heap, (cost + estimate, -cost, neighbour))
+		else:
+			return None
+
+		path = []
+		index = goal_index
+		while index != start_index:
+			path.append(Point(index % width, index // width))
+			index = came_from[index]
+		path.reverse()
+		return path
+	@typed((Point, tuple, list), ignore_actors=bool)
+	def flood_fill(self, start, ignore_actors=False):
+		""" Returns set of all positions reachable from start (including start itself).
+		Start tile is not checked for passability.
+		If ignore_actors is True, only terrain is considered.
+		Raises KeyError if start is outside of the map.
+		"""
+		grid = self.get_passability()
+		width, height = grid.width, grid.height
+		start_index = self._index(grid, start)
+		passable = grid.data
+		occupied = self._get_occupied(ignore_actors)
+		generation = self._start_search(grid)
+		stamps = self._stamps
+
+		stamps[start_index] = generation
+		reached = [start_index]
+		frontier = [start_index]
+		while frontier:
+			index = frontier.pop()
+			for neighbour in orthogonal_neighbours(index, width, height):
+				if stamps[neighbour] == generation or not passable[neighbour] or neighbour in occupied:
+					continue
+				stamps[neighbour] = generation
+				reached.append(neighbour)
+				frontier.append(neighbour)
+		return {Point(index % width, index // width) for index in reached}
+	@typed((Point, tuple, list), (Point, tuple, list), ignore_actors=bool)
+	def is_reachable(self, start, goal, ignore_actors=False):
+		""" Returns True if goal can be reached from start (see find_path for details). """
+		return self.find_path(start, goal, ignore_actors=ignore_actors) is not None
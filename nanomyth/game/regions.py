@@ -0,0 +1,182 @@
+""" Connected regions of passable terrain.
+"""
+import array
+
+def orthogonal_neighbours(index, width, height):
+	""" Returns indices of orthogonal neighbours of the cell
+	in a row-major flat grid of given dimensions.
+	"""
+	x = index % width
+	neighbours = []
+	if index >= width:
+		neighbours.append(index - width)
+	if index < width * (height - 1):
+		neighbours.append(index + width)
+	if x > 0:
+		neighbours.append(index - 1)
+	if x < width - 1:
+		neighbours.append(index + 1)
+	return neighbours
+
+class Regions:
+	""" Labelling of connected regions (components) of passable cells.
+
+	Every passable cell gets a positive region ID, impassable cells get 0.
+	Two cells are connected by orthogonal steps if and only if they have the same ID.
+	Labels are updated incrementally when passability of a single cell changes,
+	only regions adjacent to the changed cell are re-labelled.
+	"""
+	def __init__(self, passability, width, height):
+		""" Creates labelling for row-major flat sequence of passability flags of given dimensions. """
+		self.width, self.height = width, height
+		self._passable = bytearray(map(bool, passability))
+		self._labels = array.array('i', [0]) * (width * height)
+		self._sizes = {}
+		self._next_label = 1
+		for index, passable in enumerate(self._passable):
+			if passable and not self._labels[index]:
+				self._fill(index, self._new_label())
+	def _new_label(self):
+		label = self._next_label
+		self._next_label += 1
+		return label
+	def _fill(self, start, label):
+		""" Labels the whole connected region that contains start cell. """
+		passable, labels = self._passable, self._labels
+		width, height = self.width, self.height
+		old_label = labels[start]
+		labels[start] = label
+		size = 1
+		frontier = [start]
+		while frontier:
+			index = frontier.pop()
+			for neighbour in orthogonal_neighbours(index, width, height):
+				if passable[neighbour] and labels[neighbour] == old_label:
+					labels[neighbour] = label
+					frontier.append(neighbour)
+					size += 1
+		if old_label:
+			self._sizes[old_label] -= size
+			if not self._sizes[old_label]:
+				del self._sizes[old_label]
+		self._sizes[label] = self._sizes.get(label, 0) + size
+	def get_label(self, x, y):
+		""" Returns region ID of the cell (0 for impassable cell). """
+		return self._labels[x + y * self.width]
+	def get_region_size(self, label):
+		""" Returns number of cells in the region. """
+		return self._sizes.get(label, 0)
+	def set_passable(self, x, y, passable):
+		""" Updates labelling after passability of the cell has changed. """
+		index = x + y * self.width
+		passable = bool(passable)
+		if self._passable[index] == passable:
+			return
+		self._passable[index] = passable
+		labels = self._labels
+		neighbours = [neighbour for neighbour in orthogonal_neighbours(index, self.width, self.height) if labels[neighbour]]
+		if passable:
+			# New cell joins the largest adjacent region, smaller ones are merged into it.
+			adjacent = sorted(set(labels[neighbour] for neighbour in neighbours), key=self.get_region_size, reverse=True)
+			if not adjacent:
+				label = self._new_label()
+				labels[index] = label
+				self._sizes[label] = 1
+				return
+			label = adjacent[0]
+			labels[index] = label
+			self._sizes[label] += 1
+			for neighbour in neighbours:
+				if labels[neighbour] != label:
+					self._fill(neighbour, label)
+		else:
+			label = labels[index]
+			labels[index] = 0
+			self._sizes[label] -= 1
+			if not self._sizes[label]:
+				del self._sizes[label]
+			if len(neighbours) > 1 and not self._are_connected_around(index):
+				self._split(neighbours, label)
+	def _are_connected_around(self, index):
+		""" Fast local check: returns True if all passable orthogonal neighbours of the cell
+		are connected to each other via passable cells of the 3x3 ring around it.
+		"""
+		width, height = self.width, self.height
+		x, y = index % width, index // width
+		ring = [(-1, -1), (0, -1), (1, -1), (1, 0), (1, 1), (0, 1), (-1, 1), (-1, 0)]
+		passable = [
+				0 <= x + dx < width and 0 <= y + dy < height and self._passable[index + dx + dy * width]
+				for dx, dy in ring
+				]
+		# Orthogonal neighbours are at odd places of the ring.
+		# Count separate arcs of passable cells that contain orthogonal neighbours.
+		start = next((i for i in range(8) if not passable[i]), None)
+		if start is None:
+			return True
+		arcs = 0
+		in_arc, arc_has_neighbour = False, False
+		for i in range(start, start + 8):
+			if passable[i % 8]:
+				in_arc = True
+				arc_has_neighbour = arc_has_neighbour or i % 2 == 1
+			elif in_arc:
+				arcs += arc_has_neighbour
+				in_arc, arc_has_neighbour = False, False
+		arcs += in_arc and arc_has_neighbour
+		return arcs <= 1
+	def _split(self, neighbours, label):
+		""" Re-labels parts of the region that are no longer connected after removal of a cell.
+		Searches from all neighbours are run in parallel (one cell at a time)
+		and merged when they meet, so only the separated parts are fully traversed
+		(the largest part keeps the original label without being traversed till the end).
+		"""
+		passable, labels = self._passable, self._labels
+		width, height = self.width, self.height
+		owners = {}
+		searches = []
+		for neighbour in neighbours:
+			search = _Search(neighbour)
+			owners[neighbour] = search
+			searches.append(search)
+		while len(searches) > 1:
+			for search in list(searches):
+				if search.merged:
+					continue
+				if not search.frontier:
+					# Separated part is fully traversed.
+					searches.remove(search)
+					new_label = self._new_label()
+					for cell in search.cells:
+						labels[cell] = new_label
+					self._sizes[label] -= len(search.cells)
+					self._sizes[new_label] = len(search.cells)
+					if len(searches) == 1:
+						break
+					continue
+				index = search.frontier.pop()
+				for neighbour in orthogonal_neighbours(index, width, height):
+					if not passable[neighbour]:
+						continue
+					other = owners.get(neighbour)
+					if other is None:
+						owners[neighbour] = search
+						search.cells.append(neighbour)
+						search.frontier.append(neighbour)
+					elif other is not search:
+						# Searches have met, so they belong to the same part.
+						if len(other.cells) > len(search.cells):
+							search, other = other, search
+						for cell in other.cells:
+							owners[cell] = search
+						search.cells.extend(other.cells)
+						search.frontier.extend(other.frontier)
+						other.merged = True
+						searches.remove(other)
+
+class _Search:
+	""" State of a single flood fill for Regions._split """
+	__slots__ = ('cells', 'frontier', 'merged')
+	def __init__(self, start):
+		self.cells = [start]
+		self.frontier = [start]
+		self.merged = False
@@ -6,6 +6,7 @@ from ..map import Map, Terrain, Portal, Trigger
 from ..actor import Player, Direction
 from ..items import Item
 from ..quest import Quest
+from ...math import Point
 from .. import savegame
 
 def _create_game():
@@ -37,7 +38,7 @@ class TestGame(unittest.TestCase):
 		game.load_world(_create_game().get_world())
 		self.assertEqual(
 				game.get_world().get_current_map().get_tile((0, 0)).get_images(),
-				['floor'],
+				('floor',),
 				)
 		self.assertEqual(on_change_map.data, [(game.get_world().get_current_map(),)])
 	def should_have_global_registry_for_triggers(self):
@@ -84,3 +85,22 @@ class TestSaveGame(fake_filesystem_unittest.TestCase):
 		self.assertTrue(game.save_to_file.__wrapped__(game, savefile, force=True))
 		self.assertTrue(game.load_from_file.__wrapped__(game, savefile))
 		self.assertWorldsEqual(game.get_world(), expected_world)
+	def should_keep_map_loaders_after_loading_game(self):
+		game = Game()
+		game.get_world().register_map('home', lambda: Map((5, 5)))
+		game.get_world().register_map('desert', lambda: Map((5, 5)))
+		game.get_world().register_map('cellar', lambda: Map((5, 5)))
+		game.get_world().set_memory_budget(25)
+		game.get_world().get_current_map().add_actor((2, 2), Player('Wanderer', 'rogue'))
+		game.get_world().get_map('desert').add_item((1, 1), Item('knife', 'knife'))
+		game.get_world().set_current_map('desert')
+		game.get_world().get_map('cellar')
+		self.assertFalse(game.get_world().is_map_loaded('home'))
+
+		savefile = savegame.JsonpickleSavefile('/game.sav')
+		self.assertTrue(game.save_to_file.__wrapped__(game, savefile))
+		self.assertTrue(game.load_from_file.__wrapped__(game, savefile))
+		world = game.get_world()
+		self.assertEqual(world.get_map('home').find_actor_pos('Wanderer'), Point(2, 2))
+		self.assertEqual([item.name for _, item in world.get_map('desert').iter_items()], ['knife'])
+		self.assertEqual(world.get_map('cellar').get_size(), (5, 5))
@@ -139,7 +139,7 @@ class TestManualContent(unittest.TestCase):
 		del self.game
 	def should_add_content_manually_and_control_game_model_directly(self):
 		# Look around.
-		self.assertEqual([_.get_images() for _pos, _ in self.game.get_world().get_current_map().iter_tiles()], [
+		self.assertEqual([list(_.get_images()) for _pos, _ in self.game.get_world().get_current_map().iter_tiles()], [
 			['wall'], ['wall', 'window'], ['wall'], ['wall'],
 			['wall'], ['floor', 'computer'], ['floor', 'teleport'], ['wall'],
 			['wall'], ['floor'], ['floor'], ['wall'],
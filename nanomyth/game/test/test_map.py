@@ -1,22 +1,102 @@
+import sys
+import copy
 import itertools
+import pickle
+import subprocess
+from pathlib import Path
+try:
+	import jsonpickle
+except ImportError: # pragma: no cover
+	jsonpickle = None
 from ...utils import unittest
-from ..map import Map, Terrain, Trigger
+from ..map import Map, Terrain, Trigger, Portal
 from ..items import Item
 from ..actor import Player, Direction, NPC
 from ..quest import QuestStateChange
-from ...math import Point, Size
+from ...math import Point, Size, Rect
+
+# Map saved by JsonpickleSavefile before indices were introduced.
+LEGACY_JSON_MAP = '''{"py/object": "nanomyth.game.map.Map", "_tiles": {"py/object": "nanomyth.math.matrix.Matrix", "dims": {"py/object": "nanomyth.math.vector.Size", "py/state": [2, 2]}, "data": [{"py/object": "nanomyth.game.map.Terrain", "_images": [], "_passable": true}, {"py/object": "nanomyth.game.map.Terrain", "_images": ["wall"], "_passable": false}, {"py/object": "nanomyth.game.map.Terrain", "_images": [], "_passable": true}, {"py/object": "nanomyth.game.map.Terrain", "_images": [], "_passable": true}]}, "_actors": [{"py/object": "nanomyth.math.mapping.ObjectAtPos", "py/state": {"pos": {"py/object": "nanomyth.math.vector.Point", "py/state": [0, 0]}, "obj": {"py/object": "nanomyth.game.actor.Player", "_name": "Wanderer", "_default_sprite": "rogue", "_directional_sprites": {}, "_direction": {"py/reduce": [{"py/type": "nanomyth.game.actor.Direction"}, {"py/tuple": [1]}]}, "_inventory": {"py/object": "nanomyth.game.items.Inventory", "_items": []}}}}, {"py/object": "nanomyth.math.mapping.ObjectAtPos", "py/state": {"pos": {"py/object": "nanomyth.math.vector.Point", "py/state": [0, 1]}, "obj": {"py/object": "nanomyth.game.actor.NPC", "_name": "Farmer", "_sprite": "farmer", "_trigger": null}}}], "_items": [{"py/object": "nanomyth.math.mapping.ObjectAtPos", "py/state": {"pos": {"py/object": "nanomyth.math.vector.Point", "py/state": [1, 1]}, "obj": {"py/object": "nanomyth.game.items.Item", "_name": "knife", "_sprite": "knife"}}}], "_portals": [], "_triggers": []}'''
 
 class TestMap(unittest.TestCase):
 	def should_create_map_of_empty_tiles(self):
 		level_map = Map((5, 5))
-		self.assertEqual(level_map.get_tile((0, 0)).get_images(), [])
+		self.assertEqual(level_map.get_tile((0, 0)).get_images(), ())
 		self.assertEqual(level_map.get_size(), Size(5, 5))
 	def should_access_tiles(self):
 		level_map = Map((5, 5))
 		level_map.set_tile((1, 0), Terrain(['grass']))
-		self.assertEqual(level_map.get_tile((1, 0)).get_images(), ['grass'])
+		self.assertEqual(level_map.get_tile((1, 0)).get_images(), ('grass',))
 		level_map.set_tile((1, 1), Terrain(['grass', 'tree']))
-		self.assertEqual(level_map.get_tile((1, 1)).get_images(), ['grass', 'tree'])
+		self.assertEqual(level_map.get_tile((1, 1)).get_images(), ('grass', 'tree'))
+	def should_track_terrain_changes(self):
+		level_map = Map((5, 5))
+		revision = level_map.get_terrain_revision()
+		level_map.set_tile((1, 0), Terrain(['grass']))
+		self.assertNotEqual(level_map.get_terrain_revision(), revision)
+		revision = level_map.get_terrain_revision()
+		level_map.add_item((1, 0), Item('knife', 'knife'))
+		self.assertEqual(level_map.get_terrain_revision(), revision)
+		self.assertNotIn('_terrain_revision', level_map.__getstate__())
+		revision = level_map.get_portal_revision()
+		level_map.add_portal((1, 0), Portal('other', (0, 0)))
+		self.assertNotEqual(level_map.get_portal_revision(), revision)
+		self.assertNotIn('_portal_revision', level_map.__getstate__())
+	def should_share_similar_terrain_tiles(self):
+		grass = Terrain(['grass'])
+		self.assertIs(Terrain(['grass']), grass)
+		self.assertIsNot(Terrain(['grass'], passable=False), grass)
+		self.assertIsNot(Terrain(['grass', 'tree']), grass)
+		self.assertEqual(grass.get_images(), ('grass',))
+
+		level_map = Map((5, 5))
+		level_map.set_tile((1, 0), Terrain(['grass']))
+		restored = pickle.loads(pickle.dumps(level_map))
+		self.assertIs(restored.get_tile((1, 0)), grass)
+		self.assertIs(restored.get_tile((0, 0)), level_map.get_tile((0, 0)))
+		self.assertIs(copy.copy(grass), grass)
+		self.assertIs(copy.deepcopy(grass), grass)
+		self.assertIs(level_map.get_tile((2, 2)), level_map.get_tile((4, 4)))
+	def should_unpickle_terrain_in_fresh_process(self):
+		level_map = Map((2, 1))
+		level_map.set_tile((1, 0), Terrain(['fresh process wall'], passable=False))
+		script = '; '.join([
+			'import pickle, sys',
+			'level_map = pickle.loads(sys.stdin.buffer.read())',
+			'print([(tile.get_images(), tile.passable) for _, tile in level_map.iter_tiles()])',
+			])
+		output = subprocess.run([sys.executable, '-c', script],
+				input=pickle.dumps(level_map), stdout=subprocess.PIPE, check=True,
+				cwd=str(Path(__file__).resolve().parents[3]),
+				).stdout
+		self.assertEqual(output.decode().strip(), "[((), True), (('fresh process wall',), False)]")
+	def should_restore_terrain_from_legacy_state(self):
+		legacy = Terrain.__new__(Terrain)
+		legacy.__setstate__({'_images' : ['grass'], '_passable' : False})
+		self.assertEqual(legacy.get_images(), ('grass',))
+		self.assertFalse(legacy.passable)
+		self.assertIsNot(legacy, Terrain(['grass'], passable=False))
+	def should_track_connected_regions(self):
+		level_map = Map((5, 3))
+		level_map.add_portal((4, 2), Portal('other', (0, 0)))
+		self.assertEqual([pos for pos, _ in level_map.iter_portals()], [Point(4, 2)])
+		wall = Terrain(['wall'], passable=False)
+		for y in range(3):
+			level_map.set_tile((2, y), wall)
+		self.assertTrue(level_map.is_connected((0, 0), (1, 2)))
+		self.assertFalse(level_map.is_connected((0, 0), (4, 2)))
+		self.assertFalse(level_map.is_connected((0, 0), (2, 0)))
+		self.assertEqual(level_map.get_region((2, 1)), 0)
+		with self.assertRaises(KeyError):
+			level_map.get_region((5, 0))
+
+		level_map.set_tile((2, 1), Terrain(['floor']))
+		self.assertTrue(level_map.is_connected((0, 0), (4, 2)))
+		restored = pickle.loads(pickle.dumps(level_map))
+		self.assertNotIn('_regions', level_map.__getstate__())
+		self.assertTrue(restored.is_connected((0, 0), (4, 2)))
+		restored.set_tile((2, 1), wall)
+		self.assertFalse(restored.is_connected((0, 0), (4, 2)))
 	def should_iterate_over_tiles(self):
 		level_map = Map((5, 5))
 		expected = []
@@ -24,7 +104,7 @@ class TestMap(unittest.TestCase):
 			image_name = '{0}x{1}'.format(x, y)
 			expected.append([image_name])
 			level_map.set_tile((x, y), Terrain([image_name]))
-		tiles = [(['{0}x{1}'.format(pos.x, pos.y)], tile.get_images()) for (pos, tile) in level_map.iter_tiles()]
+		tiles = [(['{0}x{1}'.format(pos.x, pos.y)], list(tile.get_images())) for (pos, tile) in level_map.iter_tiles()]
 		positions, actual_images = zip(*tiles)
 		self.assertEqual(list(actual_images), expected)
 		self.assertEqual(list(positions), expected)
@@ -58,6 +138,33 @@ class TestMap(unittest.TestCase):
 		level_map.add_actor((2, 2), Player('Wanderer', 'rogue'))
 		level_map.remove_actor(level_map.find_actor('Wanderer'))
 		self.assertIsNone(level_map.find_actor('Wanderer'))
+	def should_move_actors(self):
+		level_map = Map((5, 5))
+		farmer = NPC('Farmer', 'farmer')
+		level_map.add_actor((1, 1), farmer)
+		level_map.move_actor(farmer, (3, 2))
+		self.assertEqual(list(level_map.iter_actors()), [(Point(3, 2), farmer)])
+		self.assertEqual(list(level_map.iter_actors(Rect((0, 0), (3, 3)))), [])
+		self.assertEqual(level_map.find_actor_pos('Farmer'), Point(3, 2))
+		with self.assertRaises(KeyError):
+			level_map.move_actor(farmer, (5, 5))
+		with self.assertRaises(KeyError):
+			level_map.move_actor(NPC('Absent', 'ghost'), (0, 0))
+	def should_find_actors_by_name_after_removal_of_namesakes(self):
+		level_map = Map((5, 5))
+		first, second = NPC('Farmer', 'npc'), NPC('Farmer', 'npc')
+		level_map.add_actor((1, 1), first)
+		level_map.add_actor((2, 2), second)
+		self.assertIs(level_map.find_actor('Farmer'), first)
+		level_map.remove_actor(first)
+		self.assertIs(level_map.find_actor('Farmer'), second)
+		self.assertEqual(level_map.find_actor_pos('Farmer'), Point(2, 2))
+
+		second.name = 'Renamed'
+		level_map.remove_actor(second)
+		self.assertIsNone(level_map.find_actor('Farmer'))
+		self.assertEqual(level_map._actors_by_name, {})
+		self.assertIs(level_map.remove_actor(second), second)
 	def should_shift_player(self):
 		level_map = Map((5, 5))
 		player = Player('Wanderer', 'rogue', directional_sprites={
@@ -249,3 +356,78 @@ class TestMap(unittest.TestCase):
 		self.assertEqual(level_map.drop_item(player, bag_of_gold), bag_of_gold)
 		self.assertEqual([_.name for _ in level_map.items_at_pos((2, 2))], ['sword', 'bag of gold'])
 		self.assertEqual(list(player.iter_inventory()), [])
+	def should_keep_position_index_in_sync(self):
+		level_map = Map((5, 5))
+		player = Player('Wanderer', 'rogue')
+		level_map.add_actor((2, 2), player)
+		level_map.add_item((2, 1), Item('sword', 'sword'))
+		level_map.shift_player(Direction.UP)
+		self.assertEqual(level_map._actors_at, {(2, 1): [level_map._player]})
+		level_map.shift_player(Direction.LEFT)
+		self.assertEqual(level_map._actors_at, {(1, 1): [level_map._player]})
+		level_map.remove_actor(player)
+		self.assertEqual(level_map._actors_at, {})
+
+		level_map.add_actor([1, 1], player)
+		restored = pickle.loads(pickle.dumps(level_map))
+		self.assertNotIn('_actors_at', restored.__getstate__())
+		self.assertEqual(restored.find_actor_pos('Wanderer'), Point(1, 1))
+		self.assertEqual([_.name for _ in restored.items_at_pos([2, 1])], ['sword'])
+		self.assertEqual(list(restored._actors_at.keys()), [(1, 1)])
+	def should_keep_reference_to_player(self):
+		level_map = Map((5, 5))
+		level_map.shift_player(Direction.UP)
+		first, second = Player('Wanderer', 'rogue'), Player('Stranger', 'rogue')
+		level_map.add_actor((1, 1), NPC('Farmer', 'npc'))
+		level_map.add_actor((2, 2), first)
+		level_map.add_actor((3, 3), second)
+		self.assertIs(level_map._player.obj, first)
+		level_map.remove_actor(level_map.find_actor('Farmer'))
+		self.assertIs(level_map._player.obj, first)
+		level_map.remove_actor(first)
+		self.assertEqual(level_map.get_player_pos(), Point(3, 3))
+		level_map.remove_actor(second)
+		self.assertIsNone(level_map.get_player_pos())
+	@unittest.skipUnless(jsonpickle, "Jsonpickle is not detected.")
+	def should_restore_indices_for_legacy_json_map(self):
+		level_map = jsonpickle.decode(LEGACY_JSON_MAP, keys=True)
+		self.assertEqual(level_map.find_actor_pos('Farmer'), Point(0, 1))
+		self.assertEqual([_.name for _ in level_map.items_at_pos((1, 1))], ['knife'])
+		self.assertIs(level_map.get_tile((1, 0)), Terrain(['wall'], passable=False))
+		self.assertEqual(level_map.get_tile((1, 0)).get_images(), ('wall',))
+		level_map.shift_player(Direction.RIGHT)
+		self.assertEqual(level_map.get_player_pos(), Point(0, 0))
+		level_map.shift_player(Direction.DOWN)
+		self.assertEqual(level_map.get_player_pos(), Point(0, 0))
+		level_map.remove_actor(level_map.find_actor('Farmer'))
+		level_map.shift_player(Direction.DOWN)
+		self.assertEqual(level_map.get_player_pos(), Point(0, 1))
+		self.assertEqual(level_map.pick_item(level_map.find_actor('Wanderer'), at_pos=(1, 1)).name, 'knife')
+		with self.assertRaises(AttributeError):
+			level_map.absent_field
+	def should_iterate_over_objects_within_rect(self):
+		level_map = Map((5, 5))
+		self.assertIsNone(level_map.get_player_pos())
+		level_map.add_actor((2, 2), Player('Wanderer', 'rogue'))
+		level_map.add_actor((4, 4), NPC('Farmer', 'npc'))
+		level_map.add_item((1, 2), Item('sword', 'sword'))
+		level_map.add_item((1, 2), Item('shield', 'shield'))
+		level_map.add_item((0, 0), Item('key', 'key'))
+		self.assertEqual(level_map.get_player_pos(), Point(2, 2))
+
+		rect = Rect((1, 1), (3, 3))
+		self.assertEqual([pos for pos, _ in level_map.iter_tiles(rect)], [
+			Point(1, 1), Point(2, 1), Point(3, 1),
+			Point(1, 2), Point(2, 2), Point(3, 2),
+			Point(1, 3), Point(2, 3), Point(3, 3),
+			])
+		self.assertEqual([(pos, _.name) for pos, _ in level_map.iter_actors(rect)], [(Point(2, 2), 'Wanderer')])
+		self.assertEqual([(pos, _.name) for pos, _ in level_map.iter_items(rect)], [(Point(1, 2), 'sword'), (Point(1, 2), 'shield')])
+
+		rect = (3, 3, 10, 10)
+		self.assertEqual([pos for pos, _ in level_map.iter_tiles(rect)], [
+			Point(3, 3), Point(4, 3),
+			Point(3, 4), Point(4, 4),
+			])
+		self.assertEqual([(pos, _.name) for pos, _ in level_map.iter_actors(rect)], [(Point(4, 4), 'Farmer')])
+		self.assertEqual(list(level_map.iter_items(rect)), [])
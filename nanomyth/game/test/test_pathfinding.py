@@ -0,0 +1,86 @@
+import textwrap
+from ...utils import unittest
+from ..map import Map, Terrain
+from ..actor import Player, NPC
+from ..pathfinding import Pathfinder
+from ...math import Point
+
+def make_map(layout):
+	""" Creates map from multiline string: '#' is a wall, anything else is floor. """
+	rows = textwrap.dedent(layout).splitlines()
+	level_map = Map((len(rows[0]), len(rows)))
+	for y, row in enumerate(rows):
+		for x, c in enumerate(row):
+			level_map.set_tile((x, y), Terrain(['wall' if c == '#' else 'floor'], passable=(c != '#')))
+	return level_map
+
+class TestPathfinder(unittest.TestCase):
+	def setUp(self):
+		self.level_map = make_map("""\
+				.....
+				.###.
+				...#.
+				##.#.
+				.....
+				""")
+		self.pathfinder = Pathfinder(self.level_map)
+	def should_cache_passability_grid(self):
+		grid = self.pathfinder.get_passability()
+		self.assertEqual(grid.tostring(), '11111\n10001\n11101\n00101\n11111\n')
+		self.assertIs(self.pathfinder.get_passability(), grid)
+		self.level_map.set_tile((0, 0), Terrain(['wall'], passable=False))
+		grid = self.pathfinder.get_passability()
+		self.assertEqual(grid.tostring(), '01111\n10001\n11101\n00101\n11111\n')
+	def should_find_shortest_path(self):
+		self.assertEqual(self.pathfinder.find_path((0, 2), (0, 2)), [])
+		self.assertEqual(self.pathfinder.find_path((0, 2), (2, 4)), [
+			Point(1, 2), Point(2, 2), Point(2, 3), Point(2, 4),
+			])
+		path = self.pathfinder.find_path((0, 0), (4, 4))
+		self.assertEqual(len(path), 8)
+		self.assertEqual(path[-1], Point(4, 4))
+		self.assertEqual(self.pathfinder.find_path((0, 0), (1, 1)), None)
+		with self.assertRaises(KeyError):
+			self.pathfinder.find_path((0, 0), (5, 5))
+	def should_consider_actors_as_obstacles(self):
+		self.level_map.add_actor((2, 3), NPC('Guard', 'guard'))
+		self.level_map.add_actor((0, 2), Player('Wanderer', 'rogue'))
+		path = self.pathfinder.find_path((0, 2), (2, 4))
+		self.assertEqual(path[0], Point(0, 1))
+		self.assertEqual(len(path), 12)
+		self.assertEqual(len(self.pathfinder.find_path((0, 2), (2, 4), ignore_actors=True)), 4)
+		self.assertEqual(self.pathfinder.find_path((0, 2), (2, 3)), [Point(1, 2), Point(2, 2), Point(2, 3)])
+		self.level_map.add_actor((4, 0), NPC('Other guard', 'guard'))
+		self.assertFalse(self.pathfinder.is_reachable((0, 2), (2, 4)))
+		self.assertTrue(self.pathfinder.is_reachable((0, 2), (2, 4), ignore_actors=True))
+	def should_flood_fill_reachable_area(self):
+		level_map = make_map("""\
+				..#..
+				..#..
+				###..
+				""")
+		pathfinder = Pathfinder(level_map)
+		self.assertEqual(pathfinder.flood_fill((0, 0)), {Point(0, 0), Point(1, 0), Point(0, 1), Point(1, 1)})
+		self.assertEqual(len(pathfinder.flood_fill((4, 2))), 6)
+		level_map.add_actor((3, 1), NPC('Guard', 'guard'))
+		level_map.add_actor((4, 1), NPC('Other guard', 'guard'))
+		self.assertEqual(pathfinder.flood_fill((3, 0)), {Point(3, 0), Point(4, 0)})
+		self.assertEqual(len(pathfinder.flood_fill((3, 0), ignore_actors=True)), 6)
+	def should_reuse_search_buffers(self):
+		self.pathfinder.find_path((0, 0), (4, 4))
+		buffers = self.pathfinder._stamps
+		self.pathfinder.flood_fill((0, 0))
+		self.pathfinder.find_path((4, 4), (0, 0))
+		self.assertIs(self.pathfinder._stamps, buffers)
+	def should_find_shortest_path_when_cells_are_reached_again(self):
+		level_map = make_map("""\
+				.###..
+				......
+				.#...#
+				.#...#
+				..##..
+				#.....
+				""")
+		path = Pathfinder(level_map).find_path((4, 0), (1, 4))
+		self.assertEqual(len(path), 9)
+		self.assertEqual(path[-4:], [Point(0, 2), Point(0, 3), Point(0, 4), Point(1, 4)])
@@ -0,0 +1,84 @@
+import random
+from ...utils import unittest
+from ..regions import Regions, orthogonal_neighbours
+
+def parse(layout):
+	""" Returns (passability, width, height) for layout ('#' is a wall). """
+	rows = layout.split()
+	return [c != '#' for row in rows for c in row], len(rows[0]), len(rows)
+
+def dump(regions):
+	""" Returns layout with regions renumbered in order of appearance: 'a', 'b' etc, '#' for impassable cells. """
+	names = {0 : '#'}
+	rows = []
+	for y in range(regions.height):
+		row = ''
+		for x in range(regions.width):
+			label = regions.get_label(x, y)
+			if label not in names:
+				names[label] = chr(ord('a') + len(names) - 1)
+			row += names[label]
+		rows.append(row)
+	return ' '.join(rows)
+
+class TestRegions(unittest.TestCase):
+	def should_list_neighbours(self):
+		self.assertEqual(sorted(orthogonal_neighbours(0, 3, 2)), [1, 3])
+		self.assertEqual(sorted(orthogonal_neighbours(4, 3, 2)), [1, 3, 5])
+	def should_label_connected_regions(self):
+		regions = Regions(*parse('..#. ..#. ##.#'))
+		self.assertEqual(dump(regions), 'aa#b aa#b ##c#')
+		self.assertEqual(regions.get_region_size(regions.get_label(0, 0)), 4)
+		self.assertEqual(regions.get_region_size(0), 0)
+	def should_merge_regions(self):
+		regions = Regions(*parse('..#. ..#. ##.#'))
+		regions.set_passable(2, 1, True)
+		self.assertEqual(dump(regions), 'aa#a aaaa ##a#')
+		self.assertEqual(regions.get_region_size(regions.get_label(0, 0)), 8)
+		regions.set_passable(2, 1, True)
+		self.assertEqual(dump(regions), 'aa#a aaaa ##a#')
+		regions.set_passable(1, 1, False)
+		regions.set_passable(2, 1, False)
+		self.assertEqual(dump(regions), 'aa#b a##b ##c#')
+		regions.set_passable(2, 1, True)
+		self.assertEqual(dump(regions), 'aa#b a#bb ##b#')
+		regions.set_passable(1, 1, True)
+		self.assertEqual(dump(regions), 'aa#a aaaa ##a#')
+		self.assertEqual(regions.get_region_size(regions.get_label(0, 0)), 8)
+	def should_split_regions(self):
+		regions = Regions(*parse('.... ##.. .... ....'))
+		regions.set_passable(3, 0, False)
+		self.assertEqual(dump(regions), 'aaa# ##aa aaaa aaaa')
+		regions.set_passable(0, 0, False)
+		self.assertEqual(dump(regions), '#aa# ##aa aaaa aaaa')
+		regions.set_passable(2, 1, False)
+		self.assertEqual(dump(regions), '#aa# ###b bbbb bbbb')
+		self.assertEqual(regions.get_region_size(regions.get_label(1, 0)), 2)
+		regions.set_passable(1, 0, False)
+		regions.set_passable(2, 0, False)
+		self.assertEqual(dump(regions), '#### ###a aaaa aaaa')
+		self.assertEqual(regions.get_region_size(regions.get_label(3, 1)), 9)
+	def should_not_split_regions_when_neighbours_are_connected_around(self):
+		regions = Regions(*parse('... ... ...'))
+		regions.set_passable(1, 1, False)
+		self.assertEqual(dump(regions), 'aaa a#a aaa')
+		regions.set_passable(0, 0, False)
+		self.assertEqual(dump(regions), '#aa a#a aaa')
+		regions.set_passable(2, 0, False)
+		self.assertEqual(dump(regions), '#a# b#b bbb')
+	def should_merge_searches_when_checking_for_split(self):
+		regions = Regions(*parse('##..## #...#. ..###. ....#. ..#..# ....#.'))
+		label = regions.get_label(0, 5)
+		regions.set_passable(3, 5, False)
+		self.assertEqual(dump(regions), '##aa## #aaa#b aa###b aaaa#b aa#aa# aaa##c')
+		self.assertEqual(regions.get_label(0, 5), label)
+	def should_keep_labelling_consistent_with_full_relabelling(self):
+		rng = random.Random(0)
+		passability, width, height = [rng.random() < 0.6 for _ in range(64)], 8, 8
+		regions = Regions(passability, width, height)
+		for _ in range(200):
+			index = rng.randrange(width * height)
+			passability[index] = not passability[index]
+			regions.set_passable(index % width, index // width, passability[index])
+			expected = Regions(passability, width, height)
+			self.assertEqual(dump(regions), dump(expected))
@@ -4,6 +4,9 @@ from .. import savegame
 from ...game.world import World
 from ...game.map import Map, Terrain, Portal
 from ...game.actor import Player, Direction
+from ...math import Point
+
+LEGACY_JSON_WORLD = '''{"py/object": "nanomyth.game.world.World", "_maps": {"foo": {"py/object": "nanomyth.game.map.Map", "_tiles": {"py/object": "nanomyth.math.matrix.Matrix", "dims": {"py/object": "nanomyth.math.vector.Size", "py/state": [2, 2]}, "data": [{"py/object": "nanomyth.game.map.Terrain", "_images": [], "_passable": true}, {"py/object": "nanomyth.game.map.Terrain", "_images": ["wall"], "_passable": false}, {"py/object": "nanomyth.game.map.Terrain", "_images": [], "_passable": true}, {"py/object": "nanomyth.game.map.Terrain", "_images": [], "_passable": true}]}, "_actors": [{"py/object": "nanomyth.math.mapping.ObjectAtPos", "py/state": {"pos": {"py/object": "nanomyth.math.vector.Point", "py/state": [0, 0]}, "obj": {"py/object": "nanomyth.game.actor.Player", "_name": "Wanderer", "_default_sprite": "rogue", "_directional_sprites": {}, "_direction": {"py/reduce": [{"py/type": "nanomyth.game.actor.Direction"}, {"py/tuple": [1]}]}, "_inventory": {"py/object": "nanomyth.game.items.Inventory", "_items": []}}}}], "_items": [], "_portals": [{"py/object": "nanomyth.math.mapping.ObjectAtPos", "py/state": {"pos": {"py/object": "nanomyth.math.vector.Point", "py/state": [0, 1]}, "obj": {"py/object": "nanomyth.game.map.Portal", "_entrance_pos": {"py/object": "nanomyth.math.vector.Point", "py/state": [1, 1]}, "_dest_map": "bar"}}}], "_triggers": []}, "bar": {"py/object": "nanomyth.game.map.Map", "_tiles": {"py/object": "nanomyth.math.matrix.Matrix", "dims": {"py/object": "nanomyth.math.vector.Size", "py/state": [2, 2]}, "data": [{"py/object": "nanomyth.game.map.Terrain", "_images": [], "_passable": true}, {"py/object": "nanomyth.game.map.Terrain", "_images": [], "_passable": true}, {"py/object": "nanomyth.game.map.Terrain", "_images": [], "_passable": true}, {"py/object": "nanomyth.game.map.Terrain", "_images": [], "_passable": true}]}, "_actors": [{"py/object": "nanomyth.math.mapping.ObjectAtPos", "py/state": {"pos": {"py/object": "nanomyth.math.vector.Point", "py/state": [0, 0]}, "obj": {"py/object": "nanomyth.game.actor.NPC", "_name": "Farmer", "_sprite": "farmer", "_trigger": null}}}], "_items": [], "_portals": [], "_triggers": []}}, "_current_map": "foo", "_quests": {}}'''
 
 class TestSavefile(fake_filesystem_unittest.TestCase):
 	def setUp(self):
@@ -41,8 +44,8 @@ class TestSavefile(fake_filesystem_unittest.TestCase):
 				[(_.pos, _.obj._entrance_pos, _.obj._dest_map) for _ in expected._maps['foo']._portals],
 				)
 		self.assertEqual(
-				[(_.pos, _.obj._default_sprite, _.obj._direction, _.obj._directional_sprites) for _ in actual._maps['foo']._actors],
-				[(_.pos, _.obj._default_sprite, _.obj._direction, _.obj._directional_sprites) for _ in expected._maps['foo']._actors],
+				[(_.pos, _.obj._default_sprite, _.obj._direction, _.obj._directional_sprites) for _ in actual._maps['foo']._actors_by_id.values()],
+				[(_.pos, _.obj._default_sprite, _.obj._direction, _.obj._directional_sprites) for _ in expected._maps['foo']._actors_by_id.values()],
 				)
 
 		self.assertEqual(
@@ -54,8 +57,8 @@ class TestSavefile(fake_filesystem_unittest.TestCase):
 				[(_.pos, _._entrance_pos, _._dest_map) for _ in expected._maps['bar']._portals],
 				)
 		self.assertEqual(
-				[(_.pos, _.actor.default_sprite, _.actor.direction, _.actor.directional_sprites) for _ in actual._maps['bar']._actors],
-				[(_.pos, _.actor.default_sprite, _.actor.direction, _.actor.directional_sprites) for _ in expected._maps['bar']._actors],
+				[(_.pos, _.actor.default_sprite, _.actor.direction, _.actor.directional_sprites) for _ in actual._maps['bar']._actors_by_id.values()],
+				[(_.pos, _.actor.default_sprite, _.actor.direction, _.actor.directional_sprites) for _ in expected._maps['bar']._actors_by_id.values()],
 				)
 
 	def should_save_and_load_using_jsonpickle(self):
@@ -76,3 +79,21 @@ class TestSavefile(fake_filesystem_unittest.TestCase):
 		self.assertTrue(savefile.exists())
 		restored = savefile.load()
 		self.assertWorldsEqual(restored, world)
+	def should_load_legacy_jsonpickle_savefile(self):
+		self.fs.create_file('/legacy.sav', contents=LEGACY_JSON_WORLD)
+		world = savegame.JsonpickleSavefile('/legacy.sav').load()
+		self.assertEqual(world.get_current_map_name(), 'foo')
+		self.assertEqual(world.get_map('foo').get_player_pos(), Point(0, 0))
+		self.assertEqual(world.find_actor('Farmer')[:2], ('bar', Point(0, 0)))
+		self.assertTrue(world.is_reachable('foo', (0, 0), 'bar', (0, 0)))
+		self.assertFalse(world.is_reachable('foo', (0, 0), 'foo', (1, 0)))
+		world.shift_player(Direction.DOWN)
+		self.assertEqual(world.get_current_map_name(), 'bar')
+		self.assertEqual(world.find_actor('Wanderer')[:2], ('bar', Point(1, 1)))
+
+		savefile = savegame.JsonpickleSavefile('/game.sav')
+		savefile.save(world)
+		restored = savefile.load()
+		self.assertEqual(restored.get_current_map_name(), 'bar')
+		self.assertEqual(restored.find_actor('Wanderer')[:2], ('bar', Point(1, 1)))
+		self.assertEqual(sorted(restored.get_map_names()), ['bar', 'foo'])
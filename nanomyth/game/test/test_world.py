@@ -1,8 +1,12 @@
+import os
+import gc
+import pickle
+import threading
 from ...utils import unittest
 from ...math import Point
-from ..world import World
+from ..world import World, Scheduler, MapLoader
 from ..map import Map, Terrain, Portal
-from ..actor import Player, Direction
+from ..actor import Player, Direction, NPC
 from ..quest import Quest
 
 class TestWorld(unittest.TestCase):
@@ -21,10 +25,10 @@ class TestWorld(unittest.TestCase):
 
 	def should_create_world_with_maps(self):
 		world = self._create_world()
-		self.assertEqual(world.get_current_map().get_tile((0, 0)).get_images(), ['floor'])
+		self.assertEqual(world.get_current_map().get_tile((0, 0)).get_images(), ('floor',))
 		world.set_current_map('desert')
-		self.assertEqual(world.get_current_map().get_tile((0, 0)).get_images(), ['desert'])
-		self.assertEqual(world.get_map('home').get_tile((0, 0)).get_images(), ['floor'])
+		self.assertEqual(world.get_current_map().get_tile((0, 0)).get_images(), ('desert',))
+		self.assertEqual(world.get_map('home').get_tile((0, 0)).get_images(), ('floor',))
 		self.assertEqual(world.get_quest('my_quest').title, 'MyQuest')
 	def should_get_list_of_active_quests(self):
 		world = self._create_world()
@@ -46,3 +50,479 @@ class TestWorld(unittest.TestCase):
 		self.assertEqual(pos, Point(1, 2))
 		self.assertEqual(player.direction, Direction.UP)
 		self.assertEqual(on_change_map.data, [(world.get_current_map(),)])
+	def should_check_reachability_across_maps(self):
+		world = self._create_world()
+		home, desert = world.get_map('home'), world.get_map('desert')
+		wall = Terrain(['wall'], passable=False)
+		for x in range(5):
+			desert.set_tile((x, 3), wall)
+		self.assertTrue(world.is_reachable('home', (0, 0), 'home', (4, 4)))
+		self.assertTrue(world.is_reachable('home', (0, 0), 'desert', (0, 0)))
+		self.assertFalse(world.is_reachable('home', (0, 0), 'desert', (0, 4)))
+		self.assertFalse(world.is_reachable('desert', (0, 0), 'home', (0, 0)))
+		self.assertFalse(world.is_reachable('home', (0, 0), 'desert', (0, 3)))
+
+		desert.add_portal((0, 2), Portal('cellar', (0, 0)))
+		desert.add_portal((1, 2), Portal('desert', (0, 3)))
+		desert.set_tile((2, 3), Terrain(['sand']))
+		self.assertTrue(world.is_reachable('home', (0, 0), 'desert', (0, 4)))
+		desert.add_portal((0, 4), Portal('home', (4, 4)))
+		self.assertTrue(world.is_reachable('desert', (0, 0), 'home', (0, 0)))
+		self.assertTrue(world.is_reachable('desert', (1, 1), 'home', (3, 3)))
+		self.assertNotIn('_portal_graph', world.__getstate__())
+
+		graph = world._portal_graph
+		self.assertTrue(world.is_reachable('desert', (1, 1), 'home', (3, 3)))
+		self.assertIs(world._portal_graph, graph)
+		self.assertIn(('home', 1), graph.reachable[('desert', desert.get_region((1, 1)))])
+		home.add_portal((4, 4), Portal('desert', (4, 4)))
+		self.assertTrue(world.is_reachable('desert', (1, 1), 'home', (3, 3)))
+		self.assertIsNot(world._portal_graph, graph)
+	def should_find_actor_on_any_map(self):
+		world = self._create_world()
+		self.assertIsNone(world.find_actor('Absent'))
+		map_name, pos, player = world.find_actor('Wanderer')
+		self.assertEqual((map_name, pos, player.name), ('home', Point(2, 2), 'Wanderer'))
+		self.assertEqual(world._actor_maps, {'Wanderer' : {'home' : 1}})
+
+		world.shift_player((0, -1))
+		map_name, pos, player = world.find_actor('Wanderer')
+		self.assertEqual((map_name, pos), ('desert', Point(1, 2)))
+		self.assertEqual(world._actor_maps, {'Wanderer' : {'desert' : 1}})
+
+		world.get_map('home').add_actor((0, 0), NPC('Farmer', 'farmer'))
+		world.get_map('desert').add_actor((0, 0), NPC('Farmer', 'farmer'))
+		self.assertEqual(world._actor_maps['Farmer'], {'home' : 1, 'desert' : 1})
+		self.assertEqual(world.find_actor('Farmer')[:2], ('home', Point(0, 0)))
+		world.add_map('home', Map((5, 5)))
+		self.assertEqual(world.find_actor('Farmer')[:2], ('desert', Point(0, 0)))
+
+		world.get_map('desert').remove_actor(player)
+		self.assertIsNone(world.find_actor('Wanderer'))
+		self.assertEqual(world._actor_maps, {'Farmer' : {'desert' : 1}})
+
+		world = pickle.loads(pickle.dumps(world))
+		self.assertNotIn('_actor_maps', world.__getstate__())
+		self.assertEqual(world._actor_maps, {'Farmer' : {'desert' : 1}})
+		world.get_map('desert').remove_actor(world.find_actor('Farmer')[2])
+		self.assertEqual(world._actor_maps, {})
+	def should_find_actors_on_evicted_maps(self):
+		world = World()
+		for name in 'abc':
+			world.add_map(name, Map((5, 5)))
+			world.get_map(name).add_actor((1, 1), NPC('Farmer ' + name, 'farmer'))
+		world.set_memory_budget(50)
+		self.assertFalse(world.is_map_loaded('b'))
+		restored = pickle.loads(pickle.dumps(world))
+		for world in (world, restored):
+			self.assertEqual(world.find_actor('Farmer b')[:2], ('b', Point(1, 1)))
+			self.assertTrue(world.is_map_loaded('b'))
+			world.get_map('b').remove_actor(world.find_actor('Farmer b')[2])
+			self.assertIsNone(world.find_actor('Farmer b'))
+	def should_load_maps_on_demand(self):
+		loaded = []
+		def loader(name, size=(5, 5)):
+			def _load():
+				loaded.append(name)
+				return Map(size)
+			return _load
+		world = World()
+		world.register_map('home', loader('home'))
+		world.register_map('desert', loader('desert'))
+		self.assertEqual(world.get_current_map_name(), 'home')
+		self.assertEqual(world.get_map_names(), ['home', 'desert'])
+		self.assertEqual(loaded, [])
+		self.assertFalse(world.is_map_loaded('home'))
+		world.get_current_map().add_actor((2, 2), Player('Wanderer', 'rogue'))
+		world.get_current_map().add_portal((2, 1), Portal('desert', (1, 2)))
+		self.assertEqual(loaded, ['home'])
+		world.shift_player(Direction.UP)
+		self.assertEqual(loaded, ['home', 'desert'])
+		self.assertEqual(world.find_actor('Wanderer')[:2], ('desert', Point(1, 2)))
+		with self.assertRaises(KeyError):
+			world.get_map('unknown')
+	def should_load_maps_using_map_loader(self):
+		class Loader(MapLoader):
+			def finish(self, data):
+				self.data = data
+				return Map((2, 2))
+		loader = Loader()
+		world = World()
+		world.register_map('home', loader)
+		self.assertEqual(world.get_current_map().get_size(), (2, 2))
+		self.assertIsNone(loader.data)
+	def should_evict_least_recently_used_maps(self):
+		world = self._create_world()
+		world.add_map('cellar', Map((5, 5)))
+		world.get_map('desert').add_actor((3, 3), NPC('Nomad', 'nomad'))
+		self.assertEqual(list(world._map_usage), ['home', 'cellar', 'desert'])
+		world.set_memory_budget(50)
+		self.assertEqual(sorted(name for name, _ in world.iter_maps()), ['desert', 'home'])
+		world.set_current_map('desert')
+		world.get_map('cellar')
+		self.assertEqual(sorted(name for name, _ in world.iter_maps()), ['cellar', 'desert'])
+		self.assertFalse(world.is_map_loaded('home'))
+		self.assertIn('home', world._evicted)
+		self.assertEqual(world.get_map('home').find_actor_pos('Wanderer'), Point(2, 2))
+		self.assertEqual(sorted(name for name, _ in world.iter_maps()), ['desert', 'home'])
+
+		world = pickle.loads(pickle.dumps(world))
+		self.assertEqual(sorted(world._evicted), ['cellar'])
+		self.assertNotIn('_loaders', world.__getstate__())
+		self.assertEqual(world.get_map('desert').find_actor_pos('Nomad'), Point(3, 3))
+		world.get_map('cellar')
+		self.assertFalse(world.is_map_loaded('home'))
+		world.add_map('home', Map((1, 1)))
+		self.assertEqual(sorted(world._evicted), ['cellar'])
+		world.set_memory_budget(None)
+		world.register_map('home', lambda: self.fail('Map is already loaded'))
+		self.assertEqual(world.get_map('home').get_size(), (1, 1))
+	def should_prefetch_maps_behind_nearby_portals(self):
+		class Loader(MapLoader):
+			def __init__(self, size):
+				self.size = size
+				self.ready = threading.Event()
+				self.ready.set()
+				self.threads = []
+			def prepare(self):
+				self.ready.wait(5)
+				self.threads.append(threading.current_thread())
+				return self.size
+			def finish(self, size):
+				self.threads.append(threading.current_thread())
+				return Map(size)
+		desert, cellar = Loader((5, 5)), Loader((3, 3))
+		world = World()
+		world.register_map('home', lambda: Map((7, 7)))
+		world.register_map('desert', desert)
+		world.register_map('cellar', cellar)
+		world.register_map('garden', lambda: self.fail('Plain loaders are not prefetched'))
+		home = world.get_current_map()
+		home.add_portal((3, 2), Portal('desert', (1, 2)))
+		home.add_portal((3, 6), Portal('cellar', (1, 1)))
+		home.add_portal((2, 3), Portal('unknown', (0, 0)))
+		home.add_portal((4, 3), Portal('garden', (0, 0)))
+		world.prefetch_maps()
+		self.assertEqual(world._pending_loads, {})
+		world.set_prefetch_radius(1)
+		self.assertEqual(world._pending_loads, {})
+
+		desert.ready.clear()
+		home.add_actor((3, 3), Player('Wanderer', 'rogue'))
+		world.prefetch_maps()
+		self.assertEqual(sorted(world._pending_loads), ['desert'])
+		self.assertFalse(world.is_map_loaded('desert'))
+		desert.ready.set()
+		self.assertEqual(world.get_map('desert').get_size(), (5, 5))
+		self.assertEqual(world._pending_loads, {})
+		self.assertNotEqual(desert.threads[0], threading.current_thread())
+		self.assertEqual(desert.threads[1], threading.current_thread())
+
+		world.shift_player(Direction.DOWN)
+		world.shift_player(Direction.DOWN)
+		self.assertEqual(sorted(world._pending_loads), ['cellar'])
+		world._pending_loads['cellar'].result()
+		world.prefetch_maps()
+		self.assertFalse(world.is_map_loaded('cellar'))
+		self.assertEqual(sorted(world._pending_loads), ['cellar'])
+		world.shift_player(Direction.DOWN)
+		self.assertEqual(world.get_current_map_name(), 'cellar')
+		self.assertEqual(world.get_current_map().get_player_pos(), Point(1, 1))
+		self.assertNotEqual(cellar.threads[0], threading.current_thread())
+		self.assertEqual(cellar.threads[1], threading.current_thread())
+		self.assertNotIn('_pending_loads', world.__getstate__())
+	def should_cancel_prefetching_of_distant_maps(self):
+		class Loader(MapLoader):
+			def __init__(self):
+				self.ready = threading.Event()
+				self.prepared = 0
+			def prepare(self):
+				self.ready.wait(5)
+				self.prepared += 1
+				return Map((3, 3))
+			def finish(self, level_map):
+				return level_map
+		desert, cellar = Loader(), Loader()
+		cellar.ready.set()
+		world = World()
+		world.register_map('home', lambda: Map((9, 1)))
+		world.register_map('desert', desert)
+		world.register_map('cellar', cellar)
+		home = world.get_current_map()
+		home.add_portal((0, 0), Portal('desert', (1, 1)))
+		home.add_portal((8, 0), Portal('cellar', (1, 1)))
+		home.add_actor((2, 0), Player('Wanderer', 'rogue'))
+		world.set_prefetch_radius(2)
+		self.assertEqual(sorted(world._pending_loads), ['desert'])
+		for _ in range(3):
+			world.shift_player(Direction.RIGHT)
+		self.assertEqual(sorted(world._pending_loads), ['desert']) # Still running.
+		world.shift_player(Direction.RIGHT)
+		self.assertEqual(sorted(world._pending_loads), ['cellar', 'desert'])
+		world.shift_player(Direction.LEFT)
+		self.assertEqual(sorted(world._pending_loads), ['desert']) # Queued loading is cancelled.
+		world.shift_player(Direction.RIGHT)
+		pending_desert = world._pending_loads['desert']
+		desert.ready.set()
+		pending_desert.result()
+		world._pending_loads['cellar'].result()
+		world.prefetch_maps()
+		self.assertEqual(sorted(world._pending_loads), ['cellar'])
+		for _ in range(2):
+			world.shift_player(Direction.LEFT)
+			world.shift_player(Direction.RIGHT)
+		world.shift_player(Direction.LEFT)
+		world.shift_player(Direction.LEFT)
+		self.assertEqual(sorted(world._pending_loads), ['cellar'])
+		self.assertEqual(cellar.prepared, 1)
+		world.shift_player(Direction.LEFT)
+		self.assertEqual(world._pending_loads, {})
+		self.assertFalse(world.is_map_loaded('desert'))
+		self.assertFalse(world.is_map_loaded('cellar'))
+		self.assertEqual(world.get_map('cellar').get_size(), (3, 3))
+		self.assertEqual(cellar.prepared, 2)
+	def should_not_evict_maps_when_prefetching(self):
+		class Loader(MapLoader):
+			def __init__(self):
+				self.prepared = 0
+			def prepare(self):
+				self.prepared += 1
+			def finish(self, _):
+				return Map((3, 3))
+		loaders = [Loader() for _ in range(3)]
+		world = World()
+		world.register_map('home', lambda: Map((7, 7)))
+		home = world.get_current_map()
+		for index, (loader, pos) in enumerate(zip(loaders, [(3, 0), (6, 3), (0, 3)])):
+			world.register_map(str(index), loader)
+			home.add_portal(pos, Portal(str(index), (1, 1)))
+		home.add_actor((3, 3), Player('Wanderer', 'rogue'))
+		world.get_map('0')
+		world.set_current_map('home')
+		world.set_memory_budget(7 * 7 + 3 * 3)
+		world.set_prefetch_radius(3)
+		for pending in world._pending_loads.values():
+			pending.result()
+		for _ in range(20):
+			world.shift_player(Direction.DOWN)
+			world.shift_player(Direction.UP)
+		self.assertEqual(sorted(world._pending_loads), ['1', '2'])
+		self.assertEqual([loader.prepared for loader in loaders], [1, 1, 1])
+		self.assertEqual(world._evicted, {})
+		self.assertTrue(world.is_map_loaded('0'))
+	def should_prefetch_evicted_maps(self):
+		world = self._create_world()
+		world.add_map('cellar', Map((5, 5)))
+		world.get_map('desert').add_actor((3, 3), NPC('Nomad', 'nomad'))
+		world.set_memory_budget(50)
+		world.get_map('cellar')
+		self.assertFalse(world.is_map_loaded('desert'))
+		world.set_prefetch_radius(1)
+		self.assertEqual(sorted(world._pending_loads), ['desert'])
+		world.shift_player(Direction.UP)
+		self.assertEqual(world.get_current_map().find_actor_pos('Nomad'), Point(3, 3))
+		self.assertNotIn('desert', world._evicted)
+
+		world.set_current_map('home')
+		world.get_map('cellar')
+		world.set_current_map('cellar')
+		world.get_map('home')
+		self.assertFalse(world.is_map_loaded('desert'))
+		world.get_map('home').add_actor((2, 2), Player('Wanderer', 'rogue'))
+		world.set_current_map('home')
+		world.prefetch_maps()
+		self.assertEqual(sorted(world._pending_loads), ['desert'])
+		world.add_map('desert', Map((1, 1)))
+		self.assertEqual(world._pending_loads, {})
+		self.assertEqual(world.get_map('desert').get_size(), (1, 1))
+	def should_load_legacy_world_state(self):
+		world = self._create_world()
+		state = world.__getstate__()
+		del state['_memory_budget']
+		del state['_prefetch_radius']
+		legacy = World.__new__(World)
+		legacy.__setstate__(state)
+		self.assertEqual(legacy._evicted, {})
+		self.assertIsNone(legacy._memory_budget)
+		self.assertIsNone(legacy._prefetch_radius)
+		self.assertEqual(list(legacy._map_usage), ['home', 'desert'])
+	def should_spill_evicted_maps_to_files(self):
+		world = self._create_world()
+		world.add_map('cellar', Map((5, 5)))
+		world.set_current_map('desert')
+		world.set_memory_budget(50)
+		spilled = world._evicted['home']
+		with open(spilled, 'rb') as f:
+			self.assertEqual(pickle.load(f).find_actor_pos('Wanderer'), Point(2, 2))
+		state = world.__getstate__()
+		self.assertEqual(list(state['_maps']), ['home', 'desert', 'cellar'])
+		self.assertNotIn('_evicted', state)
+		self.assertEqual(state['_maps']['home'].find_actor_pos('Wanderer'), Point(2, 2))
+		self.assertFalse(world.is_map_loaded('home'))
+
+		self.assertEqual(world.get_map('home').find_actor_pos('Wanderer'), Point(2, 2))
+		self.assertFalse(os.path.exists(spilled))
+		spill_dir = world._spill_dir
+		self.assertTrue(os.path.isdir(spill_dir))
+		del world, state
+		gc.collect()
+		self.assertFalse(os.path.exists(spill_dir))
+	def should_renumber_regions_of_reloaded_maps(self):
+		world = World()
+		level_map = world.add_map('a', Map((5, 5)))
+		self.assertTrue(world.is_reachable('a', (0, 0), 'a', (3, 3)))
+		for y in range(5): # Regions are updated incrementally.
+			level_map.set_tile((2, y), Terrain(['wall'], passable=False))
+		self.assertTrue(world.is_reachable('a', (0, 0), 'a', (1, 4)))
+		self.assertFalse(world.is_reachable('a', (0, 0), 'a', (3, 3)))
+		world.add_map('b', Map((5, 5)))
+		world.set_current_map('b')
+		world.set_memory_budget(25)
+		self.assertFalse(world.is_map_loaded('a'))
+		world.get_map('a')
+		self.assertTrue(world.is_reachable('a', (0, 0), 'a', (1, 3)))
+		self.assertFalse(world.is_reachable('a', (0, 0), 'a', (4, 4)))
+		self.assertTrue(world.is_reachable('a', (3, 0), 'a', (4, 4)))
+	def should_consider_unloaded_maps_in_world_queries(self):
+		loaded = []
+		def loader(name, dest=None):
+			def _load():
+				loaded.append(name)
+				level_map = Map((3, 3))
+				level_map.set_tile((1, 0), Terrain(['wall'], passable=False))
+				level_map.set_tile((1, 1), Terrain(['wall'], passable=False))
+				level_map.set_tile((1, 2), Terrain(['wall'], passable=False))
+				if dest:
+					level_map.add_portal((0, 0), Portal(dest, (0, 1)))
+				level_map.add_actor((2, 2), NPC('Farmer ' + name, 'farmer'))
+				return level_map
+			return _load
+		world = World()
+		world.register_map('a', loader('a', 'b'))
+		world.register_map('b', loader('b', 'c'))
+		world.register_map('c', loader('c'))
+		world.set_memory_budget(18)
+		world.get_current_map()
+		self.assertEqual(world.get_map_distances('a', loaded_only=True), {'a' : 0, 'b' : 1})
+		self.assertEqual(loaded, ['a'])
+		self.assertTrue(world.is_reachable('a', (0, 2), 'c', (0, 0)))
+		self.assertFalse(world.is_reachable('a', (0, 2), 'c', (2, 2)))
+		self.assertEqual(world.get_map_distances('a'), {'a' : 0, 'b' : 1, 'c' : 2})
+		self.assertEqual(world.get_map_distances('a', loaded_only=True), {'a' : 0, 'b' : 1, 'c' : 2})
+		self.assertEqual(sorted(loaded), ['a', 'b', 'c'])
+		self.assertFalse(world.is_map_loaded('b'))
+
+		world.get_map('c').add_portal((1, 1), Portal('a', (2, 0))) # Placed on the wall.
+		self.assertFalse(world.is_reachable('c', (0, 0), 'a', (2, 2)))
+		world.get_map('c').add_portal((0, 2), Portal('a', (2, 0)))
+		self.assertTrue(world.is_reachable('c', (0, 0), 'a', (2, 2)))
+		self.assertFalse(world.is_reachable('c', (0, 0), 'b', (0, 0)))
+		world.get_map('a').set_tile((1, 1), Terrain([]))
+		self.assertTrue(world.is_reachable('c', (0, 0), 'b', (0, 0)))
+		self.assertFalse(world.is_map_loaded('b'))
+		self.assertEqual(world.find_actor('Farmer b')[:2], ('b', Point(2, 2)))
+		self.assertEqual(sorted(loaded), ['a', 'b', 'c'])
+
+		world = World()
+		world.register_map('a', loader('a'))
+		world.register_map('b', loader('b'))
+		self.assertEqual(world.find_actor('Farmer b')[:2], ('b', Point(2, 2)))
+		self.assertIsNone(world.find_actor('Absent'))
+
+class Walker(NPC):
+	log = [] # Shared by all instances, so it is not affected by eviction of maps.
+	def update(self, level_map, pos, ticks):
+		self.log.append((self.name, ticks))
+		level_map.move_actor(self, (pos.x + ticks, pos.y))
+
+class TestScheduler(unittest.TestCase):
+	def _create_world(self):
+		self.log = Walker.log = []
+		world = World()
+		for name in ['a', 'b', 'c', 'd']:
+			level_map = world.add_map(name, Map((100, 1)))
+			level_map.add_actor((0, 0), Walker(name, name))
+		world.get_map('a').add_actor((99, 0), Player('Wanderer', 'rogue'))
+		world.get_map('a').add_actor((98, 0), NPC('Statue', 'statue'))
+		world.get_map('a').add_portal((50, 0), Portal('b', (50, 0)))
+		world.get_map('b').add_portal((50, 0), Portal('c', (50, 0)))
+		world.get_map('c').add_portal((50, 0), Portal('unknown', (50, 0)))
+		return world
+	def should_calculate_map_distances(self):
+		world = self._create_world()
+		self.assertEqual(world.get_current_map_name(), 'a')
+		self.assertEqual([name for name, _ in world.iter_maps()], ['a', 'b', 'c', 'd'])
+		self.assertEqual(world.get_map_distances('a'), {'a':0, 'b':1, 'c':2})
+		self.assertEqual(world.get_map_distances('c'), {'c':0})
+	def should_update_distant_maps_less_often(self):
+		world = self._create_world()
+		scheduler = Scheduler(world, max_interval=8)
+		self.assertEqual([scheduler.get_interval(name) for name in 'abcd'], [1, 2, 4, 8])
+		updated = [scheduler.tick() for _ in range(8)]
+		self.assertEqual(scheduler.get_tick(), 8)
+		self.assertEqual(updated, [
+			['a'], ['a', 'b'], ['a'], ['a', 'b', 'c'],
+			['a'], ['a', 'b'], ['a'], ['a', 'b', 'c', 'd'],
+			])
+		self.assertEqual(self.log[-4:], [('a', 1), ('b', 2), ('c', 4), ('d', 8)])
+		self.assertEqual([world.get_map(name).find_actor_pos(name) for name in 'abcd'], [Point(8, 0)] * 4)
+		self.assertEqual(world.get_map('a').find_actor_pos('Wanderer'), Point(99, 0))
+		self.assertEqual(world.get_map('a').find_actor_pos('Statue'), Point(98, 0))
+	def should_limit_number_of_maps_per_tick(self):
+		world = self._create_world()
+		scheduler = Scheduler(world, max_interval=4, max_maps_per_tick=2)
+		updated = [scheduler.tick() for _ in range(6)]
+		self.assertEqual(updated, [
+			['a'], ['a', 'b'], ['a'], ['a', 'b'],
+			['a', 'c'], ['a', 'd'],
+			])
+		self.assertIn(('c', 5), self.log)
+		self.assertIn(('d', 6), self.log)
+	def should_reschedule_when_current_map_changes(self):
+		world = self._create_world()
+		scheduler = Scheduler(world, max_interval=8)
+		scheduler.tick()
+		world.set_current_map('c')
+		self.assertEqual(scheduler.tick(), ['c'])
+		self.assertEqual(self.log[-1], ('c', 2))
+		self.assertEqual(scheduler.get_interval('a'), 8)
+		world.add_map('e', Map((1, 1)))
+		self.assertEqual(scheduler.tick(), ['c'])
+		self.assertEqual(scheduler.get_interval('e'), 8)
+	def should_update_maps_in_worker_threads(self):
+		world = self._create_world()
+		with Scheduler(world, max_interval=8, workers=2) as scheduler:
+			updated = [scheduler.tick() for _ in range(8)]
+		self.assertEqual(updated[-1], ['a', 'b', 'c', 'd'])
+		self.assertEqual(sorted(self.log[-4:]), [('a', 1), ('b', 2), ('c', 4), ('d', 8)])
+		scheduler.close()
+	def should_keep_actor_index_when_actors_are_placed_in_worker_threads(self):
+		class Shepherd(NPC):
+			def update(self, level_map, pos, ticks):
+				for x in range(1, 50):
+					level_map.add_actor((x, 0), NPC('Sheep', 'sheep'))
+				for x in range(1, 50):
+					level_map.remove_actor(level_map.find_actor('Sheep'))
+				level_map.add_actor((50, 0), NPC('Sheep', 'sheep'))
+		world = World()
+		for name in 'abcd':
+			world.add_map(name, Map((100, 1))).add_actor((0, 0), Shepherd('Shepherd ' + name, 'shepherd'))
+		with Scheduler(world, max_interval=1, workers=4) as scheduler:
+			for _ in range(4):
+				scheduler.tick()
+		self.assertEqual(world._actor_maps['Sheep'], {name : 4 for name in 'abcd'})
+		self.assertEqual([actor.name for _, actor in world.get_map('a').iter_actors()].count('Sheep'), 4)
+		self.assertIsNone(world.get_loaded_map('e'))
+		self.assertIs(world.get_loaded_map('a'), world.get_map('a'))
+	def should_simulate_only_loaded_maps(self):
+		world = self._create_world()
+		world.set_memory_budget(300)
+		scheduler = Scheduler(world, max_interval=8)
+		for _ in range(8):
+			scheduler.tick()
+		self.assertEqual(sorted(name for name, _ in world.iter_maps()), ['a', 'b', 'c'])
+		self.assertEqual(self.log[-3:], [('a', 1), ('b', 2), ('c', 4)])
+		world.get_map('d')
+		self.assertFalse(world.is_map_loaded('b'))
+		self.assertEqual(scheduler.tick(), ['a', 'd'])
+		self.assertEqual(self.log[-1], ('d', 9))
@@ -1,14 +1,102 @@
 """ Global game world.
 """
+import os
+import heapq
+import pickle
+import shutil
+import weakref
+import tempfile
+import functools
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from .map import Map, Portalling
 from .quest import Quest
 from .actor import NPC, Player, Direction
 from ..math import Point
 from ..utils.meta import typed
 
+_prefetch_executor = None
+
+def _get_prefetch_executor():
+	""" Returns single background thread shared by all worlds for map prefetching. """
+	global _prefetch_executor
+	if _prefetch_executor is None:
+		_prefetch_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='nanomyth-prefetch')
+	return _prefetch_executor
+
+def _read_map_file(filename):
+	with open(filename, 'rb') as f:
+		return pickle.load(f)
+
+class MapLoader:
+	""" Map loader that can be run in background (see World.register_map, World.set_prefetch_radius).
+	Loading is split in two stages:
+	- prepare(): reads and parses data. May be called on background thread,
+	  so it should not change any shared state (e.g. images of the engine);
+	- finish(data): creates Map object from the result of prepare(). Always called on the main thread.
+	Loader itself is a callable that performs both stages at once.
+	"""
+	def prepare(self):
+		""" Override this to read map data. Returns None by default. """
+		return None
+	def finish(self, data): # pragma: no cover
+		""" Override this to create Map object from data returned by prepare(). """
+		raise NotImplementedError
+	def __call__(self):
+		return self.finish(self.prepare())
+
+class _PortalGraph:
+	""" Graph of connected regions across maps, linked by portals.
+	Edges: (map name, region ID) -> set of (map name, region ID) that can be reached via portals.
+	Reachable: cache of regions reachable from given region (filled on demand).
+	Key: revision of map summaries the graph was built for (see World._get_map_summary).
+	"""
+	__slots__ = ('key', 'edges', 'reachable')
+	def __init__(self, key, edges):
+		self.key = key
+		self.edges = edges
+		self.reachable = {}
+
+class _MapSummary:
+	""" Portal data of a map that stays valid while the map is not changed,
+	so it is kept for evicted maps, and they do not have to be loaded again to answer queries about portals.
+	Token: identity and revisions of terrain and portals of the loaded map (None while map is evicted).
+	Portals: list of (pos, destination map name, entrance pos).
+	Regions: connected regions of portals and entrances (see Map.get_region), pos -> region ID, filled on demand
+	and cleared when evicted map is loaded again (region IDs are not preserved by the map).
+	"""
+	__slots__ = ('token', 'portals', 'regions')
+	def __init__(self, token, portals):
+		self.token = token
+		self.portals = portals
+		self.regions = {}
+
 class World:
 	""" World of maps.
+
+	Maps can be either added directly (see add_map)
+	or registered with a loader that creates map on the first request (see register_map).
+	If memory budget is set (see set_memory_budget), least recently used maps are evicted
+	when total size of loaded maps exceeds the budget. Evicted maps are written to temporary files
+	(so all changes are preserved) and are restored on the next request.
+	Savegames contain all visited maps, evicted ones are read back for saving.
+	Current map is never evicted.
+	If prefetch radius is set (see set_prefetch_radius), maps behind portals near the player
+	are prepared in advance on a background thread, so moving through a portal does not wait for loading.
+
+	Methods that iterate over maps (e.g. iter_maps) consider only loaded maps.
+	Queries about the whole world (find_actor, get_map_distances, is_reachable) consider all maps:
+	portals and actors of evicted maps are remembered, and maps that were never loaded are loaded when needed.
+
+	Actors are indexed by name across all maps (including evicted ones),
+	index is updated by maps themselves whenever actors are placed or removed (see Map.set_actor_listener),
+	so actors can be found without searching every map (see find_actor).
 	"""
+	_TRANSIENT_FIELDS = (
+			'_loaders', '_evicted', '_spill_dir', '_pending_loads', '_map_usage', '_loaded_revision',
+			'_map_summaries', '_summary_revision', '_portal_graph', '_actor_maps', '_actor_index_lock',
+			)
 	def __init__(self):
 		""" Creates empty world.
 		Add maps via add_map() and set_current_map()
@@ -16,26 +104,404 @@ class World:
 		self._maps = {}
 		self._current_map = None
 		self._quests = {}
+		self._memory_budget = None
+		self._prefetch_radius = None
+		self._init_transient_state()
+	def _init_transient_state(self):
+		self._loaders = {}
+		self._evicted = {}
+		self._spill_dir = None
+		self._pending_loads = {}
+		self._map_usage = OrderedDict.fromkeys(self._maps)
+		self._loaded_revision = 0
+		self._map_summaries = {}
+		self._summary_revision = 0
+		self._portal_graph = None
+		self._actor_maps = {}
+		self._actor_index_lock = threading.Lock()
+		for map_name, level_map in self._maps.items():
+			self._index_actors(map_name, level_map)
+	def __getstate__(self):
+		state = dict(self.__dict__)
+		for field_name in self._TRANSIENT_FIELDS:
+			del state[field_name]
+		# Maps are stored from the least recently used one, so the same maps are evicted after loading.
+		state['_maps'] = {map_name : self._read_evicted_map(map_name) for map_name in self._evicted}
+		state['_maps'].update((map_name, self._maps[map_name]) for map_name in self._map_usage)
+		return state
+	def __setstate__(self, new_state):
+		self.__dict__.update(new_state)
+		self.__dict__.setdefault('_memory_budget', None)
+		self.__dict__.setdefault('_prefetch_radius', None)
+		self._init_transient_state()
+		self._evict_maps()
+	def __getattr__(self, attr):
+		""" Legacy JSON savefiles are restored without calling __setstate__,
+		so missing fields are restored lazily upon the first access.
+		"""
+		if attr.startswith('__') or '_map_usage' in self.__dict__:
+			raise AttributeError(attr)
+		self.__setstate__(dict(self.__dict__))
+		return getattr(self, attr)
+	def _index_actors(self, map_name, level_map):
+		""" Adds all actors of the map to the global index
+		and makes map keep the index up to date.
+		"""
+		listener = functools.partial(self._update_actor_index, map_name)
+		for _, actor in level_map.iter_actors():
+			listener(actor.name, True)
+		level_map.set_actor_listener(listener)
+	def _unindex_actors(self, map_name):
+		""" Removes all actors of the map from the global index. """
+		with self._actor_index_lock:
+			for actor_name, maps in list(self._actor_maps.items()):
+				maps.pop(map_name, None)
+				if not maps:
+					del self._actor_maps[actor_name]
+	def _update_actor_index(self, map_name, actor_name, added):
+		""" Global actor index: actor name -> {map name : number of actors with such name on that map}.
+		Maps may be updated concurrently (see Scheduler), so index is changed under lock.
+		"""
+		with self._actor_index_lock:
+			maps = self._actor_maps.setdefault(actor_name, {})
+			count = maps.get(map_name, 0) + (1 if added else -1)
+			if count > 0:
+				maps[map_name] = count
+				return
+			maps.pop(map_name, None)
+			if not maps:
+				del self._actor_maps[actor_name]
+	def _has_maps(self):
+		return bool(self._maps or self._evicted or self._loaders)
 	@typed(str, Map)
 	def add_map(self, map_name, level_map):
 		""" Adds new map under given name.
 		If there were not maps, sets this one as current.
 		"""
-		if not self._maps:
+		if not self._has_maps():
 			self._current_map = map_name
+		self._drop_evicted_map(map_name)
+		self._pending_loads.pop(map_name, None)
+		old_map = self._maps.get(map_name)
+		if old_map is not None:
+			old_map.set_actor_listener(None)
+		self._unindex_actors(map_name)
+		self._map_summaries.pop(map_name, None)
+		self._summary_revision += 1
 		self._maps[map_name] = level_map
+		self._index_actors(map_name, level_map)
+		self._mark_map_loaded(map_name)
 		return level_map
 	@typed(str)
+	def register_map(self, map_name, loader): # TODO typed(callable)
+		""" Registers map under given name without loading it.
+		Loader is a callable without arguments that returns Map object,
+		it is called on the first request for the map (see get_map).
+		Only loaders derived from MapLoader can be prefetched (see set_prefetch_radius),
+		other callables are always called on the main thread.
+		If there were not maps, sets this one as current.
+		If map with this name is already present (or is evicted), its state takes precedence,
+		and loader is used only if map is removed from the world.
+
+		Loaders are not serialized and should be registered again after loading world from savegame
+		(see Game.load_world), state of already visited maps is restored from the savegame.
+		"""
+		if not self._has_maps():
+			self._current_map = map_name
+		self._loaders[map_name] = loader
+		self._pending_loads.pop(map_name, None)
+		self._summary_revision += 1
+	def copy_loaders(self, other_world):
+		""" Registers map loaders from other world
+		(e.g. previous world object when world is loaded from savegame).
+		"""
+		for map_name, loader in other_world._loaders.items():
+			self._loaders.setdefault(map_name, loader)
+	def get_map_names(self):
+		""" Returns list of names of all maps, including the ones that are not loaded. """
+		return list(dict.fromkeys(list(self._maps) + list(self._evicted) + list(self._loaders)))
+	def is_map_loaded(self, map_name):
+		""" Returns True if map is currently loaded in memory. """
+		return map_name in self._maps
+	@typed((int, None))
+	def set_memory_budget(self, max_tiles):
+		""" Sets memory budget for loaded maps as total number of tiles (width*height of each map).
+		Maps are evicted immediately if budget is already exceeded.
+		If budget is None (default), maps are never evicted.
+		"""
+		self._memory_budget = max_tiles
+		self._evict_maps()
+	@staticmethod
+	def _get_memory_size(level_map):
+		size = level_map.get_size()
+		return size.width * size.height
+	def _mark_map_loaded(self, map_name):
+		self._map_usage[map_name] = None
+		self._map_usage.move_to_end(map_name)
+		self._loaded_revision += 1
+		self._evict_maps()
+	def _evict_maps(self):
+		""" Evicts least recently used maps until total size of loaded maps fits the budget.
+		Current map and the most recently used map are never evicted.
+		"""
+		if self._memory_budget is None:
+			return
+		memory_used = sum(map(self._get_memory_size, self._maps.values()))
+		candidates = [map_name for map_name in list(self._map_usage)[:-1] if map_name != self._current_map]
+		for map_name in candidates:
+			if memory_used <= self._memory_budget:
+				break
+			self._get_map_summary(map_name).token = None # Stays valid while map is not loaded.
+			level_map = self._maps.pop(map_name)
+			level_map.set_actor_listener(None)
+			del self._map_usage[map_name]
+			self._spill_map(map_name, level_map)
+			memory_used -= self._get_memory_size(level_map)
+			self._loaded_revision += 1
+	def _spill_map(self, map_name, level_map):
+		""" Writes evicted map to a temporary file.
+		Files are removed when map is loaded again or when world object is destroyed.
+		"""
+		if self._spill_dir is None:
+			self._spill_dir = tempfile.mkdtemp(prefix='nanomyth-maps-')
+			weakref.finalize(self, shutil.rmtree, self._spill_dir, True)
+		fd, filename = tempfile.mkstemp(suffix='.map', dir=self._spill_dir)
+		with os.fdopen(fd, 'wb') as f:
+			pickle.dump(level_map, f, pickle.HIGHEST_PROTOCOL)
+		self._evicted[map_name] = filename
+	def _read_evicted_map(self, map_name):
+		return _read_map_file(self._evicted[map_name])
+	def _drop_evicted_map(self, map_name):
+		filename = self._evicted.pop(map_name, None)
+		if filename is not None:
+			os.remove(filename)
+	@typed(str)
 	def get_map(self, map_name):
-		""" Returns Map object registered under given name. """
-		return self._maps[map_name]
+		""" Returns Map object registered under given name.
+		Map is loaded (or restored after eviction) if needed.
+		Raises KeyError if there is no such map.
+		"""
+		level_map = self._maps.get(map_name)
+		if level_map is not None:
+			self._map_usage.move_to_end(map_name)
+			return level_map
+		pending = self._pending_loads.pop(map_name, None)
+		if map_name in self._evicted:
+			level_map = pending.result() if pending is not None else self._read_evicted_map(map_name)
+			self._drop_evicted_map(map_name)
+			level_map.set_actor_listener(functools.partial(self._update_actor_index, map_name))
+			summary = self._map_summaries.get(map_name)
+			if summary is not None and summary.token is None:
+				# Portals are still valid, but regions of the restored map are numbered anew.
+				summary.token = self._get_map_token(level_map)
+				summary.regions = {}
+				self._summary_revision += 1
+		else:
+			loader = self._loaders[map_name]
+			level_map = loader.finish(pending.result()) if pending is not None else loader()
+			self._index_actors(map_name, level_map)
+		self._maps[map_name] = level_map
+		self._mark_map_loaded(map_name)
+		return level_map
+	@typed((int, None))
+	def set_prefetch_radius(self, radius):
+		""" Enables prefetching of maps behind portals that are within given distance
+		from the player (in steps, obstacles are not considered).
+		Prefetching is checked after every move of the player (see shift_player).
+		Evicted maps are read back in background, maps that were never loaded
+		are prefetched only if their loaders are derived from MapLoader
+		(then only MapLoader.prepare() is called in background).
+		If radius is None (default), maps are loaded only upon request.
+		"""
+		self._prefetch_radius = radius
+		self.prefetch_maps()
+	def prefetch_maps(self):
+		""" Starts background loading of maps behind portals near the player (see set_prefetch_radius).
+		Prefetched maps are not added to the world (and do not evict other maps)
+		until they are requested (see get_map), which waits for the loading to finish if needed.
+		Queued loading of maps that are not near the player anymore is cancelled.
+		Finished results are kept while the player stays within twice the radius,
+		so walking back and forth does not load the same maps again.
+		"""
+		if self._prefetch_radius is None:
+			return
+		level_map = self.get_current_map()
+		player_pos = level_map.get_player_pos()
+		nearby_maps, retained_maps = [], set()
+		for pos, portal in (level_map.iter_portals() if player_pos is not None else ()):
+			distance = abs(pos.x - player_pos.x) + abs(pos.y - player_pos.y)
+			if distance > 2 * self._prefetch_radius:
+				continue
+			dest_map_name, _ = portal.get_dest()
+			if dest_map_name in self._maps:
+				continue
+			if dest_map_name not in self._evicted and not isinstance(self._loaders.get(dest_map_name), MapLoader):
+				continue
+			retained_maps.add(dest_map_name)
+			if distance <= self._prefetch_radius and dest_map_name not in nearby_maps:
+				nearby_maps.append(dest_map_name)
+		for map_name, pending in list(self._pending_loads.items()):
+			if map_name in nearby_maps:
+				continue
+			if pending.cancel() or (pending.done() and map_name not in retained_maps):
+				del self._pending_loads[map_name] # Running load is dropped when it is done.
+		for map_name in nearby_maps:
+			if map_name in self._pending_loads:
+				continue
+			if map_name in self._evicted:
+				pending = _get_prefetch_executor().submit(_read_map_file, self._evicted[map_name])
+			else:
+				pending = _get_prefetch_executor().submit(self._loaders[map_name].prepare)
+			self._pending_loads[map_name] = pending
 	@typed(str)
 	def set_current_map(self, map_name):
 		""" Sets current map by name. """
 		self._current_map = map_name
 	def get_current_map(self):
 		""" Returns current map object. """
-		return self._maps[self._current_map]
+		return self.get_map(self._current_map)
+	def get_current_map_name(self):
+		""" Returns name of the current map. """
+		return self._current_map
+	def iter_maps(self):
+		""" Iterates over pairs (map name, map object). """
+		return iter(self._maps.items())
+	@typed(str)
+	def get_loaded_map(self, map_name):
+		""" Returns Map object if it is currently loaded, otherwise None.
+		Unlike get_map, never loads map and does not count as map usage (see set_memory_budget).
+		"""
+		return self._maps.get(map_name)
+	def get_loaded_revision(self):
+		""" Returns number that changes every time set of loaded maps is changed
+		(maps are added, loaded or evicted).
+		"""
+		return self._loaded_revision
+	@staticmethod
+	def _get_map_token(level_map):
+		return id(level_map), level_map.get_terrain_revision(), level_map.get_portal_revision()
+	def _get_map_summary(self, map_name, load=True):
+		""" Returns portal data of the map (see _MapSummary), re-creates it if loaded map has changed.
+		Summary of evicted map is kept from the moment of eviction.
+		Map that was never loaded is loaded, unless load is False (then returns None).
+		"""
+		summary = self._map_summaries.get(map_name)
+		level_map = self._maps.get(map_name)
+		if level_map is None:
+			if summary is not None or not load:
+				return summary
+			level_map = self.get_map(map_name)
+		token = self._get_map_token(level_map)
+		if summary is not None and summary.token == token:
+			return summary
+		summary = _MapSummary(token, [(pos,) + portal.get_dest() for pos, portal in level_map.iter_portals()])
+		self._map_summaries[map_name] = summary
+		self._summary_revision += 1
+		return summary
+	def _get_region(self, map_name, pos):
+		""" Returns connected region of position on the map (see Map.get_region)
+		and remembers it in the map summary, so it is known even after the map is evicted.
+		"""
+		summary = self._get_map_summary(map_name)
+		pos = tuple(pos)
+		region = summary.regions.get(pos)
+		if region is None:
+			region = summary.regions[pos] = self.get_map(map_name).get_region(pos)
+		return region
+	@typed(str, loaded_only=bool)
+	def get_map_distances(self, map_name, loaded_only=False):
+		""" Returns dict of map names that can be reached from the given map via portals
+		with minimal number of portal jumps (including given map itself with 0 jumps).
+		Terrain is not considered, portals leading to unknown maps are ignored.
+		Maps that were never loaded are loaded to find their portals,
+		unless loaded_only is True (then they are treated as having no portals).
+		"""
+		known_maps = set(self.get_map_names())
+		distances = {map_name : 0}
+		frontier = [map_name]
+		while frontier:
+			next_frontier = []
+			for name in frontier:
+				summary = self._get_map_summary(name, load=not loaded_only)
+				for _, dest_name, _ in (summary.portals if summary else ()):
+					if dest_name in known_maps and dest_name not in distances:
+						distances[dest_name] = distances[name] + 1
+						next_frontier.append(dest_name)
+			frontier = next_frontier
+		return distances
+	@typed(str)
+	def find_actor(self, name):
+		""" Finds actor with given name on any map.
+		Returns tuple (map name, pos, actor).
+		Returns None if no such actor is found.
+		Map is loaded if needed (e.g. after eviction).
+		Maps that were never loaded are loaded one by one until actor is found.
+		If there are actors with the same name on several maps, any of them is returned.
+		"""
+		for map_name in self.get_map_names():
+			if name in self._actor_maps:
+				break
+			if map_name not in self._maps and map_name not in self._evicted:
+				self.get_map(map_name)
+		maps = self._actor_maps.get(name)
+		if not maps:
+			return None
+		map_name = next(iter(maps))
+		level_map = self.get_map(map_name)
+		return map_name, level_map.find_actor_pos(name), level_map.find_actor(name)
+	def _get_portal_graph(self):
+		""" Returns cached graph of connected regions across all maps (see _PortalGraph).
+		Graph is re-built only if maps were added/replaced, or their terrain or portals have changed
+		(see Map.get_terrain_revision, Map.get_portal_revision).
+		Evicted maps are loaded only if regions of their portals or entrances are not known yet.
+		"""
+		for map_name, level_map in self._maps.items(): # Only loaded maps can change.
+			summary = self._map_summaries.get(map_name)
+			if summary is None or summary.token != self._get_map_token(level_map):
+				self._get_map_summary(map_name)
+		if self._portal_graph is not None and self._portal_graph.key == self._summary_revision:
+			return self._portal_graph
+		summaries = {map_name : self._get_map_summary(map_name) for map_name in self.get_map_names()}
+		edges = {}
+		for map_name, summary in summaries.items():
+			for pos, dest_map_name, entrance_pos in summary.portals:
+				if dest_map_name not in summaries:
+					continue
+				region = self._get_region(map_name, pos)
+				if not region:
+					continue
+				dest_region = self._get_region(dest_map_name, entrance_pos)
+				if not dest_region:
+					continue
+				edges.setdefault((map_name, region), set()).add((dest_map_name, dest_region))
+		self._portal_graph = _PortalGraph(self._summary_revision, edges)
+		return self._portal_graph
+	@typed(str, (Point, tuple, list), str, (Point, tuple, list))
+	def is_reachable(self, source_map, source_pos, dest_map, dest_pos):
+		""" Returns True if dest_pos on dest_map can be reached from source_pos on source_map
+		by walking over passable terrain and through portals (actors are not considered).
+		Uses connected regions of maps (see Map.get_region) and graph of portals between them,
+		so once graph is built, repeated queries from the same region are just set lookups.
+		Evicted maps are not loaded again if regions of given positions are already known.
+		"""
+		source = (source_map, self._get_region(source_map, source_pos))
+		dest = (dest_map, self._get_region(dest_map, dest_pos))
+		if not source[1] or not dest[1]:
+			return False
+		if source == dest:
+			return True
+		graph = self._get_portal_graph()
+		reachable = graph.reachable.get(source)
+		if reachable is None:
+			reachable = set()
+			frontier = [source]
+			while frontier:
+				for node in graph.edges.get(frontier.pop(), ()):
+					if node not in reachable:
+						reachable.add(node)
+						frontier.append(node)
+			graph.reachable[source] = reachable
+		return dest in reachable
 	@typed(Quest)
 	def add_quest(self, quest):
 		""" Registers new quest under its ID. """
@@ -61,6 +527,7 @@ class World:
 		""" Moves player character on the current map by given shift.
 		See details in Map.shift_player.
 		May move actors across the map or perform other global-world actions.
+		Starts prefetching of maps near the new position of the player (see set_prefetch_radius).
 		If on_change_map is supplied, it is a callable that accepts Map object
 		and is called when current map is changed.
 		"""
@@ -73,3 +540,108 @@ class World:
 			self.set_current_map(dest_map_name)
 			if on_change_map:
 				on_change_map(self.get_current_map())
+		self.prefetch_maps()
+
+class Scheduler:
+	""" Simulation scheduler: ticks NPCs on all maps of the world (see NPC.update).
+
+	Current map is updated on every tick.
+	Other maps are updated less often depending on their distance from the current map (in portal jumps):
+	map at distance D is updated every distance_factor**D ticks (but not rarer than every max_interval ticks),
+	maps that cannot be reached from the current map are updated every max_interval ticks.
+	Skipped ticks are passed to NPCs with the next update, so they can catch up in bulk.
+
+	Maps are kept in a queue ordered by the tick of their next update,
+	and at most max_maps_per_tick maps (including the current one) are updated per tick,
+	so the cost of a tick does not depend on the total number of maps.
+	Postponed maps are updated on the following ticks with all the accumulated ticks.
+	Map distances are re-calculated and the queue is rebuilt only when current map changes
+	or maps are added, loaded or evicted (see also reschedule).
+	Only loaded maps are simulated (see World.set_memory_budget),
+	map that is loaded again after eviction receives all ticks passed since its last update.
+
+	If workers > 0, maps are updated concurrently in a thread pool of that size.
+	NPCs of the same map are always updated sequentially in a single thread,
+	so NPC.update should affect only its own map (placing and removing actors is safe,
+	as global actor index of the world is locked, see World.find_actor).
+	"""
+	@typed(World, distance_factor=int, max_interval=int, max_maps_per_tick=int, workers=int)
+	def __init__(self, world, distance_factor=2, max_interval=64, max_maps_per_tick=8, workers=0):
+		self._world = world
+		self._distance_factor = distance_factor
+		self._max_interval = max_interval
+		self._max_maps_per_tick = max(1, max_maps_per_tick)
+		self._executor = ThreadPoolExecutor(max_workers=workers) if workers > 0 else None
+		self._tick = 0
+		self._last_update = {}
+		self._intervals = {}
+		self._queue = []
+		self._scheduled_for = None
+	def close(self):
+		""" Shuts down worker threads (if any). """
+		if self._executor:
+			self._executor.shutdown()
+			self._executor = None
+	def __enter__(self):
+		return self
+	def __exit__(self, *_):
+		self.close()
+	def get_tick(self):
+		""" Returns number of ticks passed since the start of the simulation. """
+		return self._tick
+	@typed(str)
+	def get_interval(self, map_name):
+		""" Returns number of ticks between updates of the given map (1 for the current map). """
+		if self._scheduled_for is None:
+			self.reschedule()
+		return self._intervals.get(map_name, self._max_interval)
+	def reschedule(self):
+		""" Re-calculates update intervals of all maps and rebuilds the queue.
+		Called automatically when current map changes or maps are added, loaded or evicted,
+		should be called manually when portals between maps were changed.
+		"""
+		current_map = self._world.get_current_map_name()
+		distances = self._world.get_map_distances(current_map, loaded_only=True)
+		self._intervals = {
+				map_name : min(self._max_interval, self._distance_factor ** distance)
+				for map_name, distance in distances.items()
+				}
+		self._queue = []
+		for map_name in self._world.get_map_names():
+			self._last_update.setdefault(map_name, self._tick)
+		for map_name, _ in self._world.iter_maps():
+			if map_name == current_map:
+				continue
+			due = self._last_update[map_name] + self._intervals.get(map_name, self._max_interval)
+			self._queue.append((due, map_name))
+		heapq.heapify(self._queue)
+		self._scheduled_for = (current_map, self._world.get_loaded_revision())
+	def tick(self):
+		""" Advances simulation by one tick and updates maps that are due.
+		Returns list of names of updated maps.
+		"""
+		current_map = self._world.get_current_map_name()
+		self._world.get_current_map() # Makes sure it is loaded.
+		if self._scheduled_for != (current_map, self._world.get_loaded_revision()):
+			self.reschedule()
+		self._tick += 1
+		due_maps = [current_map]
+		while self._queue and self._queue[0][0] <= self._tick and len(due_maps) < self._max_maps_per_tick:
+			due_maps.append(heapq.heappop(self._queue)[1])
+		updates = [(self._world.get_loaded_map(map_name), self._tick - self._last_update[map_name]) for map_name in due_maps]
+		if self._executor:
+			list(self._executor.map(self._update_map, updates))
+		else:
+			for update in updates:
+				self._update_map(update)
+		for map_name in due_maps:
+			self._last_update[map_name] = self._tick
+			if map_name != current_map:
+				interval = self._intervals.get(map_name, self._max_interval)
+				heapq.heappush(self._queue, (self._tick + interval, map_name))
+		return due_maps
+	def _update_map(self, update):
+		level_map, ticks = update
+		for pos, actor in list(level_map.iter_actors()):
+			if isinstance(actor, NPC):
+				actor.update(level_map, pos, ticks)
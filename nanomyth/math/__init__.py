@@ -1,4 +1,4 @@
 from .vector import Vector, Point, Size
 from .rect import Rect
-from .matrix import Matrix
+from .matrix import Matrix, ArrayMatrix, MatrixView
 from . import mapping
@@ -1,10 +1,36 @@
 import itertools
+import operator
 import copy
+from copy import deepcopy
+import array
 from .vector import Point, Size
+from .rect import Rect
+
+_IMMUTABLE_TYPES = (type(None), bool, int, float, complex, str, bytes, frozenset, range)
+
+def _is_immutable(value):
+	""" Returns True if value cannot be changed in-place and thus can be shared without copying.
+	Objects that return themselves from __deepcopy__ are considered immutable as well.
+	"""
+	if isinstance(value, tuple):
+		return all(map(_is_immutable, value))
+	if isinstance(value, _IMMUTABLE_TYPES):
+		return True
+	deepcopy_method = getattr(type(value), '__deepcopy__', None)
+	return deepcopy_method is not None and deepcopy_method(value, {}) is value
 
 class Matrix(object):
 	""" Represents 2D matrix of arbitrary objects.
 	"""
+	# Storage sharing counter for copy-on-write clones (see clone()).
+	# Kept in a slot rather than in __dict__ and excluded from the serialized state (see __getstate__).
+	__slots__ = ('__dict__', '_storage_owners')
+	def __new__(cls, *args, **kwargs):
+		obj = super().__new__(cls)
+		obj._storage_owners = None
+		return obj
+	def __getstate__(self):
+		return self.__dict__
 	def __init__(self, dims, default=None):
 		""" Creates Matrix with specified dimensions (iterable len=2) and fills with specified default value:
 		a = Matrix( (3, 3), default='.')
@@ -17,18 +43,66 @@ class Matrix(object):
 			self.data = copy.deepcopy(other.data)
 			return
 		self.resize(dims, default=default)
+	def clone(self):
+		""" Returns copy-on-write clone of the matrix.
+		Clone shares storage with the original matrix until the first write to either of them,
+		so cloning itself costs almost nothing (useful for snapshots).
+		NOTE: Cell values themselves are not copied, so mutable cell objects should not be changed in-place.
+		"""
+		other = type(self).__new__(type(self))
+		other.__dict__.update(self.__dict__)
+		other.dims = copy.copy(self.dims)
+		owners = self._storage_owners or [1]
+		owners[0] += 1
+		self._storage_owners = other._storage_owners = owners
+		return other
+	__copy__ = clone
+	def _detach_storage(self, copy_data=True):
+		""" Should be called before any in-place changes of storage.
+		If storage is shared with clones, makes private copy of it (unless copy_data is False).
+		"""
+		owners = self._storage_owners
+		if owners is None:
+			return
+		self._storage_owners = None
+		owners[0] -= 1
+		if owners[0] > 0 and copy_data:
+			self.data = self.data[:]
 	def resize(self, dims, default=None):
 		""" Resizes matrix to a new size.
-		NOTE: Clears map and fills with new default values.
+		Values in the overlapping region (from the topleft corner) are kept,
+		newly exposed cells are filled with default value.
+		Immutable default values (numbers, strings etc) are shared between cells,
+		mutable ones are deep-copied for each new cell.
 		"""
 		width, height = dims
 		assert isinstance(width, int)
 		assert isinstance(height, int)
 		assert width > 0
 		assert height > 0
+		self._detach_storage(copy_data=False) # New storage is created below anyway.
+		old_data = getattr(self, 'data', None)
+		if old_data is None:
+			self.dims = Size(width, height)
+			self.data = self._make_data(default, width * height)
+			return
+		old_width, old_height = self.dims
+		keep_width, keep_height = min(width, old_width), min(height, old_height)
+		if keep_width == old_width == width:
+			data = old_data[:width * keep_height]
+		else:
+			data = self._make_data(default, 0)
+			for start in range(0, old_width * keep_height, old_width):
+				data.extend(old_data[start:start + keep_width])
+				data.extend(self._make_data(default, width - keep_width))
+		data.extend(self._make_data(default, width * (height - keep_height)))
 		self.dims = Size(width, height)
-		# TODO maybe clearing is not the best idea, maybe I should keep old values wherever is possible.
-		self.data = [copy.deepcopy(default) for _ in range(width * height)]
+		self.data = data
+	def _make_data(self, default, count):
+		""" Returns storage for given number of cells filled with default value. """
+		if _is_immutable(default):
+			return [default] * count
+		return [copy.deepcopy(default) for _ in range(count)]
 	def fill(self, topleft, downright, value):
 		""" Fills rectangle (including borders) with specified value. """
 		topleft = Point(topleft)
@@ -61,24 +135,42 @@ class Matrix(object):
 		return not (self == other)
 	def valid(self, pos):
 		""" Returns True if pos is within Matrix boundaries. """
-		pos = Point(pos)
-		return 0 <= pos.x < self.dims.width and 0 <= pos.y < self.dims.height
+		x, y = pos
+		return 0 <= x < self.dims.width and 0 <= y < self.dims.height
 	def cell(self, pos):
 		""" Returns value of specified cell.
 		Raises KeyError is position is invalid.
 		"""
-		pos = Point(pos)
-		if not self.valid(pos):
-			raise KeyError('Invalid cell position: {0}'.format(pos))
-		return self.data[pos.x + pos.y * self.dims.width]
+		x, y = pos
+		width = self.dims.width
+		if not (0 <= x < width and 0 <= y < self.dims.height):
+			raise KeyError('Invalid cell position: {0}'.format(Point(x, y)))
+		return self.data[x + y * width]
 	def set_cell(self, pos, value):
 		""" Sets value of specified cell.
 		Raises KeyError is position is invalid.
 		"""
-		pos = Point(pos)
-		if not self.valid(pos):
-			raise KeyError('Invalid cell position: {0}'.format(pos))
-		self.data[pos.x + pos.y * self.dims.width] = value
+		x, y = pos
+		width = self.dims.width
+		if not (0 <= x < width and 0 <= y < self.dims.height):
+			raise KeyError('Invalid cell position: {0}'.format(Point(x, y)))
+		if self._storage_owners is not None:
+			self._detach_storage()
+		self.data[x + y * width] = value
+	def cell_xy(self, x, y):
+		""" Returns value of cell at (x, y).
+		Raw accessor for tight loops: no Point is created and boundaries are not checked,
+		so caller is responsible for passing valid coordinates.
+		"""
+		return self.data[x + y * self.dims.width]
+	def set_cell_xy(self, x, y, value):
+		""" Sets value of cell at (x, y).
+		Raw accessor for tight loops: no Point is created and boundaries are not checked,
+		so caller is responsible for passing valid coordinates.
+		"""
+		if self._storage_owners is not None:
+			self._detach_storage()
+		self.data[x + y * self.dims.width] = value
 	def keys(self):
 		""" Iterates over all available positions. """
 		return iter(Point(x, y) for y, x in itertools.product(range(self.dims.height), range(self.dims.width)))
@@ -88,22 +180,47 @@ class Matrix(object):
 	def __iter__(self):
 		""" Iterates over all available positions, see keys(). """
 		return self.keys()
+	def rows(self):
+		""" Iterates over rows from top to bottom.
+		Each row is an iterator over values from left to right, read lazily from the matrix storage (no copying).
+		"""
+		data, width = self.data, self.dims.width
+		for start in range(0, width * self.dims.height, width):
+			yield map(data.__getitem__, range(start, start + width))
+	def iter_items(self):
+		""" Iterates over all cells row by row.
+		Yields tuples (x, y, value) without creating Point objects.
+		"""
+		for y, row in enumerate(self.rows()):
+			for x, value in enumerate(row):
+				yield x, y, value
+	def __getitem__(self, rect):
+		""" Returns rectangular sub-view of the matrix: matrix[Rect(...)] or matrix[(x, y, width, height)].
+		See MatrixView for details.
+		"""
+		return MatrixView(self, rect)
 	def find(self, value):
 		""" Yields positions where value is found. """
-		for pos in self.keys():
-			if self.cell(pos) == value:
-				yield pos
+		for x, y, cell in self.iter_items():
+			if cell == value:
+				yield Point(x, y)
 	def find_if(self, condition):
 		""" Yields positions where values match given condition. """
-		for pos in self.keys():
-			if condition(self.cell(pos)):
-				yield pos
-	def transform(self, transformer):
+		for x, y, cell in self.iter_items():
+			if condition(cell):
+				yield Point(x, y)
+	def transform(self, transformer, copy=True):
 		""" Returns new instance of matrix with same dimensions
 		and transformer(c) applied for each cell.
+		By default each cell is deep-copied before passing to transformer.
+		If copy is False, original cell values are passed directly,
+		so transformer should not change them in-place.
 		"""
 		new_matrix = Matrix(self.dims)
-		new_matrix.data = [transformer(copy.deepcopy(c)) for c in self.data]
+		if copy:
+			new_matrix.data = [transformer(deepcopy(c)) for c in self.data]
+		else:
+			new_matrix.data = list(map(transformer, self.data))
 		return new_matrix
 	@classmethod
 	def from_iterable(cls, iterable):
@@ -151,3 +268,192 @@ class Matrix(object):
 				result += transformer(c)
 			result += '\n'
 		return result
+
+class ArrayMatrix(Matrix):
+	""" Represents 2D matrix of plain numeric values (e.g. tile IDs).
+	Values are stored in compact array.array of given type code (see module `array`),
+	so there is no per-cell Python object and no per-cell copying.
+	"""
+	def __init__(self, dims, default=0, typecode='i'):
+		""" Creates ArrayMatrix with specified dimensions and fills with specified default value:
+		a = ArrayMatrix( (3, 3), default=0)
+		b = ArrayMatrix( Size(3, 3), default=0.5, typecode='f')
+		c = ArrayMatrix(b) # Creates copy of another matrix (typecode is taken from other ArrayMatrix).
+		d = ArrayMatrix(Matrix.from_iterable([[0, 1], [2, 3]])) # Converts plain matrix.
+		"""
+		if isinstance(dims, Matrix):
+			other = dims
+			self.typecode = getattr(other, 'typecode', typecode)
+			self.dims = copy.copy(other.dims)
+			self.data = array.array(self.typecode, other.data)
+			return
+		self.typecode = typecode
+		self.resize(dims, default=default)
+	def __getstate__(self):
+		return {'dims':self.dims, 'typecode':self.typecode, 'data':self.data.tolist()}
+	def __setstate__(self, state):
+		self.dims = state['dims']
+		self.typecode = state['typecode']
+		self.data = array.array(self.typecode, state['data'])
+	def __repr__(self): # pragma: no cover
+		return 'ArrayMatrix(({0}, {1}), typecode={2})'.format(*self.dims, repr(self.typecode))
+	def resize(self, dims, default=0):
+		""" Resizes matrix to a new size.
+		Values in the overlapping region (from the topleft corner) are kept,
+		newly exposed cells are filled with default value.
+		"""
+		super().resize(dims, default=default)
+	def _make_data(self, default, count):
+		return array.array(self.typecode, [default]) * count
+	def fill(self, topleft, downright, value):
+		""" Fills rectangle (including borders) with specified value.
+		Fills whole row slices at once.
+		"""
+		topleft = Point(topleft)
+		downright = Point(downright)
+		row_width = downright.x - topleft.x + 1
+		if row_width <= 0 or downright.y < topleft.y:
+			return
+		for corner in (topleft, downright):
+			if not self.valid(corner):
+				raise KeyError('Invalid cell position: {0}'.format(corner))
+		self._detach_storage()
+		row = array.array(self.typecode, [value]) * row_width
+		for y in range(topleft.y, downright.y + 1):
+			start = topleft.x + y * self.dims.width
+			self.data[start:start + row_width] = row
+	def _positions(self, indices):
+		width = self.dims.width
+		return (Point(index % width, index // width) for index in indices)
+	def find(self, value):
+		""" Yields positions where value is found. """
+		matches = map(operator.eq, self.data, itertools.repeat(value))
+		return self._positions(itertools.compress(itertools.count(), matches))
+	def find_if(self, condition):
+		""" Yields positions where values match given condition. """
+		return self._positions(itertools.compress(itertools.count(), map(condition, self.data)))
+	def transform(self, transformer, copy=True, typecode=None):
+		""" Returns new instance of matrix with same dimensions
+		and transformer(c) applied for each cell.
+		If typecode is specified, result is an ArrayMatrix of that type,
+		otherwise it is a plain Matrix (transformer may return any objects).
+		Values are plain numbers, so they are never copied before transforming
+		(copy argument is accepted for compatibility with Matrix.transform).
+		"""
+		if typecode is None:
+			new_matrix = Matrix(self.dims)
+			new_matrix.data = list(map(transformer, self.data))
+			return new_matrix
+		new_matrix = ArrayMatrix(self.dims, typecode=typecode)
+		new_matrix.data = array.array(typecode, map(transformer, self.data))
+		return new_matrix
+	@classmethod
+	def from_iterable(cls, iterable, typecode='i'):
+		""" Creates matrix from iterable of iterables (set of rows).
+		See Matrix.from_iterable for details.
+		"""
+		return cls(Matrix.from_iterable(iterable), typecode=typecode)
+	@classmethod
+	def fromstring(cls, multiline_string, transformer=int, typecode='i'):
+		""" Creates matrix from multiline string.
+		Transformer should convert each char to a number (default is int()).
+		See Matrix.fromstring for details.
+		"""
+		return cls(Matrix.fromstring(multiline_string, transformer=transformer), typecode=typecode)
+	def tostring(self, transformer=None):
+		""" Returns multiline string representation of matrix.
+		See Matrix.tostring for details.
+		"""
+		if not transformer:
+			transformer = str
+		width = self.dims.width
+		return ''.join(
+				''.join(map(transformer, self.data[start:start+width])) + '\n'
+				for start in range(0, len(self.data), width)
+				)
+
+class MatrixView(object):
+	""" Rectangular window into a Matrix (see Matrix.__getitem__).
+	Does not copy values: all reads and writes go directly to the original matrix.
+	Positions are relative to the topleft corner of the view.
+	"""
+	def __init__(self, matrix, rect):
+		""" Creates view of the given rect (Rect or tuple (x, y, width, height)) of the matrix.
+		Rect should be fully within matrix boundaries, otherwise KeyError is raised.
+		"""
+		rect = Rect(rect)
+		if rect.width <= 0 or rect.height <= 0 or not (matrix.valid(rect.topleft) and matrix.valid(rect.bottomright)):
+			raise KeyError('Invalid view rect: {0}'.format(rect))
+		self.matrix = matrix
+		self.rect = rect
+		self.dims = rect.size
+	def __repr__(self): # pragma: no cover
+		return 'MatrixView({0}, {1})'.format(repr(self.matrix), self.rect)
+	@property
+	def size(self):
+		""" Returns iterable of size (two-component). """
+		return self.dims
+	@property
+	def width(self):
+		return self.dims.width
+	@property
+	def height(self):
+		return self.dims.height
+	def valid(self, pos):
+		""" Returns True if pos is within view boundaries. """
+		x, y = pos
+		return 0 <= x < self.dims.width and 0 <= y < self.dims.height
+	def cell(self, pos):
+		""" Returns value of specified cell.
+		Raises KeyError is position is invalid.
+		"""
+		if not self.valid(pos):
+			raise KeyError('Invalid cell position: {0}'.format(Point(pos)))
+		x, y = pos
+		return self.matrix.cell_xy(self.rect.left + x, self.rect.top + y)
+	def set_cell(self, pos, value):
+		""" Sets value of specified cell.
+		Raises KeyError is position is invalid.
+		"""
+		if not self.valid(pos):
+			raise KeyError('Invalid cell position: {0}'.format(Point(pos)))
+		x, y = pos
+		self.matrix.set_cell_xy(self.rect.left + x, self.rect.top + y, value)
+	def cell_xy(self, x, y):
+		""" Returns value of cell at (x, y) without boundary checks, see Matrix.cell_xy. """
+		return self.matrix.cell_xy(self.rect.left + x, self.rect.top + y)
+	def set_cell_xy(self, x, y, value):
+		""" Sets value of cell at (x, y) without boundary checks, see Matrix.set_cell_xy. """
+		self.matrix.set_cell_xy(self.rect.left + x, self.rect.top + y, value)
+	def keys(self):
+		""" Iterates over all positions of the view. """
+		return iter(Point(x, y) for y in range(self.dims.height) for x in range(self.dims.width))
+	def values(self):
+		""" Iterates over all values of the view row by row. """
+		return itertools.chain.from_iterable(self.rows())
+	def __iter__(self):
+		""" Iterates over all positions, see keys(). """
+		return self.keys()
+	def rows(self):
+		""" Iterates over rows from top to bottom.
+		Each row is an iterator over values from left to right, read lazily from the matrix storage (no copying).
+		"""
+		data, full_width = self.matrix.data, self.matrix.dims.width
+		left, width = self.rect.left, self.dims.width
+		for y in range(self.rect.top, self.rect.top + self.dims.height):
+			start = y * full_width + left
+			yield map(data.__getitem__, range(start, start + width))
+	def iter_items(self):
+		""" Iterates over all cells of the view row by row.
+		Yields tuples (x, y, value) with positions relative to the view.
+		"""
+		for y, row in enumerate(self.rows()):
+			for x, value in enumerate(row):
+				yield x, y, value
+	def __getitem__(self, rect):
+		""" Returns sub-view of this view (rect is relative to the view).
+		"""
+		rect = Rect(rect)
+		if not (self.valid(rect.topleft) and self.valid(rect.bottomright)):
+			raise KeyError('Invalid view rect: {0}'.format(rect))
+		return MatrixView(self.matrix, Rect(self.rect.topleft + rect.topleft, rect.size))
@@ -1,12 +1,15 @@
 import textwrap
+import copy
 import json
+import pickle
 try:
 	import jsonpickle
 except ImportError: # pragma: no cover
 	jsonpickle = None
 from ...utils import unittest
-from ..vector import Point
-from ..matrix import Matrix
+from ..vector import Point, Size
+from ..rect import Rect
+from ..matrix import Matrix, ArrayMatrix
 
 class TestMatrix(unittest.TestCase):
 	def should_create_matrix(self):
@@ -48,6 +51,28 @@ class TestMatrix(unittest.TestCase):
 		self.assertEqual(m.size, (2, 3))
 		m.resize((3, 2), default='_')
 		self.assertEqual(m.size, (3, 2))
+	def should_keep_values_when_resizing_matrix(self):
+		m = Matrix.fromstring('ab\ncd')
+		m.resize((3, 3), default='.')
+		self.assertEqual(m.tostring(), 'ab.\ncd.\n...\n')
+		m.resize((3, 1))
+		self.assertEqual(m.tostring(), 'ab.\n')
+		m.resize((1, 2), default='_')
+		self.assertEqual(m.tostring(), 'a\n_\n')
+		m.resize((1, 3), default='*')
+		self.assertEqual(m.tostring(), 'a\n_\n*\n')
+	def should_copy_only_mutable_defaults_when_resizing_matrix(self):
+		m = Matrix((2, 1), default=(1, 'a'))
+		self.assertIs(m.cell((0, 0)), m.cell((1, 0)))
+		m.resize((2, 2), default=[])
+		self.assertEqual(m.cell((0, 1)), [])
+		self.assertIsNot(m.cell((0, 1)), m.cell((1, 1)))
+
+		class Constant:
+			def __deepcopy__(self, memo):
+				return self
+		m.resize((2, 3), default=Constant())
+		self.assertIs(m.cell((0, 2)), m.cell((1, 2)))
 	def should_create_matrix_from_other_matrix(self):
 		original = Matrix((2, 2))
 		original.set_cell((0, 0), 'a')
@@ -89,6 +114,12 @@ class TestMatrix(unittest.TestCase):
 			m.set_cell((-1, -1), 'a')
 		with self.assertRaises(KeyError):
 			m.set_cell((1, 10), 'a')
+	def should_access_cells_by_raw_coords(self):
+		m = Matrix((2, 3), default=' ')
+		m.set_cell_xy(1, 2, '*')
+		self.assertEqual(m.cell_xy(1, 2), '*')
+		self.assertEqual(m.cell(Point(1, 2)), '*')
+		self.assertEqual(m.cell_xy(0, 2), ' ')
 	def should_iterate_over_indexes(self):
 		m = Matrix((2, 2))
 		m.data = list('abcd')
@@ -98,6 +129,46 @@ class TestMatrix(unittest.TestCase):
 		self.assertEqual(indexes, '00 10 01 11')
 		values = ' '.join(m.values())
 		self.assertEqual(values, 'a b c d')
+	def should_iterate_over_items_and_rows(self):
+		m = Matrix.fromstring('ab\ncd\nef')
+		self.assertEqual(list(m.iter_items()), [
+			(0, 0, 'a'), (1, 0, 'b'),
+			(0, 1, 'c'), (1, 1, 'd'),
+			(0, 2, 'e'), (1, 2, 'f'),
+			])
+		self.assertEqual([''.join(row) for row in m.rows()], ['ab', 'cd', 'ef'])
+	def should_slice_matrix_into_views(self):
+		m = Matrix.fromstring(textwrap.dedent("""\
+				abcd
+				efgh
+				ijkl
+				"""))
+		view = m[Rect((1, 1), (3, 2))]
+		self.assertEqual(view.size, Size(3, 2))
+		self.assertEqual((view.width, view.height), (3, 2))
+		self.assertEqual([''.join(row) for row in view.rows()], ['fgh', 'jkl'])
+		self.assertEqual(''.join(view.values()), 'fghjkl')
+		self.assertEqual(list(view), [Point(0, 0), Point(1, 0), Point(2, 0), Point(0, 1), Point(1, 1), Point(2, 1)])
+		self.assertEqual(list(view.iter_items())[:2], [(0, 0, 'f'), (1, 0, 'g')])
+		self.assertEqual(view.cell((0, 1)), 'j')
+		self.assertEqual(view.cell_xy(2, 0), 'h')
+		with self.assertRaises(KeyError):
+			view.cell((3, 0))
+
+		view.set_cell((0, 0), 'F')
+		view.set_cell_xy(2, 1, 'L')
+		self.assertEqual(m.tostring(), 'abcd\neFgh\nijkL\n')
+		with self.assertRaises(KeyError):
+			view.set_cell((0, 2), 'x')
+
+		subview = view[(1, 0, 2, 2)]
+		self.assertEqual([''.join(row) for row in subview.rows()], ['gh', 'kL'])
+		with self.assertRaises(KeyError):
+			view[(1, 0, 3, 2)]
+		with self.assertRaises(KeyError):
+			m[(2, 2, 3, 1)]
+		with self.assertRaises(KeyError):
+			m[(0, 0, 0, 1)]
 	def should_find_value_in_matrix(self):
 		a = Matrix.fromstring(textwrap.dedent("""\
 				ab
@@ -116,6 +187,48 @@ class TestMatrix(unittest.TestCase):
 			0, 1,
 			2, 3,
 			])
+	def should_transform_matrix_without_copying(self):
+		cells = [[1], [2]]
+		original = Matrix.from_iterable([cells])
+		processed = original.transform(lambda c: c, copy=False)
+		self.assertIs(processed.cell((0, 0)), cells[0])
+		processed = original.transform(lambda c: c)
+		self.assertIsNot(processed.cell((0, 0)), cells[0])
+		self.assertEqual(processed.cell((0, 0)), cells[0])
+	def should_clone_matrix_with_copy_on_write(self):
+		original = Matrix.fromstring('ab\ncd')
+		clone = original.clone()
+		self.assertIs(clone.data, original.data)
+		self.assertEqual(clone, original)
+		other_clone = copy.copy(original)
+		self.assertIs(other_clone.data, original.data)
+
+		clone.set_cell((0, 0), 'X')
+		self.assertEqual(clone.tostring(), 'Xb\ncd\n')
+		self.assertEqual(original.tostring(), 'ab\ncd\n')
+		original_data = original.data
+		original.set_cell_xy(1, 1, 'Y')
+		self.assertIsNot(original.data, original_data) # Was still shared with other clone.
+		self.assertEqual(other_clone.tostring(), 'ab\ncd\n')
+		other_clone_data = other_clone.data
+		other_clone.set_cell_xy(0, 1, 'Z') # The last owner, no need to copy.
+		self.assertIs(other_clone.data, other_clone_data)
+		self.assertEqual(original.tostring(), 'ab\ncY\n')
+
+		clone.resize((1, 1))
+		self.assertEqual(clone.tostring(), 'X\n')
+		resized_clone = clone.clone()
+		resized_clone.resize((2, 1), default='_')
+		self.assertEqual(clone.tostring(), 'X\n')
+		self.assertEqual(resized_clone.tostring(), 'X_\n')
+		self.assertEqual(pickle.loads(pickle.dumps(resized_clone)), resized_clone)
+		self.assertNotIn('_storage_owners', resized_clone.__dict__)
+
+		shared_clone = original.clone()
+		self.assertNotIn(b'_storage_owners', pickle.dumps(shared_clone))
+		restored = pickle.loads(pickle.dumps(shared_clone))
+		self.assertIsNone(restored._storage_owners)
+		self.assertEqual(restored, original)
 	def should_construct_matrix_from_iterable(self):
 		with self.assertRaises(ValueError):
 			Matrix.from_iterable( (range(3), range(4)) )
@@ -188,3 +301,79 @@ class TestMatrix(unittest.TestCase):
 				""")
 		actual = m.tostring()
 		self.assertEqual(actual, expected)
+
+class TestArrayMatrix(unittest.TestCase):
+	def should_clone_matrix_with_copy_on_write(self):
+		original = ArrayMatrix.from_iterable([[1, 2], [3, 4]])
+		clone = original.clone()
+		self.assertIs(clone.data, original.data)
+		clone.fill((0, 0), (1, 0), 0)
+		self.assertEqual(clone.data.tolist(), [0, 0, 3, 4])
+		self.assertEqual(original.data.tolist(), [1, 2, 3, 4])
+	def should_keep_values_when_resizing_matrix(self):
+		m = ArrayMatrix.from_iterable([[1, 2], [3, 4]])
+		m.resize((3, 3), default=9)
+		self.assertEqual(m.data.tolist(), [1, 2, 9, 3, 4, 9, 9, 9, 9])
+		m.resize((2, 1))
+		self.assertEqual(m.data.tolist(), [1, 2])
+		self.assertEqual(m.data.typecode, 'i')
+	def should_create_matrix(self):
+		m = ArrayMatrix((2, 3), default=1)
+		self.assertEqual(m.size, (2, 3))
+		self.assertEqual(m.typecode, 'i')
+		self.assertEqual(list(m.values()), [1] * 6)
+		m.set_cell((1, 2), 5)
+		self.assertEqual(m.cell((1, 2)), 5)
+		with self.assertRaises(TypeError):
+			m.set_cell((0, 0), 'not a number')
+	def should_create_matrix_from_other_matrix(self):
+		original = ArrayMatrix((2, 2), default=0.5, typecode='f')
+		copy = ArrayMatrix(original)
+		self.assertEqual(copy.typecode, 'f')
+		copy.set_cell((0, 0), 1.5)
+		self.assertEqual(original.cell((0, 0)), 0.5)
+		self.assertEqual(copy, ArrayMatrix.fromstring('10\n00', transformer=lambda c: 0.5 + int(c), typecode='f'))
+
+		converted = ArrayMatrix(Matrix.from_iterable([[0, 1], [2, 3]]))
+		self.assertEqual(converted.typecode, 'i')
+		self.assertEqual(converted, ArrayMatrix.from_iterable([[0, 1], [2, 3]]))
+	def should_serialize_matrix(self):
+		m = ArrayMatrix.fromstring('01\n23')
+		self.assertEqual(pickle.loads(pickle.dumps(m)), m)
+		self.assertEqual(pickle.loads(pickle.dumps(m)).typecode, 'i')
+	@unittest.skipUnless(jsonpickle, "Jsonpickle is not detected.")
+	def should_serialize_matrix_to_json(self):
+		m = ArrayMatrix.fromstring('01\n23')
+		data = json.loads(jsonpickle.encode(m, unpicklable=False))
+		self.assertEqual(data, {'data' : [0, 1, 2, 3], 'dims' : [2, 2], 'typecode' : 'i'})
+		self.assertEqual(jsonpickle.decode(jsonpickle.encode(m)), m)
+	def should_fill_rectangle(self):
+		m = ArrayMatrix((10, 5), 0)
+		m.fill(Point(3, 1), Point(8, 3), 1)
+		m.fill(Point(3, 1), Point(2, 3), 2)
+		expected = textwrap.dedent("""\
+				0000000000
+				0001111110
+				0001111110
+				0001111110
+				0000000000
+				""")
+		self.assertEqual(m.tostring(), expected)
+		with self.assertRaises(KeyError):
+			m.fill(Point(3, 1), Point(10, 3), 1)
+	def should_find_value_in_matrix(self):
+		a = ArrayMatrix.fromstring('01\n20')
+		self.assertEqual(list(a.find(0)), [Point(0, 0), Point(1, 1)])
+		self.assertEqual(list(a.find(5)), [])
+		self.assertEqual(list(a.find_if(lambda c:c>0)), [Point(1, 0), Point(0, 1)])
+		self.assertEqual(list(a.find_if(lambda c:c<0)), [])
+	def should_transform_matrix(self):
+		original = ArrayMatrix.fromstring('01\n23')
+		processed = original.transform(lambda c: c * 2, typecode='b')
+		self.assertEqual(processed.typecode, 'b')
+		self.assertEqual(list(processed.values()), [0, 2, 4, 6])
+		processed = original.transform(lambda c: '.#'[c % 2])
+		self.assertEqual(type(processed), Matrix)
+		self.assertEqual(processed.data, ['.', '#', '.', '#'])
+		processed = original.transform(str, False)
+		self.assertEqual(processed.data, ['0', '1', '2', '3'])
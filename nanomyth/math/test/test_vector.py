@@ -1,4 +1,5 @@
 import json
+import pickle
 try:
 	import jsonpickle
 except ImportError: # pragma: no cover
@@ -73,6 +74,13 @@ class TestVector(unittest.TestCase):
 		self.assertEqual(MyVector(2, 4).__truediv__(2), MyVector(1, 2))
 	def should_iterate_over_vector(self):
 		self.assertEqual(list(MyVector(1, 2)), [1, 2])
+	def should_create_plain_vectors(self):
+		v = Vector(1, 2, 3)
+		self.assertIsInstance(v, Vector)
+		self.assertEqual(v + Vector([1, 1, 1]), Vector(2, 3, 4))
+		self.assertEqual(pickle.loads(pickle.dumps(v)), v)
+		with self.assertRaises(AttributeError):
+			v.z = 1
 
 class TestPoint(unittest.TestCase):
 	def should_create_default_point(self):
@@ -95,6 +103,48 @@ class TestPoint(unittest.TestCase):
 		self.assertEqual(p.x, 5)
 		self.assertEqual(p.y, 6)
 		self.assertEqual(list(p), [5, 6])
+	def should_create_point_from_pairs(self):
+		self.assertEqual(Point((1, 2)), Point(1, 2))
+		self.assertEqual(Point([1, 2]), Point(1, 2))
+		self.assertEqual(Point(Point(1, 2)), Point(1, 2))
+		self.assertEqual(Point(Size(1, 2)), Point(1, 2))
+		self.assertEqual(Point(MyVector(1, 2)), Point(1, 2))
+		with self.assertRaises(ValueError):
+			Point((1, 2, 3))
+	def should_compare_points(self):
+		self.assertEqual(Point(1, 2), (1, 2))
+		self.assertEqual(Point(1, 2), [1, 2])
+		self.assertEqual(Point(1, 2), MyVector(1, 2))
+		self.assertNotEqual(Point(1, 2), Point(2, 1))
+		self.assertNotEqual(Point(1, 2), None)
+		self.assertEqual(hash(Point(1, 2)), hash((1, 2)))
+		self.assertTrue(Point(1, 2) < Point(2, 2))
+		self.assertTrue(Point(1, 2) < (1, 3))
+		self.assertTrue(Point(1, 2) < [1, 3])
+		self.assertTrue(Point(1, 2) <= Point(1, 2))
+		self.assertTrue(Point(2, 2) > (1, 2))
+	def should_calculate_points(self):
+		self.assertEqual(str(Point(1, 2)), str([1, 2]))
+		self.assertEqual(Point(1, 2)[1], 2)
+		self.assertEqual(Point(1, 2).values, [1, 2])
+		self.assertEqual(Point(1, 2) + Point(2, 3), Point(3, 5))
+		self.assertEqual(Point(1, 2) + (2, 3), Point(3, 5))
+		self.assertEqual(Point(3, 5) - Point(2, 3), Point(1, 2))
+		self.assertEqual(Point(3, 5) - [2, 3], Point(1, 2))
+		self.assertEqual(abs(Point(-1, 2)), Point(1, 2))
+		self.assertEqual(Point(1, 2) * 2, Point(2, 4))
+		self.assertEqual(Point(2, 4) / 2, Point(1, 2))
+		self.assertEqual(Point(5, 6) // 3, Point(1, 2))
+		self.assertEqual(Point(2, 4).__div__(2), Point(1, 2))
+		self.assertEqual(type(Point(1, 2) + Size(1, 1)), Point)
+	def should_pickle_point(self):
+		p = pickle.loads(pickle.dumps(Point(1, 2)))
+		self.assertEqual(p, Point(1, 2))
+		p.x = 3
+		self.assertEqual(p, Point(3, 2))
+		with self.assertRaises(AttributeError):
+			p.z = 1
+		self.assertEqual([cls for cls in type(p).__mro__ if 'values' in getattr(cls, '__slots__', ())], [])
 	def should_yield_all_surrounding_neighbours(self):
 		actual = set(Point(1, 2).neighbours())
 		expected = set(map(Point, [
@@ -9,7 +9,15 @@ class Vector(object):
 	- serialization (pickle, jsonpickle);
 	- accessing items: vector[i];
 	- math operations: <=>, +, -, * (scalar), / (scalar), // (scalar).
+
+	Base class does not define storage, so fixed-size subclasses (see Point, Size) can keep their own.
+	Plain Vector(...) creates generic N-dim vector with values stored in a list.
 	"""
+	__slots__ = ()
+	def __new__(cls, *values):
+		if cls is Vector:
+			cls = _VectorN
+		return super().__new__(cls)
 	def __init__(self, *values):
 		""" Creates vector from values, iterables or Vector:
 		Vector(0, 1, 2, ...)
@@ -57,27 +65,91 @@ class Vector(object):
 	def __div__(self, other):
 		return type(self)(list(_ / other for _ in self.values))
 
-class Point(Vector):
-	""" Convenience type definition for 2D vector
-	with access to first two elements under aliases .x and .y
+class _VectorN(Vector):
+	""" Generic N-dim vector, created by plain Vector(...) call. """
+	__slots__ = ('values',)
+
+class _Vector2D(Vector):
+	""" Base for fixed-size 2D vectors.
+	Values are stored in slots instead of a list,
+	math operations have fast paths for other 2D vectors and tuples.
 	"""
+	__slots__ = ('_first', '_second')
+	_name = '2D vector'
 	def __init__(self, *values):
-		""" Creates point object from two numbers (x, y).
-		If arguments are not given, creates default point (0, 0).
+		""" Creates vector from two numbers, pair of numbers or other 2D vector.
+		If arguments are not given, creates default vector (0, 0).
 		"""
-		if len(values) == 0:
-			values = (0, 0)
+		if len(values) == 2:
+			self._first, self._second = values
+		elif len(values) == 0:
+			self._first, self._second = 0, 0
 		elif len(values) > 2:
-			raise ValueError('2D point requires only two numbers, got {0}: {1}'.format(len(values), values))
-		super().__init__(*values)
+			raise ValueError('{0} requires only two numbers, got {1}: {2}'.format(self._name, len(values), values))
+		elif isinstance(values[0], _Vector2D):
+			self._first, self._second = values[0]._first, values[0]._second
+		else:
+			try:
+				self._first, self._second = values[0]
+			except ValueError:
+				raise ValueError('{0} requires only two numbers, got: {1}'.format(self._name, values[0]))
 	@property
-	def x(self): return self.values[0]
-	@x.setter
-	def x(self, value): self.values[0] = value
-	@property
-	def y(self): return self.values[1]
-	@y.setter
-	def y(self, value): self.values[1] = value
+	def values(self):
+		return [self._first, self._second]
+	def __str__(self):
+		return str([self._first, self._second])
+	def __hash__(self):
+		return hash((self._first, self._second))
+	def __iter__(self):
+		return iter((self._first, self._second))
+	def __getitem__(self, attr):
+		return (self._first, self._second)[attr]
+	def __getstate__(self):
+		return [self._first, self._second]
+	def __setstate__(self, state):
+		self._first, self._second = state
+	def __eq__(self, other):
+		if isinstance(other, _Vector2D):
+			return self._first == other._first and self._second == other._second
+		if type(other) is tuple:
+			return (self._first, self._second) == other
+		return super().__eq__(other)
+	def __lt__(self, other):
+		if isinstance(other, _Vector2D):
+			return (self._first, self._second) < (other._first, other._second)
+		if type(other) is tuple:
+			return (self._first, self._second) < other
+		return super().__lt__(other)
+	def __abs__(self):
+		return type(self)(abs(self._first), abs(self._second))
+	def __add__(self, other):
+		if isinstance(other, _Vector2D):
+			return type(self)(self._first + other._first, self._second + other._second)
+		other_first, other_second = other
+		return type(self)(self._first + other_first, self._second + other_second)
+	def __sub__(self, other):
+		if isinstance(other, _Vector2D):
+			return type(self)(self._first - other._first, self._second - other._second)
+		other_first, other_second = other
+		return type(self)(self._first - other_first, self._second - other_second)
+	def __mul__(self, other):
+		return type(self)(self._first * other, self._second * other)
+	def __floordiv__(self, other):
+		return type(self)(self._first // other, self._second // other)
+	def __truediv__(self, other):
+		return type(self)(self._first / other, self._second / other)
+	def __div__(self, other):
+		return type(self)(self._first / other, self._second / other)
+
+class Point(_Vector2D):
+	""" Convenience type definition for 2D vector
+	with access to first two elements under aliases .x and .y
+	"""
+	__slots__ = ()
+	_name = '2D point'
+	# Aliases to slot descriptors, as fast as plain attributes.
+	x = _Vector2D._first
+	y = _Vector2D._second
 	def neighbours(self):
 		""" Returns all neighbours including the copy of original point:
 		All points in 3x3 square around the original one.
@@ -86,24 +158,12 @@ class Point(Vector):
 			for y in [-1, 0, 1]:
 				yield Point(self.x + x, self.y + y)
 
-class Size(Vector):
+class Size(_Vector2D):
 	""" Convenience type definition for 2D vector
 	with access to first two elements under aliases .width and .height
 	"""
-	def __init__(self, *values):
-		""" Creates size object from two numbers (width, height).
-		If arguments are not given, creates default size (0, 0).
-		"""
-		if len(values) == 0:
-			values = (0, 0)
-		elif len(values) > 2:
-			raise ValueError('Size requires only two numbers, got {0}: {1}'.format(len(values), values))
-		super().__init__(*values)
-	@property
-	def width(self): return self.values[0]
-	@width.setter
-	def width(self, value): self.values[0] = value
-	@property
-	def height(self): return self.values[1]
-	@height.setter
-	def height(self, value): self.values[1] = value
+	__slots__ = ()
+	_name = 'Size'
+	# Aliases to slot descriptors, as fast as plain attributes.
+	width = _Vector2D._first
+	height = _Vector2D._second
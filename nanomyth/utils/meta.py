@@ -1,42 +1,34 @@
+import os
 import inspect
 import functools
+import operator
 
-def wrap_docstring(f, original_delegate=None):
-	""" Fixes docstring of wrapped object to propagate the original docstring
-	and appends reference to the original method.
+class Delegate(property):
+	""" Delegates methods to a member.
+	Implemented as a read-only property with C-level getter (operator.attrgetter),
+	so accessing delegated method costs about the same as a normal attribute lookup.
 	"""
-	def wrapper(*args, **kwargs): # pragma: no cover -- dummy definition, should not be called at all.
-		return f(*args, **kwargs)
-	wrapper.__doc__ = (inspect.getdoc(f) or "") + "\n\nNote: See {0} for details.".format(f.__qualname__)
-	wrapper.__wrapped_delegate__  = original_delegate
-	return wrapper
-
-class Delegate:
-	""" Delegates methods to a member. """
 	def __init__(self, member, base_method):
 		""" Declares delegated method of a member object.
-		base_method should be fully-qualified name of the original member function (Class.func).
+		base_method should be fully-qualified name of the original member function (Class.func)
+		or another delegate (Class.delegate).
 		"""
+		if isinstance(base_method, Delegate):
+			# Delegate of a delegate: the original delegate is already bound to its owner class
+			# and is known under its own name there.
+			method, docstring, qualname = base_method.name, base_method.__doc__, base_method.qualname
+		else:
+			method, docstring, qualname = base_method.__name__, inspect.getdoc(base_method), base_method.__qualname__
+		super().__init__(operator.attrgetter('{0}.{1}'.format(member, method)))
+		self.__doc__ = (docstring or "") + "\n\nNote: See {0} for details.".format(qualname)
 		self.member = member
+		self.method = method
 		self.base_method = base_method
-		if hasattr(self.base_method, '__wrapped_delegate__'):
-			self.base_method = self.base_method.__wrapped_delegate__
-			self.method = None
-		else:
-			self.method = self.base_method.__name__
-	def __get__(self, obj, objtype):
-		if obj is None:
-			# When object does not exist, it probably means that inspect tries to get docstring for the class member.
-			# In this case return original method with slightly adjusted docstring to indicate delegation.
-			return wrap_docstring(self.base_method, original_delegate=self)
-		if self.method is None:
-			# Means that delegate was created to already delegated function,
-			# and we need to get delegated's delegate name by questioning member's dict for the original delegate.
-			for method, v in getattr(obj, self.member).__class__.__dict__.items():
-				if v is self.base_method:
-					self.method = method
-					return getattr(getattr(obj, self.member), method)
-		return getattr(getattr(obj, self.member), self.method)
+		self.name = method
+		self.qualname = qualname
+	def __set_name__(self, owner, name):
+		self.name = name
+		self.qualname = '{0}.{1}'.format(owner.__qualname__, name)
 
 class fieldproperty:
 	""" Read-only property that is directly tied to an internal field.
@@ -54,40 +46,67 @@ class fieldproperty:
 			return self
 		return getattr(obj, self.field_name)
 
-def _is_instance(value, type_s):
-	""" Slightly adjusted to accept None in tuple of types
+TYPECHECK = os.environ.get('NANOMYTH_TYPECHECK', '1') != '0'
+""" When False, @typed does not wrap functions at all and no type checks are performed.
+Should be set before decorated modules are imported.
+Controlled by env var NANOMYTH_TYPECHECK (set to '0' to disable).
+"""
+
+class _TypeSpec:
+	""" Pre-compiled type specification for @typed.
+	Slightly adjusted to accept None in tuple of types
 	as indication that argument is optional and can have None as value.
 	Also `any` is any type.
+	String type names are resolved in given namespace once on the first check.
 	"""
-	if isinstance(type_s, str):
-		for frame in inspect.stack():
-			if type_s in frame.frame.f_globals:
-				type_s = frame.frame.f_globals[type_s]
-				break
-	if isinstance(type_s, tuple):
-		return any(_is_instance(value, t) for t in type_s)
-	if type_s is None:
-		return value is None
-	if type_s is any:
-		return True
-	return isinstance(value, type_s)
-
-def _type_name(type_s):
-	if isinstance(type_s, str):
-		return type_s
-	if isinstance(type_s, tuple):
-		return ', '.join((t.__name__ if t is not None else repr(None)) for t in type_s)
-	return type_s.__name__
+	__slots__ = ('type_s', 'namespace', 'types', 'accepts_none', 'accepts_any')
+	def __init__(self, type_s, namespace):
+		self.type_s = type_s
+		self.namespace = namespace
+		self.types = None
+		self.accepts_none = False
+		self.accepts_any = False
+	def _compile(self, type_s):
+		if isinstance(type_s, tuple):
+			return tuple(t for subtype in type_s for t in self._compile(subtype))
+		if isinstance(type_s, str):
+			if type_s not in self.namespace:
+				raise NameError('Cannot resolve type name: {0}'.format(type_s))
+			type_s = self.namespace[type_s]
+		if type_s is None:
+			self.accepts_none = True
+			return ()
+		if type_s is any:
+			self.accepts_any = True
+			return ()
+		return (type_s,)
+	def check(self, value):
+		if self.types is None:
+			self.types = self._compile(self.type_s)
+		if self.accepts_any:
+			return True
+		if value is None and self.accepts_none:
+			return True
+		return isinstance(value, self.types)
+	def name(self):
+		type_s = self.type_s
+		if isinstance(type_s, str):
+			return type_s
+		if isinstance(type_s, tuple):
+			return ', '.join((t.__name__ if t is not None else repr(None)) for t in type_s)
+		return type_s.__name__
 
 def typed(*arg_types, **kwarg_types):
 	""" Adds simple type checking for arguments (both positional and keyword ones).
 	Raises TypeError if arguments are not instances of the corresponding type (or tuple of types).
 	If `None` is present in a tuple of types, an argument is considered optional (accepts `None` as value).
 	If `any` is specified as a type, any type is accepted.
-	If type value is a string, it is treated as type name and resolved.
+	If type value is a string, it is treated as type name and resolved (once, on the first call)
+	in the global namespace of the decorated function's module.
 	Types are matched in the order of specification (or by keywords for keyword ones).
 	If there are less types specified than there are arguments, remaining arguments are skipped (no type check).
 	The same goes for skipped keyword arguments.
+	If TYPECHECK is False at the moment of decoration, function is returned as is.
 
 	Example:
 
@@ -97,19 +116,22 @@ def typed(*arg_types, **kwarg_types):
 	>>>      ...
 	"""
 	def _wrapper(f):
+		if not TYPECHECK:
+			return f
+		arg_specs = [_TypeSpec(arg_type, f.__globals__) for arg_type in arg_types]
+		kwarg_specs = {keyword:_TypeSpec(kwarg_type, f.__globals__) for keyword, kwarg_type in kwarg_types.items()}
+		skip_self = 1 if next(iter(inspect.signature(f).parameters), None) == 'self' else 0 # Hack: detect obj method, first argument is self.
 		@functools.wraps(f)
 		def _actual(*args, **kwargs):
-			args_to_check = args
-			if next(iter(inspect.signature(f).parameters), None) == 'self': # Hack: detect obj method, first argument is self.
-				args_to_check = args_to_check[1:]
-			for index, (arg, arg_type) in enumerate(zip(args_to_check, arg_types)):
-				if not _is_instance(arg, arg_type):
-					raise TypeError('Expected {0} for arg #{1}, got: {2}'.format(_type_name(arg_type), index, type(arg).__name__))
+			for index, (arg, spec) in enumerate(zip(args[skip_self:], arg_specs)):
+				if not spec.check(arg):
+					raise TypeError('Expected {0} for arg #{1}, got: {2}'.format(spec.name(), index, type(arg).__name__))
 			for keyword in kwargs.keys():
-				if keyword not in kwarg_types:
+				spec = kwarg_specs.get(keyword)
+				if spec is None:
 					continue
-				if not _is_instance(kwargs[keyword], kwarg_types[keyword]):
-					raise TypeError('Expected {0} for arg {1}, got: {2}'.format(_type_name(kwarg_types[keyword]), repr(keyword), type(kwargs[keyword]).__name__))
+				if not spec.check(kwargs[keyword]):
+					raise TypeError('Expected {0} for arg {1}, got: {2}'.format(spec.name(), repr(keyword), type(kwargs[keyword]).__name__))
 			return f(*args, **kwargs)
 		return _actual
 	return _wrapper
@@ -48,6 +48,7 @@ class TestDelegatedMethods(unittest.TestCase):
 	def should_adjust_docstsring_for_delegated_methods(self):
 		self.assertEqual(inspect.getdoc(Delegator.delegate_foo), 'Description of foo. \n\nNote: See MockOriginalClass.foo for details.')
 		self.assertEqual(inspect.getdoc(Delegator.bar), "Bar's description. \n\nNote: See MockOriginalClass.bar for details.")
+		self.assertEqual(inspect.getdoc(SuperDelegator.super_foo), 'Description of foo. \n\nNote: See MockOriginalClass.foo for details.\n\nNote: See Delegator.delegate_foo for details.')
 	def should_call_delegated_method(self):
 		delegator = Delegator()
 		self.assertEqual(delegator.delegate_foo(), 'foo called')
@@ -57,6 +58,20 @@ class TestDelegatedMethods(unittest.TestCase):
 		delegator = SuperDelegator()
 		self.assertEqual(delegator.super_foo(), 'foo called')
 
+	def should_delegate_to_inherited_methods(self):
+		delegator = Delegator()
+		delegator.member = MockInheritedClass()
+		delegator.member.value = 'inherited'
+		self.assertEqual(delegator.bar(), 'bar called: inherited')
+		delegator.member = MockOriginalClass()
+		delegator.member.value = 'original'
+		self.assertEqual(delegator.bar(), 'bar called: original')
+	def should_fail_to_delegate_to_missing_method(self):
+		delegator = Delegator()
+		delegator.member = object()
+		with self.assertRaises(AttributeError):
+			delegator.delegate_foo()
+
 class TestProperties(unittest.TestCase):
 	def should_adjust_docstsring_for_property(self):
 		self.assertEqual(inspect.getdoc(Delegator.name), 'Name doc string')
@@ -115,3 +130,16 @@ class TestTyping(unittest.TestCase):
 		with self.assertRaises(TypeError) as e:
 			obj.self_user('not self')
 		self.assertEqual(str(e.exception), 'Expected Delegator for arg #0, got: str')
+	def should_fail_on_unknown_type_names(self):
+		@meta.typed('UnknownType')
+		def unknown_typed_function(arg):
+			pass # pragma: no cover
+		with self.assertRaises(NameError):
+			unknown_typed_function(1)
+	def should_not_wrap_functions_when_type_check_is_disabled(self):
+		def original(arg):
+			return arg
+		with unittest.mock.patch.object(meta, 'TYPECHECK', False):
+			untyped = meta.typed(str)(original)
+		self.assertIs(untyped, original)
+		self.assertEqual(untyped(1), 1)
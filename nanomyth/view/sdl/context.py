@@ -39,6 +39,8 @@ class Context:
 		self._widgets = []
 		self._key_bindings = {}
 		self._pending_context = None
+		self._invalidated = True
+		self._drawn_rects = {}
 	def set_pending_context(self, new_context): # TODO cannot be typed because it's its own class, maybe shouldn't do this here?
 		""" Sets pending context.
 		It will be swtiched immediately after controls are back to this context.
@@ -85,6 +87,43 @@ class Context:
 		""" Draws all widgets. """
 		for _ in self._get_widgets_to_draw(engine):
 			_.obj.draw(engine, _.pos)
+	def is_animated(self):
+		""" Should return True while context changes by itself (e.g. plays an animation)
+		and should be redrawn continuously even if there are no events.
+		Default implementation returns False.
+		"""
+		return False
+	def invalidate(self):
+		""" Marks the whole context as changed, so it will be fully redrawn on the next frame.
+		Engine does it automatically when context becomes the topmost one.
+		"""
+		self._invalidated = True
+	@typed(Engine)
+	def collect_dirty_rects(self, engine):
+		""" Returns list of screen areas (Rect) that were changed since the last draw.
+		If the whole context was invalidated, returns the whole window area.
+		Otherwise returns areas of changed widgets (both the current and the previously drawn one).
+		"""
+		rects = []
+		for _ in self._get_widgets_to_draw(engine):
+			if not (self._invalidated or _.obj.is_dirty()):
+				continue
+			# Text widgets report size by the inclusive bottomright corner, so one extra pixel is added.
+			widget_rect = Rect(_.pos, _.obj.get_size(engine) + (1, 1))
+			previous_rect = self._drawn_rects.get(_.obj)
+			self._drawn_rects[_.obj] = widget_rect
+			rects.append(widget_rect)
+			if previous_rect is not None and previous_rect != widget_rect:
+				rects.append(previous_rect)
+		if self._invalidated:
+			return [Rect((0, 0), engine.get_window_size())]
+		return rects
+	@typed(Engine)
+	def mark_clean(self, engine):
+		""" Called by engine after context was drawn. """
+		self._invalidated = False
+		for _ in self._get_widgets_to_draw(engine):
+			_.obj.mark_clean()
 
 class Game(Context):
 	""" Context for the main game screen: level map, player character etc.
@@ -92,14 +131,20 @@ class Game(Context):
 
 	Any other widgets (e.g. UI) can be added via usual .add_widget()
 	"""
-	@typed(game.Game)
-	def __init__(self, game):
+	@typed(game.Game, bake_terrain=bool, viewport=(Size, tuple, list, None))
+	def __init__(self, game, bake_terrain=False, viewport=None):
 		""" Creates visual context for the game object.
+		If bake_terrain is True, map terrain is pre-rendered.
+		If viewport (size in tiles) is specified, camera follows the player.
+		See LevelMap for details.
 		"""
 		super().__init__()
 		self._game = game
 		self._game.on_change_map(self._update_map_widget)
-		self._map_widget = LevelMap(self._game.get_world().get_current_map())
+		self._map_widget = LevelMap(self._game.get_world().get_current_map(),
+				bake_terrain=bake_terrain,
+				viewport=viewport,
+				)
 		self.add_widget((0, 0), self._map_widget)
 	def _update_map_widget(self, current_map):
 		self._map_widget.set_map(current_map)
@@ -113,7 +158,8 @@ class Game(Context):
 		"""
 		if control_name == 'escape':
 			raise self.Finished()
-		elif control_name == 'up':
+		self._map_widget.invalidate() # Any action may change the map.
+		if control_name == 'up':
 			self._game.shift_player(Direction.UP)
 		elif control_name == 'down':
 			self._game.shift_player(Direction.DOWN)
@@ -335,8 +381,10 @@ class TextScreen(ScrollableContext):
 			raise self.Finished()
 		if control_name == 'up':
 			self._text_widget.set_top_line(self._text_widget.get_top_line() - 1)
+			self._text_widget.invalidate()
 		elif control_name == 'down':
 			self._text_widget.set_top_line(self._text_widget.get_top_line() + 1)
+			self._text_widget.invalidate()
 		return super().update(control_name)
 
 class ItemList(ScrollableContext):
@@ -388,6 +436,7 @@ class ItemList(ScrollableContext):
 		"""
 		self._items.select(selected_index)
 		self._scroller.ensure_item_visible(selected_index)
+		self.invalidate() # Visible items may be scrolled.
 	def _get_widgets_to_draw(self, engine):
 		widgets = []
 		widgets.extend(self._widgets)
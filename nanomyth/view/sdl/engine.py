@@ -1,14 +1,64 @@
 import os
+from collections import OrderedDict
 from contextlib import contextmanager
 from pathlib import Path
 import pygame
 from ...math import Size, Point
 from . import context
-from .image import BaseImage
+from .image import BaseImage, TileSetImage, TileImage
 from ..utils import fs
 from ...utils.meta import typed
 from ._base import Engine
 
+class ScaledTextureCache:
+	""" LRU cache of scaled textures converted to the display pixel format.
+
+	Textures are identified by their topmost parent surface and a region within it,
+	so subsurfaces of the same region share a cache entry even if they are separate objects.
+	Total size of cached surfaces (in bytes) is kept within given memory limit,
+	least recently used entries are evicted first.
+	"""
+	def __init__(self, memory_limit):
+		self._memory_limit = memory_limit
+		self._memory_used = 0
+		self._cache = OrderedDict()
+	def clear(self):
+		""" Drops all cached textures. """
+		self._cache.clear()
+		self._memory_used = 0
+	def get(self, texture, scale):
+		""" Returns texture scaled by given factor.
+		Scaled texture is created on the first request and then reused.
+		"""
+		key = (texture.get_abs_parent(), texture.get_abs_offset(), texture.get_size(), scale)
+		scaled = self._cache.get(key)
+		if scaled is not None:
+			self._cache.move_to_end(key)
+			return scaled
+		scaled = pygame.transform.scale(texture, (
+			texture.get_width() * scale,
+			texture.get_height() * scale,
+			))
+		if scaled.get_flags() & pygame.SRCALPHA:
+			scaled = scaled.convert_alpha()
+		else:
+			scaled = scaled.convert()
+		size = self._get_memory_size(scaled)
+		if size > self._memory_limit:
+			return scaled
+		self._cache[key] = scaled
+		self._memory_used += size
+		while self._memory_used > self._memory_limit:
+			_, evicted = self._cache.popitem(last=False)
+			self._memory_used -= self._get_memory_size(evicted)
+		return scaled
+	def fits(self, texture, scale):
+		""" Returns True if texture scaled by given factor can be stored in the cache. """
+		return texture.get_width() * texture.get_height() * texture.get_bytesize() * scale * scale <= self._memory_limit
+	@staticmethod
+	def _get_memory_size(surface):
+		return surface.get_width() * surface.get_height() * surface.get_bytesize()
+
 class SDLEngine(Engine):
 	"""
 	SDL-based game engine.
@@ -16,24 +66,36 @@ class SDLEngine(Engine):
 	Operates on set of Context objects.
 	Uses the topmost (the latest) Context object to process events and draw.
 	"""
-	@typed((Size, tuple, list), scale=int, window_title=(str, None))
-	def __init__(self, size, scale=1, window_title=None):
+	@typed((Size, tuple, list), scale=int, window_title=(str, None), dirty_rects=bool, texture_cache_limit=int)
+	def __init__(self, size, scale=1, window_title=None, dirty_rects=False, texture_cache_limit=64*1024*1024):
 		""" Creates SDL engine with a viewport of given size (required) and pixel scale factor (defaults to 1).
 		Optional window title may be set.
+
+		If dirty_rects is True, only areas that were reported as changed by contexts (see Context.collect_dirty_rects)
+		are redrawn and updated on the screen. Frames without changes are not drawn at all.
+		Otherwise the whole screen is redrawn on every frame.
+
+		Scaled textures are cached (see ScaledTextureCache)
+		within texture_cache_limit (in bytes, default is 64Mb).
 		"""
 		self._scale = scale
+		self._dirty_rects = dirty_rects
+		self._clip = None
+		self._texture_cache = ScaledTextureCache(texture_cache_limit)
 		pygame.init()
 		pygame.display.set_mode(tuple(size))
 		pygame.display.set_caption(window_title or '')
 		self._window = pygame.display.get_surface()
 		self._contexts = []
 		self._images = {}
+		self._image_names_by_path = {}
 	@typed(context.Context)
 	def init_context(self, context):
 		""" (Re-)Initializes current context.
 		Replaces all current contexts in the stack if were present.
 		By default engine is constructed with empty context stack and will immediately exit when run.
 		"""
+		context.invalidate()
 		self._contexts = [context]
 	def get_window_size(self):
 		""" Returns window size (unscaled). """
@@ -43,83 +105,200 @@ class SDLEngine(Engine):
 			)
 	@typed(str, BaseImage)
 	def add_image(self, name, image):
-		""" Puts image under specified name in the global image list. """
+		""" Puts image under specified name in the global image list.
+		Images loaded from files are also indexed by file path (see find_image_name_by_path).
+		"""
+		old_image = self._images.get(name)
 		self._images[name] = image
+		if old_image is not None:
+			# Replaced image keeps its original place in the list,
+			# so the first name for the path may change.
+			for replaced in (old_image, image):
+				if hasattr(replaced, 'filename'):
+					self._reindex_image_path(replaced.filename)
+		elif hasattr(image, 'filename'):
+			self._image_names_by_path.setdefault(image.filename, name)
 		return image
+	@typed(str, TileSetImage, (Point, tuple, list))
+	def add_tile_image(self, name, tileset, pos):
+		""" Puts tile of the tile set under specified name in the global image list.
+		If the same tile is already registered under this name, existing image is kept and returned,
+		so repeated registrations (e.g. for every map that uses the tile) do not create new images.
+		"""
+		image = self._images.get(name)
+		if isinstance(image, TileImage) and image.tileset is tileset and image.pos == pos:
+			return image
+		return self.add_image(name, tileset.get_tile(pos))
+	def _reindex_image_path(self, filename):
+		""" Re-calculates the first image name for the file path by scanning the whole list. """
+		image_name = next((
+			image_name for image_name, image in self._images.items()
+			if hasattr(image, 'filename') and image.filename == filename
+			), None)
+		if image_name is None:
+			self._image_names_by_path.pop(filename, None)
+		else:
+			self._image_names_by_path[filename] = image_name
 	@typed((Path, str))
 	def make_unique_image_name(self, image_path):
-		""" Tries to create unique short name for image path. """
+		""" Tries to create unique short name for image path.
+		Checks for existing names are hash lookups in the image dict, image list is not scanned.
+		"""
 		image_path = Path(image_path).resolve()
-		return fs.create_unique_name(image_path, self._images)
+		return fs.create_unique_name(image_path, self._images.keys())
 	@typed(str)
 	def get_image(self, name):
 		""" Returns image by name. """
 		return self._images[name]
 	@typed((Path, str))
 	def find_image_name_by_path(self, filename):
-		""" Returns image name by file name. """
-		filename = Path(filename).resolve()
-		for image_name in self._images:
-			image = self._images[image_name]
-			if hasattr(image, 'filename') and image.filename == filename:
-				return image_name
-		return None
+		""" Returns name of the first image registered for given file name
+		or None if the file is not loaded.
+		"""
+		return self._image_names_by_path.get(Path(filename).resolve())
+	def _scale_rect(self, rect):
+		return pygame.Rect(
+				rect.left * self._scale,
+				rect.top * self._scale,
+				rect.width * self._scale,
+				rect.height * self._scale,
+				)
 	@contextmanager
-	def _enter_rendering_mode(self):
-		""" RAII that enters into SDL rendring mode till the end of scope. """
+	def _enter_rendering_mode(self, dirty_rects=None):
+		""" RAII that enters into SDL rendring mode till the end of scope.
+		If list of dirty rects (unscaled) is given, drawing is clipped to those areas
+		and only they are updated on the screen.
+		"""
+		update_rects = None
+		if dirty_rects is not None:
+			update_rects = [self._scale_rect(rect) for rect in dirty_rects]
+			self._clip = update_rects[0].unionall(update_rects[1:])
 		try:
-			pygame.display.get_surface().fill((0,0,0))
+			self._window.set_clip(self._clip)
+			self._window.fill((0,0,0), self._clip)
 			yield
 		finally:
-			pygame.display.flip()
-	@typed(pygame.Surface, Point)
-	def render_texture(self, texture, pos):
+			self._window.set_clip(None)
+			self._clip = None
+			if update_rects is None:
+				pygame.display.flip()
+			else:
+				pygame.display.update(update_rects)
+	@typed(pygame.Surface, Point, area=(pygame.Rect, None))
+	def render_texture(self, texture, pos, area=None):
 		""" Renders SDL texture at given screen pos
 		considering scale factor (for both positions and sizes).
+		If area (unscaled, relative to the texture) is specified, only that part of the texture is rendered.
+		Scaled textures are cached, so texture surfaces should not be modified after being rendered.
+		Texture is scaled as a whole, so rendering different areas of the same texture
+		(e.g. scrolling over large surface) reuses the same cached scaled texture.
+		Areas of textures that are too large for the cache are scaled on every call.
 		"""
-		dest_size = Size(
-				texture.get_width() * self._scale,
-				texture.get_height() * self._scale,
-				)
+		size = Size(area.width, area.height) if area is not None else Size(texture.get_width(), texture.get_height())
 		dest = pygame.Rect(
 				pos.x * self._scale,
 				pos.y * self._scale,
-				dest_size.width,
-				dest_size.height,
+				size.width * self._scale,
+				size.height * self._scale,
 				)
-		texture = pygame.transform.scale(texture, tuple(dest_size))
-		self._window.blit(texture, dest)
-	def run(self, custom_update=None): # TODO callable type.
+		if self._clip is not None and not self._clip.colliderect(dest):
+			return
+		if self._scale != 1:
+			if area is not None and not self._texture_cache.fits(texture, self._scale):
+				# Too large to be cached, so only the area is scaled, bypassing the cache.
+				texture, area = pygame.transform.scale(texture.subsurface(area), dest.size), None
+			else:
+				texture = self._texture_cache.get(texture, self._scale)
+				if area is not None:
+					area = self._scale_rect(area)
+		self._window.blit(texture, dest, area)
+	def _push_context(self, new_context):
+		new_context.invalidate()
+		self._contexts.append(new_context)
+	def _get_events(self, wait, timeout=None):
+		""" Returns list of pending events.
+		If wait is True, blocks until there are any events or timeout (in milliseconds) expires.
+		If timeout is None, waits indefinitely.
+		"""
+		if not wait:
+			return pygame.event.get()
+		event = pygame.event.wait(timeout or 0)
+		if event.type == pygame.NOEVENT:
+			return pygame.event.get()
+		return [event] + pygame.event.get()
+	@typed(fps=(int, None), update_interval=(int, None), idle=bool)
+	def run(self, custom_update=None, fps=None, update_interval=None, idle=False): # TODO callable type.
 		""" Main event loop.
 		Processes events and controls for the current context and draws its widgets.
 		Also for transparent contexts draws all contexts under it until non-transparent is found.
 		Handles switching contexts.
 		When the last context quits, the whole event loop stops.
+
+		If fps is specified, frame rate is capped at that number of frames per second.
+		If update_interval (in milliseconds) is specified, custom_update is called with fixed timestep:
+		exactly one call per each passed interval (may be several calls per frame or none at all).
+		Otherwise custom_update is called once per frame.
+		If idle is True, engine sleeps waiting for events while nothing is going on
+		(no context is animated, see Context.is_animated),
+		waking up for the next custom_update call if update_interval is set.
 		"""
+		clock = pygame.time.Clock()
+		update_lag = 0
 		while self._contexts:
 			contexts_to_draw = []
 			for c in reversed(self._contexts):
 				contexts_to_draw.append(c)
 				if not c.transparent:
 					break
-			contexts_to_draw = reversed(contexts_to_draw)
-			with self._enter_rendering_mode():
-				for c in contexts_to_draw:
-					c.draw(self)
+			contexts_to_draw = list(reversed(contexts_to_draw))
+			if not self._dirty_rects:
+				with self._enter_rendering_mode():
+					for c in contexts_to_draw:
+						c.draw(self)
+			else:
+				dirty_rects = [rect for c in contexts_to_draw for rect in c.collect_dirty_rects(self)]
+				if dirty_rects:
+					with self._enter_rendering_mode(dirty_rects):
+						for c in contexts_to_draw:
+							c.draw(self)
+					for c in contexts_to_draw:
+						c.mark_clean(self)
 
 			current_context = self._contexts[-1]
+			should_wait = idle and not any(c.is_animated() for c in contexts_to_draw)
 			if current_context._pending_context: # TODO see comment for Context.set_pending_context
-				self._contexts.append(current_context._pending_context)
+				self._push_context(current_context._pending_context)
 				current_context._pending_context = None
-			for event in pygame.event.get():
+				should_wait = False
+			wait_timeout = None
+			if custom_update:
+				if update_interval:
+					wait_timeout = update_interval - update_lag
+					should_wait = should_wait and wait_timeout > 0
+				else:
+					should_wait = False
+			for event in self._get_events(should_wait, wait_timeout):
 				if event.type == pygame.KEYDOWN:
 					try:
 						new_context = current_context.update(pygame.key.name(event.key))
 						if new_context:
-							self._contexts.append(new_context)
+							self._push_context(new_context)
 					except context.Context.Finished:
 						self._contexts.pop()
+						if self._contexts:
+							self._contexts[-1].invalidate()
+				elif event.type == pygame.VIDEOEXPOSE:
+					for c in self._contexts:
+						c.invalidate()
 				elif event.type == pygame.QUIT: # pragma: no cover
 					self._contexts.clear()
-			if custom_update:
+			frame_time = clock.tick(fps or 0)
+			if not custom_update:
+				continue
+			if not update_interval:
+				custom_update()
+				continue
+			update_lag += frame_time
+			while update_lag >= update_interval:
 				custom_update()
+				update_lag -= update_interval
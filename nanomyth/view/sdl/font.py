@@ -27,6 +27,7 @@ class TilesetFont(Font):
 		self._tileset = tileset
 		tile_grid = itertools.chain.from_iterable((Point(x, y) for x in range(tileset.size.width)) for y in range(tileset.size.height))
 		self._letter_mapping = dict(zip(letter_mapping, tile_grid))
+		self._letter_images = {}
 
 class FixedWidthFont(TilesetFont):
 	""" Pixel font with fixed width (monospace) glyphs.
@@ -37,7 +38,9 @@ class FixedWidthFont(TilesetFont):
 	def get_letter_image(self, letter):
 		""" Returns sub-image for given letter. """
 		assert len(letter) == 1
-		return self._tileset.get_tile(self._letter_mapping[letter])
+		if letter not in self._letter_images:
+			self._letter_images[letter] = self._tileset.get_tile(self._letter_mapping[letter])
+		return self._letter_images[letter]
 
 class ProportionalFont(TilesetFont):
 	""" Pixel font with proportional glyphs.
@@ -66,4 +69,6 @@ class ProportionalFont(TilesetFont):
 	def get_letter_image(self, letter):
 		""" Returns sub-image for given letter. """
 		assert len(letter) == 1
-		return ImageRegion(self._tileset, self._bound_rects[letter])
+		if letter not in self._letter_images:
+			self._letter_images[letter] = ImageRegion(self._tileset, self._bound_rects[letter])
+		return self._letter_images[letter]
@@ -38,6 +38,26 @@ class Image(BaseImage):
 	def get_texture(self):
 		return self._texture
 
+class _SubsurfaceCache:
+	""" Keeps subsurface of the parent texture for the same region.
+	Subsurface is re-created only when parent texture object is replaced.
+	"""
+	def __init__(self):
+		self._parent_texture = None
+		self._texture = None
+	def get(self, parent_texture, rect):
+		""" Returns subsurface of given rect (callable that returns Rect, called only upon re-creation). """
+		if parent_texture is not self._parent_texture:
+			rect = rect()
+			self._texture = parent_texture.subsurface(pygame.Rect(
+				rect.left,
+				rect.top,
+				rect.width,
+				rect.height,
+				))
+			self._parent_texture = parent_texture
+		return self._texture
+
 class ImageRegion(BaseImage):
 	""" Part of the bigger image.
 	"""
@@ -47,16 +67,12 @@ class ImageRegion(BaseImage):
 		"""
 		self._image = image
 		self._rect = rect
+		self._subsurface = _SubsurfaceCache()
 	def get_size(self):
 		""" Size of the region. """
 		return self._rect.size
 	def get_texture(self):
-		return self._image.get_texture().subsurface(pygame.Rect(
-			self._rect.left,
-			self._rect.top,
-			self._rect.width,
-			self._rect.height,
-			))
+		return self._subsurface.get(self._image.get_texture(), lambda: self._rect)
 
 class TileSetImage(Image):
 	""" Image that contains a tile set (usually a table of smaller images of the same size).
@@ -85,11 +101,15 @@ class TileSetImage(Image):
 
 class TileImage(BaseImage):
 	""" Single tile from a tile set. """
+	tileset = fieldproperty('_tileset', 'Parent tile set.')
+	pos = fieldproperty('_pos', 'Position in the tile table.')
+
 	@typed(TileSetImage, Point)
 	def __init__(self, tileset, pos):
 		""" Creates a tile from given tile set and a position in table. """
 		self._tileset = tileset
 		self._pos = Point(pos)
+		self._subsurface = _SubsurfaceCache()
 	def get_size(self):
 		""" Returns size of a single tile. """
 		return self._tileset.tile_size
@@ -99,4 +119,4 @@ class TileImage(BaseImage):
 			self._pos.y * self._tileset.tile_size.height,
 			), self._tileset.tile_size)
 	def get_texture(self):
-		return self._tileset.get_texture().subsurface(pygame.Rect(*(self.get_rect())))
+		return self._subsurface.get(self._tileset.get_texture(), self.get_rect)
@@ -1,42 +1,257 @@
 """ Utilities for TMX (Tiled editor) maps.
 """
 import os
+import sys
+import json
+import struct
+import hashlib
+import tempfile
+import array
 from collections import defaultdict
 from pathlib import Path
 import pytmx
-from ...math import Matrix, Point, Size
+from ...math import Point, Size
 from ...game.actor import NPC
 from ...game.items import Item, CollectibleItem
 from ...game.map import Map, Terrain, Portal, Trigger
+from ...game.world import MapLoader
 from ...game.quest import QuestStateChange
 from .image import TileSetImage
 from ...utils.meta import typed
 from ._base import Engine
 
-def _load_tmx_image_tile(image, engine, tileset_sizes):
-	""" Parses TMX image [tile] definition
-	and adds image to the engine (loading any tileset if needed).
-	Returns image name for this specific tile.
+class _CompiledMap:
+	""" Contents of TMX map with all tiles resolved to references to tilesets.
+	Does not depend on engine, so it can be stored in cache (see _TMXCache).
+
+	- tilesets: list of (absolute path to image file, columns, rows);
+	- tiles: list of unique tiles (tileset index, x, y);
+	- cell_offsets, cell_tiles: terrain images of each cell (in row-major order)
+	  as indices in tiles list: images of cell N are cell_tiles[cell_offsets[N]:cell_offsets[N+1]];
+	- objects: list of (x, y, type, name, sprite tile index or None, properties).
+	"""
+	__slots__ = ('size', 'tilesets', 'tiles', 'cell_offsets', 'cell_tiles', 'objects')
+	def __init__(self, size, tilesets, tiles, cell_offsets, cell_tiles, objects):
+		self.size = size
+		self.tilesets = tilesets
+		self.tiles = tiles
+		self.cell_offsets = cell_offsets
+		self.cell_tiles = cell_tiles
+		self.objects = objects
+
+class _TileRegistry:
+	""" Collects unique tileset tiles in order of their appearance. """
+	def __init__(self, tileset_sizes):
+		self._tileset_sizes = tileset_sizes
+		self._tileset_indices = {}
+		self._tile_indices = {}
+		self.tilesets = []
+		self.tiles = []
+	def get_index(self, image):
+		""" Parses TMX image [tile] definition and returns index of the tile. """
+		tileset_filename, tile_pos, _flags = image
+		tileset_filename = Path(tileset_filename)
+		tile_pos = Point(
+				tile_pos[0] // tile_pos[2],
+				tile_pos[1] // tile_pos[3],
+				)
+		tileset_index = self._tileset_indices.get(tileset_filename)
+		if tileset_index is None:
+			tileset_index = self._tileset_indices[tileset_filename] = len(self.tilesets)
+			tileset_size = self._tileset_sizes[tileset_filename]
+			self.tilesets.append((str(tileset_filename.resolve()), tileset_size.width, tileset_size.height))
+		key = (tileset_index, tile_pos.x, tile_pos.y)
+		tile_index = self._tile_indices.get(key)
+		if tile_index is None:
+			tile_index = self._tile_indices[key] = len(self.tiles)
+			self.tiles.append(key)
+		return tile_index
+
+def _compile_tmx_map(filename):
+	""" Parses TMX file into _CompiledMap. """
+	tiled_map = pytmx.TiledMap(filename)
+	tileset_sizes = dict((
+		Path(filename).parent/tileset.source,
+		Size(tileset.columns, tileset.tilecount // tileset.columns),
+		) for tileset in tiled_map.tilesets)
+	registry = _TileRegistry(tileset_sizes)
+
+	width, height = tiled_map.width, tiled_map.height
+	cells = [[] for _ in range(width * height)]
+	for layer in tiled_map.visible_tile_layers:
+		layer = tiled_map.layers[layer]
+		for x, y, image in layer.tiles():
+			cells[x + y * width].append(registry.get_index(image))
+	objects_at = defaultdict(list)
+	for layer in tiled_map.visible_object_groups:
+		layer = tiled_map.layers[layer]
+		for obj in layer:
+			x, y = int(obj.x // obj.width), int(obj.y // obj.height)
+			objects_at[x + y * width].append(obj)
+			if obj.type not in ['npc', 'item']:
+				cells[x + y * width].append(registry.get_index(obj.image))
+	objects = []
+	for index in sorted(objects_at):
+		for obj in objects_at[index]:
+			sprite = None
+			if obj.type in ['npc', 'item']:
+				sprite = registry.get_index(obj.image)
+			objects.append((index % width, index // width, obj.type, obj.name, sprite, dict(obj.properties)))
+
+	cell_offsets = array.array('I', [0])
+	cell_tiles = array.array('I')
+	for cell in cells:
+		cell_tiles.extend(cell)
+		cell_offsets.append(len(cell_tiles))
+	return _CompiledMap(Size(width, height), registry.tilesets, registry.tiles, cell_offsets, cell_tiles, objects)
+
+class _TMXCache:
+	""" Binary cache of compiled TMX maps.
+
+	Cache file consists of fixed-size header, JSON metadata (tilesets, tiles and objects)
+	and raw little-endian arrays of cell data, so arrays can be read (or mapped) directly.
+	Tileset paths are stored relative to the directory of the TMX file,
+	so cache does not depend on the current directory.
+	Cache is valid if modification time and size of the TMX file have not changed;
+	otherwise SHA1 of the file contents is compared, so touched but unchanged files still hit the cache
+	(and header is updated with the new modification time, so file is not hashed again).
+	"""
+	MAGIC = b'NMTMXC02'
+	HEADER = struct.Struct('<8sqq20sIII')
+
+	def __init__(self, cache_dir):
+		self.cache_dir = Path(cache_dir)
+	def get_cache_file(self, filename):
+		""" Returns path to the cache file for given TMX file. """
+		filename = Path(filename).resolve()
+		path_hash = hashlib.sha1(str(filename).encode('utf-8')).hexdigest()[:8]
+		return self.cache_dir/'{0}-{1}.tmxc'.format(filename.stem, path_hash)
+	@staticmethod
+	def _to_little_endian(values):
+		if sys.byteorder != 'little': # pragma: no cover
+			values = array.array(values.typecode, values)
+			values.byteswap()
+		return values
+	def load(self, filename):
+		""" Returns cached _CompiledMap for TMX file or None if there is no valid cache. """
+		cache_file = self.get_cache_file(filename)
+		try:
+			data = memoryview(cache_file.read_bytes())
+			magic, mtime, file_size, digest, meta_size, offsets_count, tiles_count = self.HEADER.unpack_from(data)
+			if magic != self.MAGIC:
+				return None
+			stat = os.stat(filename)
+			touched = (mtime, file_size) != (stat.st_mtime_ns, stat.st_size)
+			if touched and digest != hashlib.sha1(Path(filename).read_bytes()).digest():
+				return None
+			tmx_dir = Path(filename).resolve().parent
+			pos = self.HEADER.size
+			meta = json.loads(bytes(data[pos:pos + meta_size]).decode('utf-8'))
+			tilesets = [(str(tmx_dir/tileset_filename), columns, rows) for tileset_filename, columns, rows in meta['tilesets']]
+			pos += meta_size
+			cell_offsets = array.array('I')
+			cell_offsets.frombytes(data[pos:pos + offsets_count * 4])
+			pos += offsets_count * 4
+			cell_tiles = array.array('I')
+			cell_tiles.frombytes(data[pos:pos + tiles_count * 4])
+		except (OSError, ValueError, KeyError, struct.error):
+			return None
+		if len(cell_offsets) != offsets_count or len(cell_tiles) != tiles_count:
+			return None # Truncated file.
+		if touched:
+			try:
+				self._write_cache_file(cache_file, [
+					self.HEADER.pack(self.MAGIC, stat.st_mtime_ns, stat.st_size, digest, meta_size, offsets_count, tiles_count),
+					data[self.HEADER.size:],
+					])
+			except OSError: # Cache is still valid, it is just checked slower.
+				pass
+		return _CompiledMap(
+				Size(*meta['size']),
+				tilesets,
+				[tuple(tile) for tile in meta['tiles']],
+				self._to_little_endian(cell_offsets), self._to_little_endian(cell_tiles),
+				[tuple(obj) for obj in meta['objects']],
+				)
+	def _write_cache_file(self, cache_file, chunks):
+		""" Replaces cache file with given chunks of data atomically,
+		so concurrent readers never see partial data, and concurrent writers do not clash.
+		"""
+		self.cache_dir.mkdir(parents=True, exist_ok=True)
+		fd, temp_file = tempfile.mkstemp(suffix='.tmp', dir=str(self.cache_dir))
+		try:
+			with os.fdopen(fd, 'wb') as f:
+				for chunk in chunks:
+					f.write(chunk)
+			os.replace(temp_file, str(cache_file))
+		except:
+			os.remove(temp_file)
+			raise
+	def save(self, filename, compiled):
+		""" Stores compiled map for the TMX file (see _write_cache_file). """
+		contents = Path(filename).read_bytes()
+		stat = os.stat(filename)
+		tmx_dir = Path(filename).resolve().parent
+		meta = json.dumps(dict(
+			size=list(compiled.size),
+			tilesets=[
+				(os.path.relpath(tileset_filename, str(tmx_dir)), columns, rows)
+				for tileset_filename, columns, rows in compiled.tilesets
+				],
+			tiles=compiled.tiles,
+			objects=compiled.objects,
+			)).encode('utf-8')
+		header = self.HEADER.pack(self.MAGIC,
+				stat.st_mtime_ns, stat.st_size, hashlib.sha1(contents).digest(),
+				len(meta), len(compiled.cell_offsets), len(compiled.cell_tiles),
+				)
+		self._write_cache_file(self.get_cache_file(filename), [
+			header,
+			meta,
+			self._to_little_endian(compiled.cell_offsets).tobytes(),
+			self._to_little_endian(compiled.cell_tiles).tobytes(),
+			])
+
+def _load_compiled_map(filename, cache_dir):
+	""" Returns _CompiledMap for TMX file, using cache if cache_dir is specified. """
+	compiled = None
+	if cache_dir is not None:
+		cache = _TMXCache(cache_dir)
+		compiled = cache.load(filename)
+	if compiled is None:
+		compiled = _compile_tmx_map(filename)
+		if cache_dir is not None:
+			cache.save(filename, compiled)
+	return compiled
+
+def _register_tiles(compiled, engine, tileset_images=None):
+	""" Adds images for all tiles of the compiled map to the engine
+	(loading any tileset if needed, or using pre-loaded tileset_images, one (or None) for each tileset).
+	Every unique tile of the map is registered once (see _TileRegistry),
+	tiles that are already registered by previous loads are reused (see SDLEngine.add_tile_image).
+	Returns list of image names for tiles.
 	"""
-	tileset_filename, tile_pos, _flags = image
-	tileset_filename = Path(tileset_filename)
-	tile_pos = Point(
-			tile_pos[0] // tile_pos[2],
-			tile_pos[1] // tile_pos[3],
-			)
-
-	tileset_name = engine.find_image_name_by_path(tileset_filename)
-	if not tileset_name:
-		tileset_name = engine.make_unique_image_name(tileset_filename)
-		tileset_size = tileset_sizes[tileset_filename]
-		engine.add_image(tileset_name, TileSetImage(tileset_filename, tileset_size))
-
-	tile_name = '{0}_{1}_{2}'.format(tileset_name, tile_pos.x, tile_pos.y)
-	engine.add_image(tile_name, engine.get_image(tileset_name).get_tile(tile_pos))
-	return tile_name
-
-@typed((str, Path), Engine)
-def load_tmx_map(filename, engine):
+	tileset_names = []
+	for index, (tileset_filename, columns, rows) in enumerate(compiled.tilesets):
+		tileset_filename = Path(tileset_filename)
+		tileset_name = engine.find_image_name_by_path(tileset_filename)
+		if not tileset_name:
+			tileset_name = engine.make_unique_image_name(tileset_filename)
+			tileset_image = tileset_images[index] if tileset_images is not None else None
+			if tileset_image is None:
+				tileset_image = TileSetImage(tileset_filename, Size(columns, rows))
+			engine.add_image(tileset_name, tileset_image)
+		tileset_names.append(tileset_name)
+	tile_names = []
+	for tileset_index, x, y in compiled.tiles:
+		tileset_name = tileset_names[tileset_index]
+		tile_name = '{0}_{1}_{2}'.format(tileset_name, x, y)
+		engine.add_tile_image(tile_name, engine.get_image(tileset_name), Point(x, y))
+		tile_names.append(tile_name)
+	return tile_names
+
+@typed((str, Path), Engine, cache_dir=(str, Path, None))
+def load_tmx_map(filename, engine, cache_dir=None):
 	""" Loads Map from given file.
 	Will load any image tileset required (if it is not loaded yet).
 
@@ -64,66 +279,81 @@ def load_tmx_map(filename, engine):
 	  Action callback should be register beforehand using SDLEngine.register_trigger_action()
 
 	Objects that are not recognized are loaded into terrain tiles as top images.
+
+	If cache_dir is specified, parsed map is stored there in compiled binary form
+	and is loaded from cache next time, skipping XML parsing, until the TMX file is changed.
+
+	To load map in background (e.g. for World.set_prefetch_radius) use TMXMapLoader.
 	"""
-	tiled_map = pytmx.TiledMap(filename)
-	tileset_sizes = dict((
-		Path(filename).parent/tileset.source,
-		Size(tileset.columns, tileset.tilecount // tileset.columns),
-		) for tileset in tiled_map.tilesets)
+	compiled = _load_compiled_map(filename, cache_dir)
+	return _create_map(compiled, _register_tiles(compiled, engine))
 
-	tiles = Matrix((tiled_map.width, tiled_map.height), [])
-	for layer in tiled_map.visible_tile_layers:
-		layer = tiled_map.layers[layer]
-		for x, y, image in layer.tiles():
-			tile_name = _load_tmx_image_tile(image, engine, tileset_sizes)
-			tiles.cell((x, y)).append(tile_name)
-	objects = defaultdict(list)
-	for layer in tiled_map.visible_object_groups:
-		layer = tiled_map.layers[layer]
-		for obj in layer:
-			pos = Point(
-				int(obj.x // obj.width),
-				int(obj.y // obj.height),
-				)
-			objects[pos].append(obj)
-			if obj.type not in ['npc', 'item']:
-				tile_name = _load_tmx_image_tile(obj.image, engine, tileset_sizes)
-				tiles.cell(pos).append(tile_name)
+class TMXMapLoader(MapLoader):
+	""" Map loader for World.register_map that loads TMX map (see load_tmx_map)
+	and can be prefetched in background.
+	TMX file (or its cache) and tileset images that are not loaded yet are read in prepare(),
+	which only looks up the engine's images by path; images are registered in the engine
+	only in finish() on the main thread, so background loading does not interfere with rendering.
+	"""
+	@typed((str, Path), Engine, cache_dir=(str, Path, None))
+	def __init__(self, filename, engine, cache_dir=None):
+		self._filename = filename
+		self._engine = engine
+		self._cache_dir = cache_dir
+	def prepare(self):
+		""" Returns compiled map and images of its tilesets (None for tilesets that are already loaded). """
+		compiled = _load_compiled_map(self._filename, self._cache_dir)
+		tileset_images = [
+				None if self._engine.find_image_name_by_path(tileset_filename)
+				else TileSetImage(tileset_filename, Size(columns, rows))
+				for tileset_filename, columns, rows in compiled.tilesets
+				]
+		return compiled, tileset_images
+	def finish(self, data):
+		compiled, tileset_images = data
+		return _create_map(compiled, _register_tiles(compiled, self._engine, tileset_images))
 
-	real_map = Map(tiles.size)
-	for pos, _ in real_map.iter_tiles():
+def _create_map(compiled, tile_names):
+	""" Creates Map object from compiled map, tile_names are image names of compiled.tiles. """
+	objects = defaultdict(list)
+	for obj in compiled.objects:
+		objects[Point(obj[0], obj[1])].append(obj)
+	real_map = Map(compiled.size)
+	cell_offsets, cell_tiles = compiled.cell_offsets, compiled.cell_tiles
+	for index, (pos, _) in enumerate(real_map.iter_tiles()):
 		passable = True
-		for obj in (objects[pos] if pos in objects else []):
-			if obj.type == 'item':
-				sprite_name = _load_tmx_image_tile(obj.image, engine, tileset_sizes)
-				if 'amount' in obj.properties:
-					item = CollectibleItem(obj.name, sprite_name, obj.amount)
+		for _x, _y, obj_type, name, sprite, properties in (objects[pos] if pos in objects else []):
+			if obj_type == 'item':
+				sprite_name = tile_names[sprite]
+				if 'amount' in properties:
+					item = CollectibleItem(name, sprite_name, properties['amount'])
 				else:
-					item = Item(obj.name, sprite_name)
+					item = Item(name, sprite_name)
 				real_map.add_item(pos, item)
 				continue
-			if obj.type == 'npc':
-				sprite_name = _load_tmx_image_tile(obj.image, engine, tileset_sizes)
+			if obj_type == 'npc':
+				sprite_name = tile_names[sprite]
 				trigger = None
-				if 'trigger' in obj.properties:
-					trigger = Trigger(obj.trigger)
-				if 'quest' in obj.properties:
-					trigger = QuestStateChange(obj.quest, obj.name)
-				npc = NPC(obj.name, sprite_name, trigger=trigger)
+				if 'trigger' in properties:
+					trigger = Trigger(properties['trigger'])
+				if 'quest' in properties:
+					trigger = QuestStateChange(properties['quest'], name)
+				npc = NPC(name, sprite_name, trigger=trigger)
 				real_map.add_actor(pos, npc)
 				continue
-			if obj.type == 'portal':
+			if obj_type == 'portal':
 				real_map.add_portal(pos, Portal(
-					obj.dest_map,
-					(obj.dest_x, obj.dest_y),
+					properties['dest_map'],
+					(properties['dest_x'], properties['dest_y']),
 					))
 				continue
-			if 'passable' in obj.properties and not obj.passable:
+			if 'passable' in properties and not properties['passable']:
 				passable = False
-			if 'trigger' in obj.properties:
-				real_map.add_trigger(pos, Trigger(obj.trigger))
-			if 'quest' in obj.properties:
-				trigger = QuestStateChange(obj.quest, obj.name)
+			if 'trigger' in properties:
+				real_map.add_trigger(pos, Trigger(properties['trigger']))
+			if 'quest' in properties:
+				trigger = QuestStateChange(properties['quest'], name)
 				real_map.add_trigger(pos, trigger)
-		real_map.set_tile(pos, Terrain(tiles.cell(pos), passable=passable))
+		images = [tile_names[tile] for tile in cell_tiles[cell_offsets[index]:cell_offsets[index + 1]]]
+		real_map.set_tile(pos, Terrain(images, passable=passable))
 	return real_map
@@ -15,7 +15,21 @@ from .font import Font
 
 class Widget:
 	""" Base interface for widgets.
+
+	Widgets track their own changes, so engine could redraw only changed areas (see SDLEngine).
+	Any method that changes appearance of the widget should call invalidate().
 	"""
+	_dirty = True
+
+	def invalidate(self):
+		""" Marks widget as changed, so it will be redrawn on the next frame. """
+		self._dirty = True
+	def is_dirty(self):
+		""" Returns True if widget was changed since the last draw. """
+		return self._dirty
+	def mark_clean(self):
+		""" Called by engine after widget was drawn. """
+		self._dirty = False
 	def get_size(self, engine): # pragma: no cover
 		""" Should return Size object that covers widgets area.
 		Engine is passed for operations that may require it to determine size.
@@ -44,7 +58,10 @@ class Image(Widget):
 		self._image = image
 	@typed(Engine)
 	def get_size(self, engine):
-		return self._image.get_size()
+		image = self._image
+		if isinstance(self._image, str):
+			image = engine.get_image(self._image)
+		return image.get_size()
 	@typed(Engine, Point)
 	def draw(self, engine, topleft):
 		image = self._image
@@ -80,7 +97,9 @@ class AbstractGrid(Widget):
 				)
 	@typed(Engine, Point)
 	def draw(self, engine, topleft):
-		for pos, image in self.iter_tiles(engine):
+		self._draw_tiles(engine, topleft, self.iter_tiles(engine))
+	def _draw_tiles(self, engine, topleft, tiles):
+		for pos, image in tiles:
 			tile_size = image.get_size()
 			image_pos = Point(pos.x * tile_size.width, pos.y * tile_size.height)
 			engine.render_texture(image.get_texture(), topleft + image_pos)
@@ -99,8 +118,10 @@ class TileMap(AbstractGrid):
 		return self._tilemap.size
 	@typed(Engine)
 	def iter_tiles(self, engine):
-		for pos in self._tilemap:
-			yield pos, engine.get_image(self._tilemap.cell(pos))
+		tilemap = self._tilemap
+		for y in range(tilemap.height):
+			for x in range(tilemap.width):
+				yield Point(x, y), engine.get_image(tilemap.cell_xy(x, y))
 
 class Panel(TileMap):
 	""" Draws panel made from tiles.
@@ -170,34 +191,125 @@ class TextLine(ImageRowSet):
 	@typed(str)
 	def set_text(self, new_text):
 		self._text = new_text
+		self.invalidate()
 
 class LevelMap(AbstractGrid):
-	""" Displays level map using static camera (viewport is not moving).
+	""" Displays level map using either static camera (viewport is not moving)
+	or camera that follows the player character.
 
-	WARNING: As camera is static, map should fit within the screen,
+	WARNING: If camera is static, map should fit within the screen,
 	outside tiles are accessible but will not be displayed!
 	"""
-	@typed(Map)
-	def __init__(self, level_map):
+	@typed(Map, bake_terrain=bool, viewport=(Size, tuple, list, None))
+	def __init__(self, level_map, bake_terrain=False, viewport=None):
 		""" Creates widget to display given Map (of Tile objects).
+
+		If bake_terrain is True, terrain layers are pre-rendered once into a single offscreen surface,
+		which is drawn as a whole, and only items and actors are drawn on top of it tile by tile.
+		Baked surface is re-created when terrain changes (see Map.get_terrain_revision) or map is switched.
+
+		If viewport (size in tiles) is specified, camera follows the player character
+		keeping them in the center of the viewport, while staying within map boundaries.
+		Only tiles, items and actors within the viewport are processed.
+		Otherwise camera is static and the whole map is displayed.
 		"""
 		self._level_map = level_map
+		self._bake_terrain = bake_terrain
+		self._viewport = Size(viewport) if viewport is not None else None
+		self._baked_terrain = None
+		self._baked_revision = None
 	@typed(Map)
 	def set_map(self, new_level_map):
 		""" Switches displayed level map. """
 		self._level_map = new_level_map
+		self._baked_terrain = None
+		self.invalidate()
+	def get_camera_rect(self):
+		""" Returns Rect of the visible map area (in tiles). """
+		map_size = self._level_map.get_size()
+		if self._viewport is None:
+			return Rect((0, 0), map_size)
+		size = Size(
+				min(self._viewport.width, map_size.width),
+				min(self._viewport.height, map_size.height),
+				)
+		center = self._level_map.get_player_pos() or Point(map_size.width // 2, map_size.height // 2)
+		topleft = Point(
+				max(0, min(center.x - size.width // 2, map_size.width - size.width)),
+				max(0, min(center.y - size.height // 2, map_size.height - size.height)),
+				)
+		return Rect(topleft, size)
 	@typed(Engine)
 	def get_grid_size(self, engine):
-		return self._level_map.get_size()
+		return self.get_camera_rect().size
+	def _iter_terrain_tiles(self, engine, camera=None):
+		""" Yields terrain images within camera rect (or all, if camera is None),
+		positions are relative to the camera.
+		"""
+		shift = camera.topleft if camera else Point(0, 0)
+		for pos, tile in self._level_map.iter_tiles(camera):
+			for image_name in tile.get_images():
+				yield pos - shift, engine.get_image(image_name)
+	def _iter_object_tiles(self, engine, camera=None):
+		""" Yields item and actor sprites within camera rect (or all, if camera is None),
+		positions are relative to the camera.
+		"""
+		shift = camera.topleft if camera else Point(0, 0)
+		for pos, item in self._level_map.iter_items(camera):
+			yield pos - shift, engine.get_image(item.get_sprite())
+		for pos, actor in self._level_map.iter_actors(camera):
+			yield pos - shift, engine.get_image(actor.get_sprite())
+	def _get_camera(self):
+		return self.get_camera_rect() if self._viewport is not None else None
 	@typed(Engine)
 	def iter_tiles(self, engine):
-		for pos, tile in self._level_map.iter_tiles():
-			for image_name in tile.get_images():
-				yield pos, engine.get_image(image_name)
-		for pos, item in self._level_map.iter_items():
-			yield pos, engine.get_image(item.get_sprite())
-		for pos, actor in self._level_map.iter_actors():
-			yield pos, engine.get_image(actor.get_sprite())
+		camera = self._get_camera()
+		yield from self._iter_terrain_tiles(engine, camera)
+		yield from self._iter_object_tiles(engine, camera)
+	def _get_baked_terrain(self, engine):
+		""" Returns surface with pre-rendered terrain of the whole map, re-creates it if terrain has changed.
+		Returns pair (surface, tile size).
+		If terrain has no images at all (e.g. empty map), returns pair (None, None).
+		"""
+		revision = self._level_map.get_terrain_revision()
+		if self._baked_terrain is not None and self._baked_revision == revision:
+			return self._baked_terrain
+		self._baked_revision = revision
+		tiles = list(self._iter_terrain_tiles(engine))
+		if not tiles:
+			self._baked_terrain = None, None
+			return self._baked_terrain
+		tile_size = tiles[0][1].get_size()
+		map_size = self._level_map.get_size()
+		surface = pygame.Surface((
+			map_size.width * tile_size.width,
+			map_size.height * tile_size.height,
+			), pygame.SRCALPHA)
+		for pos, image in tiles:
+			surface.blit(image.get_texture(), (pos.x * tile_size.width, pos.y * tile_size.height))
+		self._baked_terrain = surface, tile_size
+		return self._baked_terrain
+	@typed(Engine, Point)
+	def draw(self, engine, topleft):
+		camera = self._get_camera()
+		if not self._bake_terrain:
+			self._draw_tiles(engine, topleft, self._iter_terrain_tiles(engine, camera))
+		else:
+			self._draw_baked_terrain(engine, topleft, camera)
+		self._draw_tiles(engine, topleft, self._iter_object_tiles(engine, camera))
+	def _draw_baked_terrain(self, engine, topleft, camera):
+		surface, tile_size = self._get_baked_terrain(engine)
+		if surface is None:
+			return
+		area = None
+		if camera:
+			area = pygame.Rect(
+				camera.left * tile_size.width,
+				camera.top * tile_size.height,
+				camera.width * tile_size.width,
+				camera.height * tile_size.height,
+				)
+		engine.render_texture(surface, topleft, area=area)
 
 class Compound(Widget):
 	""" Compound container widget that may display several sub-widgets at the same time. """
@@ -216,6 +328,13 @@ class Compound(Widget):
 		i.e. to make some widget background add it as the very first one.
 		"""
 		self._widgets.append(WidgetAtPos(Point(topleft or (0, 0)), widget))
+		self.invalidate()
+	def is_dirty(self):
+		return self._dirty or any(item.obj.is_dirty() for item in self._widgets)
+	def mark_clean(self):
+		super().mark_clean()
+		for item in self._widgets:
+			item.obj.mark_clean()
 	@typed(Engine)
 	def get_size(self, engine):
 		""" Size of the bounding area for all widgets. """
@@ -252,9 +371,18 @@ class Switch(Widget):
 	def add_widget(self, state, widget):
 		""" Adds new state with widget. """
 		self._states[state] = widget
+		self.invalidate()
 	def set_state(self, state):
 		""" Sets current state. """
+		if state != self._current:
+			self.invalidate()
 		self._current = state
+	def is_dirty(self):
+		return self._dirty or (self._current in self._states and self._states[self._current].is_dirty())
+	def mark_clean(self):
+		super().mark_clean()
+		for widget in self._states.values():
+			widget.mark_clean()
 	@typed(Engine)
 	def get_size(self, engine):
 		""" Returns max size of sub-widgets.
@@ -307,6 +435,13 @@ class ButtonGroup(Widget):
 		Default is 0.
 		"""
 		self._spacing = height
+		self.invalidate()
+	def is_dirty(self):
+		return self._dirty or any(button.is_dirty() for button in self._buttons)
+	def mark_clean(self):
+		super().mark_clean()
+		for button in self._buttons:
+			button.mark_clean()
 	def get_selected_action(self):
 		""" Returns action property of the selected button,
 		or None if nothing is selected.
@@ -352,6 +487,7 @@ class BaseMultilineText(ImageRowSet):
 	def set_text(self, new_text):
 		wrapper = SDLTextWrapper(new_text, self._size.width, font=self._font)
 		self._textlines = wrapper.lines
+		self.invalidate()
 		return wrapper
 	def get_visible_text_lines(self): # pragma: no cover
 		""" Should return set of text lines that fit into the current viewport. """
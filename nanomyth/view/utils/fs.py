@@ -2,6 +2,7 @@ def create_unique_name(filepath, existing_names):
 	""" Tries to make unique name from given Path objects
 	so it would not conflict with existing names.
 	Path is not required to be absolute but it is encouraged.
+	Existing names should be a collection with fast membership test (set, dict keys).
 	"""
 	path_parts = list(filepath.parent.parts) + [filepath.stem]
 	name = path_parts[-1]